@@ -0,0 +1,94 @@
+"""Performance benchmarks for Bier Klub.
+
+These aren't tests and the test runner doesn't pick them up. Run them from the
+directory holding ``manage.py``, e.g.::
+
+    python -m benchmarks.member_lookup
+
+Every benchmark runs against a throwaway, fully migrated SQLite database, so it
+never touches ``db.sqlite3``, and prints its results as JSON so runs can be
+compared between commits.
+"""
+import atexit
+import json
+import os
+import tempfile
+import time
+
+
+def setup():
+    """Configure Django against a fresh, migrated, on-disk SQLite database.
+
+    Returns:
+        str: The path to the database, which is removed at exit.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bierklub.settings')
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    handle, path = tempfile.mkstemp(prefix='bierklub-bench-',
+                                    suffix='.sqlite3')
+    os.close(handle)
+    atexit.register(os.remove, path)
+
+    settings.DATABASES['default']['NAME'] = path
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    return path
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(timings):
+    """Summarize a list of timings, in seconds, as milliseconds.
+
+    Args:
+        timings (list[float]): The individual timings.
+
+    Returns:
+        dict: The count, mean, p50, p95, p99 and max.
+    """
+    values = sorted(timings)
+    count = len(values)
+
+    return {
+        'count': count,
+        'mean_ms': round(sum(values) / count * 1000, 4) if count else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 4),
+        'p95_ms': round(percentile(values, 95) * 1000, 4),
+        'p99_ms': round(percentile(values, 99) * 1000, 4),
+        'max_ms': round(values[-1] * 1000, 4) if count else 0.0,
+    }
+
+
+def measure(func, args_list):
+    """Time ``func`` once for every set of arguments in ``args_list``.
+
+    Returns:
+        dict: See :func:`summarize`.
+    """
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    return summarize(timings)
+
+
+def report(name, params, results):
+    """Print a benchmark's results as JSON."""
+    print(json.dumps({
+        'benchmark': name,
+        'params': params,
+        'results': results,
+    }, indent=2, sort_keys=True))
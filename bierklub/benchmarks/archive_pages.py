@@ -0,0 +1,67 @@
+"""Event archive page latency by depth, keyset cursors against OFFSET.
+
+    python -m benchmarks.archive_pages --events 50000
+"""
+import argparse
+import datetime
+
+from . import measure, report, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.core.paginator import Paginator
+    from django.db import transaction
+    from django.utils import timezone
+
+    from klubevents.models import Event
+    from klubevents.pagination import PER_PAGE, Cursor, paginate_published
+
+    now = timezone.now()
+    with transaction.atomic():
+        Event.objects.bulk_create(
+            (Event(name='Event {}'.format(i), description='', number=i,
+                   location='Somewhere', date=now,
+                   published_date=now - datetime.timedelta(minutes=i))
+             for i in range(args.events)),
+            batch_size=500,
+        )
+
+    queryset = Event.objects.only('name', 'published_date')
+    results = {}
+    pages = args.events // PER_PAGE
+    for page in sorted({1, 10, 100, pages // 2, pages}):
+        # the cursor for a page is just the last event on the page before it
+        cursor = None
+        if page > 1:
+            last = (queryset.order_by('-published_date', '-pk')
+                    [(page - 1) * PER_PAGE - 1])
+            cursor = Cursor(last.published_date, last.pk)
+
+        paginator = Paginator(
+            queryset.filter(published_date__lte=now)
+            .order_by('-published_date', '-pk'),
+            PER_PAGE,
+        )
+        results['page_{}'.format(page)] = {
+            'keyset': measure(
+                lambda: paginate_published(queryset, cursor),
+                [()] * args.repeat,
+            ),
+            'offset': measure(
+                lambda: list(paginator.page(page)),
+                [()] * args.repeat,
+            ),
+        }
+
+    report('archive_pages', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Event search latency, the FTS5 index against ``icontains`` scans.
+
+"icontains" is how the admin searched before the index, over just the name and
+location; "icontains_all" is what the public search would cost without the
+index, scanning all five text fields. ::
+
+    python -m benchmarks.event_search --events 50000
+"""
+import argparse
+import datetime
+import random
+
+from . import measure, report, setup
+
+#: Event text is drawn from a long-tailed vocabulary, so like real writeups a
+#: few words are everywhere and most are rare.
+VOCABULARY = ['word{}'.format(i) for i in range(20000)] + [
+    'lager', 'stout', 'porter', 'pilsner', 'saison', 'tasting', 'night',
+    'brewery', 'tour', 'cellar', 'barrel', 'aged', 'harvest', 'festival',
+]
+
+QUERIES = ('lager', 'stout night', 'brewery tour', 'barrel aged', 'harv',
+           'word1', 'nothingmatchesthis')
+
+
+def text(rng, words):
+    return ' '.join(
+        VOCABULARY[min(int(rng.paretovariate(1.0)) - 1, len(VOCABULARY) - 1)
+                   if rng.random() < 0.9
+                   else rng.randrange(len(VOCABULARY))]
+        for _ in range(words)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.db import transaction
+    from django.utils import timezone
+
+    from klubevents import search
+    from klubevents.models import Event
+
+    rng = random.Random(0)
+    now = timezone.now()
+    with transaction.atomic():
+        Event.objects.bulk_create(
+            (Event(name=text(rng, 3).title(), number=i,
+                   location='{} Street'.format(text(rng, 2).title()),
+                   preamble=text(rng, 20), description=text(rng, 200),
+                   additional_notes=text(rng, 30), date=now,
+                   published_date=now - datetime.timedelta(minutes=i))
+             for i in range(args.events)),
+            batch_size=500,
+        )
+
+    events = Event.objects.only('name', 'location', 'date')
+    admin_fields = ('name', 'location')
+    all_fields = [field for field, _ in search.FIELDS]
+
+    def icontains(query, fields):
+        from functools import reduce
+        from operator import or_
+
+        from django.db.models import Q
+
+        queryset = events
+        for word in query.split():
+            queryset = queryset.filter(reduce(or_, (
+                Q(**{field + '__icontains': word}) for field in fields
+            )))
+        return list(queryset.order_by('-published_date')[:search.LIMIT])
+
+    results = {}
+    for query in QUERIES:
+        results[query] = {
+            'fts5': measure(search.search_events, [(query,)] * args.repeat),
+            'fts5_admin': measure(
+                lambda: list(search.filter_events(events, query)
+                             .order_by('-published_date')[:100]),
+                [()] * args.repeat,
+            ),
+            'icontains': measure(
+                lambda: icontains(query, admin_fields), [()] * args.repeat,
+            ),
+            'icontains_all': measure(
+                lambda: icontains(query, all_fields), [()] * args.repeat,
+            ),
+        }
+
+    report('event_search', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
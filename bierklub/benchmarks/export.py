@@ -0,0 +1,79 @@
+"""Time and peak memory of the streaming member and guest list exports.
+
+"naive" reads the whole table in one query, the way ``iterator()`` does on
+SQLite under Django 1.11, for comparison. ::
+
+    python -m benchmarks.export --members 500000
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+from . import report, setup
+
+
+def run(func):
+    """Drain the generator ``func`` makes.
+
+    Returns:
+        dict: The time it took, the peak memory allocated along the way and
+        how many bytes it produced.
+    """
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in func())
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for _ in func():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': round(elapsed, 3), 'peak_mb': round(peak / 2 ** 20, 2),
+            'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--members', type=int, default=500000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--attendees', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.core.management import call_command
+
+    from klubevents import export
+    from klubevents.models import Event, Member
+
+    call_command('generate_dataset', members=args.members,
+                 events=args.events, attendees=args.attendees,
+                 stdout=io.StringIO())
+    biggest = Event.objects.order_by('-attendee_count').first()
+
+    def naive_members():
+        rows = Member.objects.values('pk', 'name', 'email', 'join_date',
+                                     'user_id').iterator()
+        return export.to_csv(({'id': row['pk'], 'registered': row['user_id'],
+                               **row} for row in rows),
+                             export.MEMBER_COLUMNS)
+
+    results = {
+        'members_csv': run(lambda: export.to_csv(export.members(),
+                                                 export.MEMBER_COLUMNS)),
+        'members_json': run(lambda: export.to_json(export.members(),
+                                                   export.MEMBER_COLUMNS)),
+        'members_csv_naive': run(naive_members),
+        'attendees_csv': run(lambda: export.to_csv(
+            export.attendees([biggest]), export.ATTENDEE_COLUMNS
+        )),
+    }
+    results['attendees_csv']['rows'] = biggest.attendee_count
+
+    report('export', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
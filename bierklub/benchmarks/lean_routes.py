@@ -0,0 +1,91 @@
+"""Per-request cost of the full middleware stack against the lean one.
+
+Anonymous requests for the index and an event page go straight through
+Django's request handler, once with Django's own session, auth and message
+middleware and once with the lean versions from :mod:`bierklub.middleware`.
+Pages come from the page cache, as most anonymous views do, so the
+middleware is most of what's left; ``--no-page-cache`` renders every page
+instead. ::
+
+    python -m benchmarks.lean_routes --repeat 2000
+"""
+import argparse
+
+from . import measure, report, setup
+
+FULL = {
+    'bierklub.middleware.LeanSessionMiddleware':
+        'bierklub.middleware.HybridSessionMiddleware',
+    'bierklub.middleware.LeanAuthenticationMiddleware':
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'bierklub.middleware.LeanMessageMiddleware':
+        'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--no-page-cache', action='store_true')
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+    from django.core.handlers.base import BaseHandler
+    from django.test import RequestFactory
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from klubevents.models import Event
+
+    event = Event.objects.create(name='Lager Night', description='Beer.',
+                                 number=1, location='Somewhere',
+                                 date=timezone.now())
+    urls = {'index': reverse('klubevents:index'),
+            'detail': reverse('klubevents:detail', args=(event.pk,))}
+    stacks = {
+        'full': [FULL.get(path, path) for path in settings.MIDDLEWARE],
+        'lean': list(settings.MIDDLEWARE),
+    }
+    factory = RequestFactory()
+
+    results = {}
+    with override_settings(
+        INSTRUMENTATION_ENABLED=False, ALLOWED_HOSTS=['testserver'],
+        PAGE_CACHE_ALIAS=None if args.no_page_cache else 'pages_local',
+    ):
+        handlers = {}
+        for stack, middleware in stacks.items():
+            with override_settings(MIDDLEWARE=middleware):
+                handlers[stack] = BaseHandler()
+                handlers[stack].load_middleware()
+
+        # the stacks take turns, and each keeps its best round, so neither
+        # is favoured by going first
+        for _ in range(args.rounds):
+            for stack, handler in sorted(handlers.items()):
+                for page, url in urls.items():
+                    # fill the page cache and Django's own caches first
+                    handler.get_response(factory.get(url))
+                    timings = measure(
+                        lambda: handler.get_response(factory.get(url)),
+                        [()] * args.repeat
+                    )
+                    best = results.setdefault(page, {}).get(stack)
+                    if best is None or timings['mean_ms'] < best['mean_ms']:
+                        results[page][stack] = timings
+
+    for page, timings in results.items():
+        timings['saved_us'] = round(
+            (timings['full']['mean_ms'] - timings['lean']['mean_ms']) * 1000,
+            1
+        )
+
+    report('lean_routes', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""Throughput and latency of the public pages and the RSVP path under load.
+
+Seeds a throwaway database, starts a server on it in a separate process and
+drives each scenario with concurrent clients over HTTP::
+
+    python -m benchmarks.load --events 500 --members 20000 --concurrency 8
+    python -m benchmarks.load --server gunicorn --workers 4
+    python -m benchmarks.load --server gunicorn --threads 1 --scenario register
+
+The built-in server is wsgiref with a thread per request, which needs nothing
+installed but gives every request one process's GIL; ``--server gunicorn``
+runs what production does. Scenarios run one after another, each with its
+own warm-up, so the numbers for a scenario don't depend on the others.
+"""
+import argparse
+import http.client
+import io
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from . import report, summarize
+
+SCENARIOS = ('index', 'detail', 'attending', 'attending_submit', 'register')
+
+
+def seed(events, members, attendees):
+    """Fill the benchmark database with ``generate_dataset``.
+
+    Returns:
+        list[int]: The ids of the published events.
+    """
+    from django.core.management import call_command
+
+    from klubevents.models import Event
+
+    call_command('generate_dataset', events=events, members=members,
+                 attendees=attendees, stdout=io.StringIO())
+
+    return list(Event.objects.published().values_list('pk', flat=True))
+
+
+def wait_for(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The server exited with {}.'.format(
+                process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError('The server never came up.')
+
+
+def start_server(args, directory):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    env = dict(os.environ, BIERKLUB_BENCH_DIR=directory,
+               DJANGO_SETTINGS_MODULE='benchmarks.settings')
+    if args.server == 'gunicorn':
+        command = ['gunicorn', 'bierklub.wsgi:application',
+                   '-b', '127.0.0.1:{}'.format(port),
+                   '-w', str(args.workers)]
+        if args.threads > 1:
+            command += ['-k', 'gthread', '--threads', str(args.threads)]
+    else:
+        command = [sys.executable, '-m', 'benchmarks.load', '--serve',
+                   str(port)]
+
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    wait_for(port, process)
+    return process, port
+
+
+def serve(port):
+    """Run the built-in threaded wsgiref server, for :func:`start_server`."""
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, \
+        make_server
+
+    from django.core.wsgi import get_wsgi_application
+
+    class Server(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+    class Handler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    make_server('127.0.0.1', port, get_wsgi_application(), Server,
+                Handler).serve_forever()
+
+
+class Client(object):
+    """One simulated visitor, keeping their cookies between requests."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        headers = {'Host': '127.0.0.1'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                '{}={}'.format(key, morsel.value)
+                for key, morsel in self.cookies.items()
+            )
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+
+        connection = http.client.HTTPConnection('127.0.0.1', self.port,
+                                                timeout=60)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+        finally:
+            connection.close()
+
+        for header in response.msg.get_all('Set-Cookie') or []:
+            self.cookies.load(header)
+
+        return response.status
+
+
+def run_scenario(port, concurrency, requests, make_request, landing):
+    """Drive ``requests`` requests through ``concurrency`` clients.
+
+    Args:
+        make_request (callable): Given a :class:`Client` and the request's
+            number, makes one request and returns its status.
+        landing (str): The page every client visits first, untimed, to
+            pick up a CSRF cookie.
+
+    Returns:
+        dict: The throughput, latency summary and status counts.
+    """
+    timings, statuses, lock = [], {}, threading.Lock()
+    counter = iter(range(requests))
+
+    def work():
+        client = Client(port)
+        client.request('GET', landing)
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                status = str(make_request(client, number))
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+
+            with lock:
+                timings.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = summarize(timings)
+    result['requests_per_second'] = round(len(timings) / elapsed, 2)
+    result['statuses'] = statuses
+    return result
+
+
+def scenarios(event_ids, run_id):
+    rng = random.Random(0)
+
+    def event():
+        return rng.choice(event_ids)
+
+    return {
+        'index': lambda client, n: client.request('GET', '/'),
+        'detail': lambda client, n: client.request(
+            'GET', '/events/{}/'.format(event())),
+        'attending': lambda client, n: client.request(
+            'GET', '/events/{}/attending/'.format(event())),
+        'attending_submit': lambda client, n: client.request(
+            'POST', '/events/{}/attending/submit/'.format(event()), {
+                'name': 'Guest {}'.format(n),
+                'email': 'guest-{}-{}@example.com'.format(run_id, n),
+            }),
+        'register': lambda client, n: client.request(
+            'POST', '/events/register/', {
+                'full_name': 'New Member{}'.format(n),
+                'email': 'new-{}-{}@example.com'.format(run_id, n),
+                'password': 'correct horse battery staple',
+                'confirm_password': 'correct horse battery staple',
+            }),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--attendees', type=int, default=50,
+                        help='Attendees per event.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500,
+                        help='Requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=50,
+                        help='Untimed requests before each scenario.')
+    parser.add_argument('--server', choices=('wsgiref', 'gunicorn'),
+                        default='wsgiref')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='gunicorn workers.')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Threads per gunicorn worker, as in the '
+                             'Dockerfile; 1 for sync workers.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Only run these scenarios.')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    directory = tempfile.mkdtemp(prefix='bierklub-load-')
+    try:
+        os.environ['BIERKLUB_BENCH_DIR'] = directory
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+
+        import django
+        from django.core.management import call_command
+
+        django.setup()
+        call_command('migrate', verbosity=0)
+        event_ids = seed(args.events, args.members, args.attendees)
+
+        process, port = start_server(args, directory)
+        try:
+            results = {}
+            landing = '/events/{}/attending/'.format(event_ids[0])
+            for name in args.scenario or SCENARIOS:
+                make_request = scenarios(event_ids, name)[name]
+                run_scenario(port, args.concurrency, args.warmup,
+                             lambda client, n: make_request(client, -n - 1),
+                             landing)
+                results[name] = run_scenario(port, args.concurrency,
+                                             args.requests, make_request,
+                                             landing)
+        finally:
+            process.terminate()
+            process.wait()
+    finally:
+        shutil.rmtree(directory)
+
+    params = {key: value for key, value in vars(args).items()
+              if key != 'serve'}
+    params['revision'] = git_revision()
+    report('load', params, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Member and event lookup latency with and without their indexes.
+
+"before" forces SQLite to ignore the index (``NOT INDEXED``), which is how
+these lookups ran before Member.email, User.email and Event.published_date
+were indexed; "after" is what the app runs today, e.g. the sign-up form's
+own duplicate check. ::
+
+    python -m benchmarks.member_lookup --members 100000
+"""
+import argparse
+import datetime
+import random
+
+from . import measure, report, setup
+
+
+def seed(members, users, events):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from django.utils import timezone
+
+    from klubevents.models import Event, Member
+
+    password = make_password('password')
+    now = timezone.now()
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            (User(username='member{}@example.com'.format(i),
+                  email='member{}@example.com'.format(i),
+                  password=password)
+             for i in range(users)),
+            batch_size=500,
+        )
+        Member.objects.bulk_create(
+            (Member(name='Member {}'.format(i),
+                    email='member{}@example.com'.format(i))
+             for i in range(members)),
+            batch_size=500,
+        )
+        Event.objects.bulk_create(
+            (Event(name='Event {}'.format(i), description='', number=i,
+                   location='Somewhere', date=now,
+                   published_date=now - datetime.timedelta(hours=i))
+             for i in range(events)),
+            batch_size=500,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--members', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.db import connection
+
+    from klubevents.models import Member
+
+    seed(args.members, args.users, args.events)
+
+    emails = [('member{}@example.com'.format(random.randrange(args.members)),)
+              for _ in range(args.lookups)]
+
+    def fetch_member(email, hint=''):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT id, name, email FROM klubevents_member {} '
+                'WHERE email = %s'.format(hint), [email]
+            )
+            return cursor.fetchall()
+
+    def latest_events(hint=''):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT id, name FROM klubevents_event {} '
+                'WHERE published_date <= %s '
+                'ORDER BY published_date DESC LIMIT 5'.format(hint),
+                [datetime.datetime.utcnow()]
+            )
+            return cursor.fetchall()
+
+    def old_registration_check(email):
+        # what the form ran before: every column of every user with the email
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT * FROM auth_user NOT INDEXED '
+                           'WHERE email = %s', [email])
+            return len(cursor.fetchall())
+
+    no_args = [()] * args.lookups
+    report('member_lookup', vars(args), {
+        'member_by_email': {
+            'before': measure(lambda e: fetch_member(e, 'NOT INDEXED'),
+                              emails),
+            'after': measure(fetch_member, emails),
+        },
+        'registration_duplicate_check': {
+            'before': measure(old_registration_check, emails),
+            'after': measure(Member.objects.email_registered, emails),
+        },
+        'latest_published_events': {
+            'before': measure(lambda: latest_events('NOT INDEXED'), no_args),
+            'after': measure(latest_events, no_args),
+        },
+    })
+
+
+if __name__ == '__main__':
+    main()
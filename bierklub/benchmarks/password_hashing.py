@@ -0,0 +1,119 @@
+"""What password hashing costs, and what the hashing pool does about it.
+
+First times a hash with each of ``PASSWORD_HASHERS`` that can run here. Then
+has ``--signups`` threads hash passwords as fast as they can, as a burst of
+sign-ups would, while another thread does ``--page-ms`` of Python at a time,
+as a page would, and compares hashing inline with hashing on a
+:class:`~klubevents.hashing.HashingPool`::
+
+    python -m benchmarks.password_hashing --signups 8 --workers 2 --queue 4
+"""
+import argparse
+import threading
+import time
+
+from . import report, setup, summarize
+
+
+def time_hashers(rounds):
+    from django.contrib.auth.hashers import get_hashers
+
+    results = {}
+    for hasher in get_hashers():
+        try:
+            hasher.encode('password', hasher.salt())
+        except ValueError as e:
+            # its library isn't installed
+            results[hasher.algorithm] = str(e)
+            continue
+
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            hasher.encode('password', hasher.salt())
+            timings.append(time.perf_counter() - start)
+        results[hasher.algorithm] = summarize(timings)
+
+    return results
+
+
+def under_load(make_password, signups, page_ms, duration):
+    """Page latency and sign-up outcomes while ``signups`` threads hash
+    passwords back to back.
+    """
+    from klubevents.hashing import PoolFull
+
+    stop = threading.Event()
+    hashed, refused, page_timings = [], [], []
+
+    def signup():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                make_password('password')
+                hashed.append(time.perf_counter() - start)
+            except PoolFull:
+                refused.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+    def page():
+        while not stop.is_set():
+            start = time.perf_counter()
+            deadline = time.process_time() + page_ms / 1000.0
+            while time.process_time() < deadline:
+                pass
+            page_timings.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=signup) for _ in range(signups)]
+    threads.append(threading.Thread(target=page))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'page': summarize(page_timings),
+        'signups': summarize(hashed),
+        'signups_per_second': round(len(hashed) / duration, 2),
+        'refused': len(refused),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rounds', type=int, default=10,
+                        help='Hashes to time with each hasher.')
+    parser.add_argument('--signups', type=int, default=8,
+                        help='Threads signing people up at once.')
+    parser.add_argument('--page-ms', type=float, default=5,
+                        help='CPU time each simulated page takes.')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5,
+                        help='Seconds to run each load test for.')
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.hashers import make_password
+
+    from klubevents.hashing import HashingPool
+
+    pool = HashingPool(args.workers, args.queue, timeout=30)
+    try:
+        results = {
+            'hashers': time_hashers(args.rounds),
+            'inline': under_load(make_password, args.signups, args.page_ms,
+                                 args.duration),
+            'pool': under_load(pool.make_password, args.signups,
+                               args.page_ms, args.duration),
+        }
+    finally:
+        pool.shutdown()
+
+    report('password_hashing', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Settings for the server :mod:`benchmarks.load` starts.
+
+Production settings, but against the benchmark's throwaway directory, named by
+``BIERKLUB_BENCH_DIR``, so it never touches ``db.sqlite3`` or the shared
+caches.
+"""
+import os
+
+from bierklub.settings import *  # noqa: F401,F403
+
+_BENCH_DIR = os.environ['BIERKLUB_BENCH_DIR']
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES['default']['NAME'] = os.path.join(_BENCH_DIR, 'db.sqlite3')  # noqa: F405
+CACHES['pages']['LOCATION'] = os.path.join(_BENCH_DIR, 'pages')  # noqa: F405
+CACHES['sessions']['LOCATION'] = os.path.join(_BENCH_DIR, 'sessions')  # noqa: F405
+METRICS_DIR = os.path.join(_BENCH_DIR, 'metrics')
+# the benchmark doesn't run collectstatic, so there are no hashed names to
+# look up
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+# a sampled profile would make latencies noisier between runs
+PROFILING_DIR = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+}
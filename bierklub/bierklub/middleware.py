@@ -0,0 +1,123 @@
+"""Middleware for the whole site.
+
+Views wrapped in :func:`lean` skip sessions, authentication and messages for
+visitors without a session cookie, who can't be logged in and have nothing
+stored to read. Everything else in ``MIDDLEWARE``, the security headers
+included, runs as usual. The lean versions of the session, authentication
+and message middleware below are drop-in replacements for Django's that
+know about this.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def lean(view):
+    """Mark a view as only needing the lean middleware pipeline.
+
+    Only do this for read-only views that work the same for every anonymous
+    visitor; they'll see an ``AnonymousUser`` and no ``request.session`` or
+    messages.
+
+    Returns:
+        callable: The view, marked.
+    """
+    view.lean = True
+    return view
+
+
+def is_lean(request):
+    """Whether ``request`` can take the lean pipeline: a safe request,
+    without a session cookie, for a :func:`lean` view.
+
+    The URL is resolved here, ahead of Django, and the answer kept on the
+    request so each middleware asks for free.
+    """
+    if not hasattr(request, '_lean'):
+        request._lean = False
+        if (request.method in SAFE_METHODS
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES):
+            try:
+                match = resolve(request.path_info,
+                                getattr(request, 'urlconf', None))
+            except Resolver404:
+                pass
+            else:
+                request._lean = getattr(match.func, 'lean', False)
+
+    return request._lean
+
+
+class HybridSessionMiddleware(SessionMiddleware):
+    """:class:`SessionMiddleware` that never starts a session on a safe
+    request.
+
+    Members keep their sessions as usual, in whatever ``SESSION_ENGINE``
+    says. Visitors without a session cookie looking at the site with GETs
+    cost no session I/O at all: Django only reads a session with a key, and
+    this doesn't save a new one, so nothing is written either. Anything put
+    in a brand new session during a GET is dropped; start sessions from
+    POSTs, as logging in does.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (session is None or request.method not in SAFE_METHODS
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return super(HybridSessionMiddleware, self).process_response(
+                request, response
+            )
+
+        if session.accessed:
+            # the page would have been different with a session cookie
+            patch_vary_headers(response, ('Cookie',))
+
+        return response
+
+
+class LeanSessionMiddleware(HybridSessionMiddleware):
+    """:class:`HybridSessionMiddleware` that doesn't make a session for
+    :func:`lean` requests.
+    """
+
+    def process_request(self, request):
+        if not is_lean(request):
+            super(LeanSessionMiddleware, self).process_request(request)
+
+    def process_response(self, request, response):
+        if not is_lean(request):
+            return super(LeanSessionMiddleware, self).process_response(
+                request, response
+            )
+
+        # with a session cookie it would have been a different page
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+class LeanAuthenticationMiddleware(AuthenticationMiddleware):
+    """:class:`AuthenticationMiddleware` that knows :func:`lean` requests
+    are anonymous without asking the session.
+    """
+
+    def process_request(self, request):
+        if is_lean(request):
+            request.user = AnonymousUser()
+        else:
+            super(LeanAuthenticationMiddleware, self).process_request(request)
+
+
+class LeanMessageMiddleware(MessageMiddleware):
+    """:class:`MessageMiddleware` that leaves :func:`lean` requests
+    without message storage, which templates treat as no messages.
+    """
+
+    def process_request(self, request):
+        if not is_lean(request):
+            super(LeanMessageMiddleware, self).process_request(request)
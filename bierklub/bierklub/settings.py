@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,7 +24,10 @@ SECRET_KEY = 'dys&$pcratnl6@me(ade-nuwd(k6$-bi(15y&dpo@@3n66ki)v'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = ['localhost', 'bierklub.dev']
+# "web" is how Prometheus reaches gunicorn directly for /metrics
+ALLOWED_HOSTS = ['localhost', 'bierklub.dev', 'web']
+
+TESTING = sys.argv[1:2] == ['test']
 
 
 # Application definition
@@ -31,6 +35,7 @@ ALLOWED_HOSTS = ['localhost', 'bierklub.dev']
 INSTALLED_APPS = [
     'klubevents.apps.KlubeventsConfig',
     'error_handlers.apps.ErrorHandlersConfig',
+    'instrumentation.apps.InstrumentationConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -41,12 +46,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'instrumentation.middleware.ProfilingMiddleware',
+    'instrumentation.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # these three skip views marked with bierklub.middleware.lean
+    'bierklub.middleware.LeanSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'bierklub.middleware.LeanAuthenticationMiddleware',
+    'bierklub.middleware.LeanMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -78,10 +86,125 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # an on-disk test database locks the same way production does, which
+        # the shared-cache in-memory default doesn't
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
 
+# Caching
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # rendered public pages, on disk so every gunicorn worker shares them
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.path.dirname(BASE_DIR), 'cache', 'pages'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # sessions, shared by every worker so logging out anywhere logs out
+    # everywhere
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.path.dirname(BASE_DIR), 'cache',
+                                 'sessions'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # for running a single worker, e.g. runserver
+    'pages_local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# which of the CACHES holds rendered pages (see klubevents.cache), None to
+# turn page caching off
+PAGE_CACHE_ALIAS = None if TESTING else 'pages'
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# how long, in seconds, a worker reuses its rendering of the 404 and 500
+# pages; None for as long as it runs, 0 to render them every time (see
+# error_handlers.pages)
+ERROR_PAGE_TIMEOUT = 60 * 5
+
+
+# Sessions
+# https://docs.djangoproject.com/en/1.11/topics/http/sessions/
+# Sessions are read from the cache and written through to the database, and
+# anonymous visitors browsing don't get one at all, and the read-only pages
+# marked lean() skip them entirely (see
+# bierklub.middleware.LeanSessionMiddleware). Expired sessions are pruned
+# with `manage.py prune_sessions`.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default' if TESTING else 'sessions'
+
+
+# Instrumentation
+# Per-request SQL, template and markdown timings, see
+# instrumentation.middleware
+
+INSTRUMENTATION_ENABLED = not TESTING
+# send the timings to browsers as a Server-Timing header too
+INSTRUMENTATION_SERVER_TIMING = True
+# log SQL statements taking at least this long, None to turn it off (see
+# instrumentation.slow_queries)
+SLOW_QUERY_THRESHOLD_MS = 100
+# where each worker writes its request metrics for /metrics to add up, None
+# to turn the metrics off (see instrumentation.metrics)
+METRICS_DIR = (None if TESTING else
+               os.path.join(os.path.dirname(BASE_DIR), 'cache', 'metrics'))
+
+# where cProfile profiles of single requests are saved, None to turn
+# profiling off (see instrumentation.profiling)
+PROFILING_DIR = (None if TESTING else
+                 os.path.join(os.path.dirname(BASE_DIR), 'cache', 'profiles'))
+PROFILING_MAX_FILES = 500
+# an X-Profile header with this value profiles any request, None to only
+# let staff members profile
+PROFILING_SECRET = None
+# the fraction of requests to each URL name to profile
+PROFILING_SAMPLE_RATES = {
+    'klubevents:detail': 0.001,
+    'klubevents:attending_submit': 0.001,
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/1.11/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # per-request timings and slow queries, as lines of JSON
+        'instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -101,6 +224,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/1.11/topics/auth/passwords/
+# New passwords are hashed with the first hasher, see
+# `python -m benchmarks.password_hashing` for what each one costs. Tests use a
+# fast, insecure hasher so they don't spend their time hashing.
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.BCryptPasswordHasher',
+]
+if TESTING:
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# sign-ups hash on a per-process pool (see klubevents.hashing): this many at
+# once, this many more waiting, and anyone after that is asked to try again
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_QUEUE = 4
+# seconds a sign-up waits for its hash before giving up
+PASSWORD_HASHING_TIMEOUT = 10
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.11/topics/i18n/
 
@@ -120,5 +267,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'static')
+# hashed names and precompressed copies, written by collectstatic (see
+# bierklub.storage); tests don't run collectstatic, so they use the names as
+# they are
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.StaticFilesStorage' if TESTING else
+    'bierklub.storage.CompressedManifestStaticFilesStorage'
+)
 
 TEST_RUNNER = 'rainbowtests.test.runner.RainbowDiscoverCoverageRunner'
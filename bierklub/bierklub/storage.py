@@ -0,0 +1,86 @@
+"""Static files with hashed names and precompressed copies.
+
+``collectstatic`` gives every file a name with a hash of its contents in it
+(``style.css`` becomes ``style.5f2b3c4d1e0a.css``), rewrites the ``url()``\\ s
+in stylesheets to match, and records the names in ``staticfiles.json`` for the
+``{% static %}`` tag to look up. A hashed name never changes what it points
+to, so nginx can tell browsers to keep it forever (see ``conf/nginx.hosts``).
+
+Alongside each text file it writes a gzipped ``.gz`` copy, and a ``.br`` one
+if the ``brotli`` package is installed, so nginx serves them compressed
+without compressing them per request.
+"""
+import gzip
+import io
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#: Files worth compressing; fonts like WOFF and images already are.
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.eot', '.ttf', '.otf',
+                '.json', '.txt', '.html', '.ico')
+
+
+def gzip_compress(content):
+    buf = io.BytesIO()
+    # a fixed mtime so the same file always compresses to the same bytes
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9,
+                       mtime=0) as f:
+        f.write(content)
+    return buf.getvalue()
+
+
+def compressors():
+    """The compressed copies to write, as (extension, function) pairs."""
+    found = [('.gz', gzip_compress)]
+    if brotli is not None:
+        found.append(('.br', brotli.compress))
+    return found
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files, each with compressed copies beside it."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = super(CompressedManifestStaticFilesStorage,
+                          self).post_process(paths, dry_run, **options)
+        for result in processed:
+            yield result
+
+        if dry_run:
+            return
+
+        # the originals too, for anything asking for a name without a hash
+        names = set(paths)
+        names.update(self.hashed_files.values())
+        for name in sorted(names):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        """Write compressed copies of ``name``, where they're smaller.
+
+        Yields:
+            str: The name of each copy written.
+        """
+        if not name.endswith(COMPRESSIBLE):
+            return
+
+        with self.open(name) as f:
+            content = f.read()
+
+        for extension, compress in compressors():
+            compressed = compress(content)
+            if len(compressed) >= len(content):
+                continue
+
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name
@@ -16,12 +16,15 @@ Including another URLconf
 from django.conf.urls import include, url
 from django.contrib import admin
 
+import instrumentation.views
 import klubevents.views
 
 urlpatterns = [
     url(r'^$', klubevents.views.IndexView.as_view()),
     url(r'^events/', include('klubevents.urls')),
+    url(r'^admin/profiles/', include('instrumentation.urls')),
     url(r'^admin/', admin.site.urls),
+    url(r'^metrics$', instrumentation.views.metrics, name='metrics'),
 ]
 
 handler404 = 'error_handlers.views.standard_404'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bierklub.settings")
 
 application = get_wsgi_application()
+
+# render the error pages while nothing's wrong, see error_handlers.pages
+from error_handlers import pages  # noqa: E402
+
+pages.prerender()
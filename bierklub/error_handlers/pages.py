@@ -0,0 +1,90 @@
+"""Error pages rendered ahead of time and served as stored bytes.
+
+Scanners probing for paths that don't exist would otherwise cost a full
+template render per 404, and a 500 page that renders through the same
+templates and context processors as everything else can fail along with
+them. So each error page is rendered once, as an anonymous visitor would see
+it, and kept in memory for ``ERROR_PAGE_TIMEOUT`` seconds. Workers render
+them as they start (see ``bierklub.wsgi``).
+
+If a page can't be re-rendered, the last good copy is served however old it
+is, and failing that a bare page that needs nothing at all.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+#: The template and context for each error page.
+PAGES = {
+    404: ('error_handlers/404.html', {'title': 'Page Not Found'}),
+    500: ('error_handlers/500.html', {'title': 'Uh Oh!'}),
+}
+
+#: What's served when a page can't be rendered at all.
+FALLBACKS = {
+    404: b'<html><body><h3>Page Not Found</h3></body></html>',
+    500: b'<html><body><h3>Uh Oh!</h3></body></html>',
+}
+
+# status: (content, when it was rendered)
+_rendered = {}
+_lock = threading.Lock()
+
+
+def render_page(status):
+    """Render an error page as an anonymous visitor sees it.
+
+    Returns:
+        bytes: The page.
+    """
+    template, context = PAGES[status]
+    return render_to_string(
+        template, dict(context, user=AnonymousUser())
+    ).encode('utf-8')
+
+
+def get_page(status):
+    """An error page, rendered again only if it's older than
+    ``ERROR_PAGE_TIMEOUT`` seconds.
+
+    A timeout of None keeps the first rendering for as long as the worker
+    runs, and 0 renders the page every time.
+
+    Returns:
+        bytes: The page.
+    """
+    timeout = getattr(settings, 'ERROR_PAGE_TIMEOUT', 60 * 5)
+    stored = _rendered.get(status)
+    if stored is not None and (
+            timeout is None
+            or time.monotonic() - stored[1] < timeout):
+        return stored[0]
+
+    try:
+        content = render_page(status)
+    except Exception:
+        logger.exception('Could not render the %s page.', status)
+        return stored[0] if stored is not None else FALLBACKS[status]
+
+    with _lock:
+        _rendered[status] = (content, time.monotonic())
+
+    return content
+
+
+def prerender():
+    """Render every error page now, so the first error doesn't have to."""
+    for status in PAGES:
+        get_page(status)
+
+
+def clear():
+    """Forget the rendered pages, e.g. after changing their templates."""
+    with _lock:
+        _rendered.clear()
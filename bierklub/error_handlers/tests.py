@@ -1,5 +1,73 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from klubevents.tests import DEFAULT_MEMBER_PASSWORD, create_member
 
-# @TODO: Simple tests to make sure templates render
+from . import pages, views
+
+
+@override_settings(DEBUG=False)
+class ErrorPageTests(TestCase):
+    def setUp(self):
+        pages.clear()
+        self.addCleanup(pages.clear)
+
+    def test_404(self):
+        resp = self.client.get('/nowhere/')
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertContains(resp, 'too Much to Drink', status_code=404)
+        self.assertContains(resp, 'Register', status_code=404)
+
+    def test_404_rendered_once(self):
+        """Every 404 after the first should be the stored page, with no
+        template rendered.
+        """
+        self.client.get('/nowhere/')
+
+        resp = self.client.get('/somewhere-else/')
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertTemplateNotUsed(resp, 'error_handlers/404.html')
+        self.assertContains(resp, 'too Much to Drink', status_code=404)
+
+    def test_404_anonymous_for_everyone(self):
+        """The stored page can't show who's logged in."""
+        member = create_member()
+        self.client.login(username=member.email,
+                          password=DEFAULT_MEMBER_PASSWORD)
+
+        resp = self.client.get(reverse('klubevents:detail', args=(999,)))
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertNotContains(resp, 'Cheers', status_code=404)
+
+    @override_settings(ERROR_PAGE_TIMEOUT=0)
+    def test_timeout(self):
+        self.client.get('/nowhere/')
+
+        resp = self.client.get('/nowhere/')
+
+        self.assertTemplateUsed(resp, 'error_handlers/404.html')
+
+    def test_500(self):
+        resp = views.standard_500(None)
+
+        self.assertEqual(resp.status_code, 500)
+        self.assertIn(b'Uh Oh!', resp.content)
+
+    def test_500_when_templates_fail(self):
+        """The 500 page should still be served when it can't be rendered:
+        the last good copy if there is one, a bare page if not.
+        """
+        with self.assertLogs('error_handlers.pages', 'ERROR'), \
+                override_settings(TEMPLATES=[]):
+            bare = views.standard_500(None)
+        self.assertEqual(bare.status_code, 500)
+        self.assertEqual(bare.content, pages.FALLBACKS[500])
+
+        rendered = views.standard_500(None).content
+        with self.assertLogs('error_handlers.pages', 'ERROR'), \
+                override_settings(TEMPLATES=[], ERROR_PAGE_TIMEOUT=0):
+            stale = views.standard_500(None)
+        self.assertEqual(stale.content, rendered)
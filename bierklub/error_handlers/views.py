@@ -1,19 +1,20 @@
-from django.shortcuts import render
+from django.http import HttpResponse
 
+from . import pages
 
-def standard_404(request):
-    """Return a standard Page Not Found."""
-    resp = render(request, "error_handlers/404.html", {'title': 'Page Not Found'})
-    resp.status_code = 404
-    return resp
+
+def standard_404(request, exception=None):
+    """Return a standard Page Not Found.
+
+    The page is rendered ahead of time, see :mod:`error_handlers.pages`.
+    """
+    return HttpResponse(pages.get_page(404), status=404)
 
 
 def standard_500(request):
-    """Return a standard 500 page."""
-    resp = render(
-        request,
-        'error_handlers/500.html',
-        {'title': 'Uh Oh!'}
-    )
-    resp.status_code = 500
-    return resp
+    """Return a standard 500 page.
+
+    This doesn't touch templates, the database or the request, any of which
+    might be why we're here; see :mod:`error_handlers.pages`.
+    """
+    return HttpResponse(pages.get_page(500), status=500)
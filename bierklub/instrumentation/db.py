@@ -0,0 +1,76 @@
+"""A backport of Django 2.0's ``connection.execute_wrapper()``.
+
+Django 1.11 has no hook around query execution, so :func:`install` swaps a
+connection's cursor factories for ones that return a :class:`WrappedCursor`.
+That runs each query through the connection's ``execute_wrappers``, which have
+the same signature as Django 2.0's::
+
+    def wrapper(execute, sql, params, many, context):
+        return execute(sql, params, many, context)
+
+When Django is upgraded this module can go, and ``connection.execute_wrapper``
+used in its place.
+"""
+import functools
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.utils import CursorWrapper
+
+
+class WrappedCursor(CursorWrapper):
+    """Runs queries on the cursor Django would have used through the
+    connection's ``execute_wrappers``.
+    """
+
+    def execute(self, sql, params=None):
+        return self._execute_with_wrappers(sql, params, False)
+
+    def executemany(self, sql, param_list):
+        return self._execute_with_wrappers(sql, param_list, True)
+
+    def _execute(self, sql, params, many, context):
+        if many:
+            return self.cursor.executemany(sql, params)
+        return self.cursor.execute(sql, params)
+
+    def _execute_with_wrappers(self, sql, params, many):
+        context = {'connection': self.db, 'cursor': self}
+        execute = self._execute
+        for wrapper in reversed(self.db.execute_wrappers):
+            execute = functools.partial(wrapper, execute)
+
+        return execute(sql, params, many, context)
+
+
+def install(connection):
+    """Give ``connection`` a list of ``execute_wrappers``, once."""
+    if hasattr(connection, 'execute_wrappers'):
+        return
+
+    connection.execute_wrappers = []
+    make_cursor = connection.make_cursor
+    make_debug_cursor = connection.make_debug_cursor
+    connection.make_cursor = (
+        lambda cursor: WrappedCursor(make_cursor(cursor), connection)
+    )
+    connection.make_debug_cursor = (
+        lambda cursor: WrappedCursor(make_debug_cursor(cursor), connection)
+    )
+
+
+@contextmanager
+def execute_wrapper(wrapper, using=DEFAULT_DB_ALIAS):
+    """Run every query on the ``using`` connection through ``wrapper`` for
+    the duration of the block.
+
+    Connections are per thread, so this only sees the current thread's
+    queries.
+    """
+    connection = connections[using]
+    install(connection)
+    connection.execute_wrappers.append(wrapper)
+    try:
+        yield
+    finally:
+        connection.execute_wrappers.remove(wrapper)
@@ -0,0 +1,436 @@
+"""Request metrics in the Prometheus text format, shared between workers.
+
+Every gunicorn worker keeps its own counts in memory and writes them to its
+own file in ``settings.METRICS_DIR`` at most every :data:`FLUSH_INTERVAL`
+seconds and when it exits. ``/metrics`` adds every worker's file together, so
+a scrape sees the whole server whichever worker answers it.
+
+Each file is named for its process and a random token, so a new worker that
+happens to get a dead one's pid never overwrites its counts. A live worker
+holds a lock on its ``.lock`` file. When a worker starts, it folds the files
+of workers whose locks are gone into :data:`ARCHIVE`, so the totals keep
+counting across worker restarts, like Prometheus counters should, without
+the files piling up. Empty the directory when the server is deployed to start
+from zero.
+"""
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+#: Upper bounds, in seconds, of the request latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: How often, in seconds, a worker writes its counts out.
+FLUSH_INTERVAL = 1.0
+
+#: Every metric family, as ``name: (type, help)``.
+FAMILIES = {
+    'bierklub_http_requests_total': (
+        'counter', 'Requests served, by view, method and status.'),
+    'bierklub_http_request_duration_seconds': (
+        'histogram', 'Time spent serving requests, by view.'),
+    'bierklub_db_queries_total': (
+        'counter', 'SQL queries run while serving requests, by view.'),
+    'bierklub_db_query_duration_seconds_total': (
+        'counter', 'Time spent in SQL while serving requests, by view.'),
+    'bierklub_page_cache_total': (
+        'counter', 'Pages served from the page cache (hit) or rendered into '
+        'it (miss), by view.'),
+    'bierklub_http_not_found_total': (
+        'counter', '404s served, by the first segment of the path.'),
+}
+
+#: How many different path prefixes each worker, and the archive of dead
+#: workers' counts, keeps 404s under before lumping the rest together as
+#: "other", since scanners try endless paths.
+NOT_FOUND_PREFIXES = 100
+
+#: The file dead workers' counts are added to.
+ARCHIVE = 'archive.json'
+
+#: Held while a worker's lock file is made, and while archiving, so neither
+#: sees the other half done.
+DIRECTORY_LOCK = 'metrics.lock'
+
+_FILE_PREFIX = 'metrics-'
+
+_HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class Store(object):
+    """One process's metrics, and the file they're written to.
+
+    Samples are keyed by ``(name, labels)``, where ``labels`` is a sorted
+    tuple of ``(label, value)`` pairs. Histogram buckets are kept cumulative,
+    so samples from different workers just add up.
+    """
+
+    def __init__(self, directory, pid=None):
+        self.pid = os.getpid() if pid is None else pid
+        self.path = os.path.join(directory, '{}{}-{}.json'.format(
+            _FILE_PREFIX, self.pid, uuid.uuid4().hex[:12]
+        ))
+        # held for as long as the store lives, see archive()
+        self.lock_file = None
+        self.samples = {}
+        self.not_found_prefixes = set()
+        self.flushed_at = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        """Add ``value`` to the histogram ``name``."""
+        for bound in BUCKETS + (float('inf'),):
+            if value <= bound:
+                self.inc(name + '_bucket',
+                         dict(labels, le=_format_bound(bound)))
+        self.inc(name + '_sum', labels, value)
+        self.inc(name + '_count', labels)
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write the samples out, replacing the file in one go so readers
+        never see half of it.
+        """
+        with self._lock:
+            data = [[name, labels, value]
+                    for (name, labels), value in self.samples.items()]
+            self.flushed_at = time.monotonic()
+
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        if self.lock_file is None:
+            with _locked(directory):
+                # another thread may have got here first
+                if self.lock_file is None:
+                    lock_file = open(_lock_path(self.path), 'a')
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self.lock_file = lock_file
+
+        _write(directory, os.path.basename(self.path), data)
+
+
+def _lock_path(path):
+    return path[:-len('.json')] + '.lock'
+
+
+class _locked(object):
+    """Hold :data:`DIRECTORY_LOCK` in ``directory``."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, DIRECTORY_LOCK)
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def _read_samples(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {(sample, tuple(tuple(pair) for pair in labels)): value
+            for sample, labels, value in data}
+
+
+def _read_archive(directory):
+    """The archived samples, and the names of the files merged into them
+    last time.
+    """
+    try:
+        with open(os.path.join(directory, ARCHIVE)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}, set()
+
+    samples = {(sample, tuple(tuple(pair) for pair in labels)): value
+               for sample, labels, value in data['samples']}
+    return samples, set(data['merged'])
+
+
+def _write(directory, name, data):
+    handle, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(data, f)
+    os.replace(path, os.path.join(directory, name))
+
+
+def _is_dead(lock_path):
+    """Whether the worker holding ``lock_path`` has gone."""
+    try:
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def _cap_not_found(key, prefixes):
+    """Put a 404 sample under "other" if the archive already has
+    :data:`NOT_FOUND_PREFIXES` others.
+    """
+    name, labels = key
+    if name != 'bierklub_http_not_found_total':
+        return key
+
+    prefix = dict(labels)['prefix']
+    if prefix not in prefixes:
+        if prefix == 'other' or len(prefixes) < NOT_FOUND_PREFIXES:
+            prefixes.add(prefix)
+        else:
+            labels = (('prefix', 'other'),)
+    return name, labels
+
+
+def archive(directory):
+    """Add the counts of every worker that's gone to :data:`ARCHIVE`, and
+    remove their files.
+
+    Returns:
+        list[str]: The names of the files archived.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    with _locked(directory):
+        dead = []
+        for name in names:
+            if not (name.startswith(_FILE_PREFIX) and name.endswith('.json')):
+                continue
+            # files from before workers had lock files have no owner
+            lock_path = _lock_path(os.path.join(directory, name))
+            if not os.path.exists(lock_path) or _is_dead(lock_path):
+                dead.append(name)
+
+        if not dead:
+            return []
+
+        samples, _ = _read_archive(directory)
+        prefixes = {dict(labels)['prefix'] for name, labels in samples
+                    if name == 'bierklub_http_not_found_total'}
+        for name in dead:
+            try:
+                merging = _read_samples(os.path.join(directory, name))
+            except (OSError, ValueError):
+                continue
+            for key, value in merging.items():
+                key = _cap_not_found(key, prefixes)
+                samples[key] = samples.get(key, 0) + value
+
+        # the archive lists what's in it, so anyone who read a dead worker's
+        # file before it went doesn't count it twice
+        _write(directory, ARCHIVE, {
+            'samples': [[name, labels, value]
+                        for (name, labels), value in samples.items()],
+            'merged': dead,
+        })
+        for name in dead:
+            path = os.path.join(directory, name)
+            for remove in (path, _lock_path(path)):
+                try:
+                    os.remove(remove)
+                except FileNotFoundError:
+                    pass
+
+    return dead
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _flush_at_exit():
+    store = _store
+    if store is not None and store.pid == os.getpid():
+        store.flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+def get_store():
+    """This process's :class:`Store`, or None if metrics are turned off.
+
+    A new store is made after a fork, so workers forked from a preloaded
+    master don't share (and double count) its samples. Making one archives
+    the files of workers that have gone.
+    """
+    global _store
+
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return None
+
+    with _store_lock:
+        if (_store is None or _store.pid != os.getpid()
+                or os.path.dirname(_store.path) != directory):
+            archive(directory)
+            _store = Store(directory)
+
+        return _store
+
+
+def not_found_prefix(path):
+    """The part of a path 404s are counted under: its first segment.
+
+    ``/wp-admin/install.php`` is counted as ``/wp-admin/``, and ``/.env``
+    as ``/.env``.
+    """
+    segment, slash, _ = path.lstrip('/').partition('/')
+    return '/' + segment[:40] + slash
+
+
+def observe_request(record):
+    """Count a request from its :mod:`instrumentation.middleware` record."""
+    store = get_store()
+    if store is None:
+        return
+
+    labels = {'view': record['view'] or 'none'}
+    store.inc('bierklub_http_requests_total', dict(
+        labels, method=record['method'], status=str(record['status']),
+    ))
+    store.observe('bierklub_http_request_duration_seconds', labels,
+                  record['total_ms'] / 1000)
+    store.inc('bierklub_db_queries_total', labels, record['db_count'])
+    store.inc('bierklub_db_query_duration_seconds_total', labels,
+              record['db_ms'] / 1000)
+
+    if record.get('page_cache'):
+        store.inc('bierklub_page_cache_total',
+                  dict(labels, outcome=record['page_cache']))
+
+    if record['status'] == 404:
+        prefix = not_found_prefix(record['path'])
+        with store._lock:
+            if prefix not in store.not_found_prefixes:
+                if len(store.not_found_prefixes) < NOT_FOUND_PREFIXES:
+                    store.not_found_prefixes.add(prefix)
+                else:
+                    prefix = 'other'
+        store.inc('bierklub_http_not_found_total', {'prefix': prefix})
+
+    store.maybe_flush()
+
+
+def collect(directory, attempts=3):
+    """Add up the samples from :data:`ARCHIVE` and every worker's file in
+    ``directory``.
+
+    Returns:
+        dict: Maps ``(name, labels)`` to the total across workers.
+    """
+    samples = {}
+    for _ in range(attempts):
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return {}
+
+        try:
+            samples, merged = _read_archive(directory)
+        except ValueError:
+            # being replaced under us
+            continue
+
+        complete = True
+        for name in names:
+            if not (name.startswith(_FILE_PREFIX) and name.endswith('.json')):
+                continue
+            if name in merged:
+                continue
+            try:
+                worker = _read_samples(os.path.join(directory, name))
+            except FileNotFoundError:
+                # archived since the archive was read
+                complete = False
+                break
+            except ValueError:
+                continue
+
+            for key, value in worker.items():
+                samples[key] = samples.get(key, 0) + value
+
+        if complete:
+            return samples
+
+    return samples
+
+
+def _family(sample):
+    if sample in FAMILIES:
+        return sample
+    for suffix in _HISTOGRAM_SUFFIXES:
+        if sample.endswith(suffix) and sample[:-len(suffix)] in FAMILIES:
+            return sample[:-len(suffix)]
+    return None
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _sort_key(item):
+    (sample, labels), _ = item
+    labels = dict(labels)
+    bound = labels.pop('le', None)
+    return (
+        sorted(labels.items()),
+        _HISTOGRAM_SUFFIXES.index(sample[sample.rfind('_'):])
+        if sample.endswith(_HISTOGRAM_SUFFIXES) else 0,
+        float(bound) if bound is not None else 0.0,
+    )
+
+
+def render(samples):
+    """Format samples in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition, one family after another.
+    """
+    by_family = {}
+    for key, value in samples.items():
+        family = _family(key[0])
+        if family is not None:
+            by_family.setdefault(family, []).append((key, value))
+
+    lines = []
+    for family in sorted(by_family):
+        kind, help_text = FAMILIES[family]
+        lines.append('# HELP {} {}'.format(family, help_text))
+        lines.append('# TYPE {} {}'.format(family, kind))
+        for (sample, labels), value in sorted(by_family[family],
+                                              key=_sort_key):
+            label_text = ','.join('{}="{}"'.format(label, _escape(value))
+                                  for label, value in labels)
+            lines.append('{}{} {}'.format(
+                sample, '{' + label_text + '}' if label_text else '',
+                repr(float(value)),
+            ))
+
+    return '\n'.join(lines) + '\n'
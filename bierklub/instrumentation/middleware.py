@@ -0,0 +1,153 @@
+"""Per-request timing, reported as a ``Server-Timing`` header and a log line,
+and profiling of single requests.
+
+Requests are also counted towards the ``/metrics`` endpoint, see
+:mod:`instrumentation.metrics`.
+
+Turned on with ``settings.INSTRUMENTATION_ENABLED``. When it's off the
+middleware takes itself out of the stack and nothing is patched, so it costs
+nothing at all.
+"""
+import cProfile
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import db, metrics, profiling, slow_queries, timings
+
+logger = logging.getLogger('instrumentation.requests')
+
+#: The parts of a request reported on, in ``Server-Timing`` order.
+METRICS = (
+    ('db', 'Database'),
+    ('template', 'Templates'),
+    ('markdown', 'Markdown'),
+)
+
+
+class InstrumentationMiddleware(object):
+    """Time the SQL, template rendering and markdown in every request, and
+    log its slow queries (see :mod:`instrumentation.slow_queries`).
+
+    It should be first in ``MIDDLEWARE`` so the total covers the rest of the
+    stack.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        timings.instrument_templates()
+
+    def __call__(self, request):
+        request_timings = timings.start(request)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    for wrapper in (request_timings.query,
+                                    slow_queries.log_slow_query):
+                        stack.enter_context(db.execute_wrapper(
+                            wrapper, connection.alias
+                        ))
+                response = self.get_response(request)
+        finally:
+            timings.stop()
+        total = time.perf_counter() - started
+
+        record = self.get_record(request, response, request_timings, total)
+        if getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True):
+            response['Server-Timing'] = self.server_timing(request_timings,
+                                                           total)
+        logger.info(json.dumps(record, sort_keys=True), extra={
+            'instrumentation': record,
+        })
+        metrics.observe_request(record)
+
+        return response
+
+    @staticmethod
+    def get_record(request, response, request_timings, total):
+        """The structured log record for a request.
+
+        Returns:
+            dict: The method, path, view name and status of the request,
+            whether it came from the page cache, its total time and the time
+            and call count for each of :data:`METRICS`. Times are in
+            milliseconds.
+        """
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'page_cache': response.get('X-Page-Cache'),
+            'total_ms': round(total * 1000, 3),
+        }
+        for name, _ in METRICS:
+            record[name + '_ms'] = round(
+                request_timings.durations.get(name, 0.0) * 1000, 3
+            )
+            record[name + '_count'] = request_timings.counts[name]
+
+        return record
+
+    @staticmethod
+    def server_timing(request_timings, total):
+        metrics = []
+        for name, description in METRICS:
+            if name not in request_timings.durations:
+                continue
+            metrics.append('{};dur={:.3f};desc="{} ({})"'.format(
+                name, request_timings.durations[name] * 1000, description,
+                request_timings.counts[name],
+            ))
+        metrics.append('total;dur={:.3f}'.format(total * 1000))
+
+        return ', '.join(metrics)
+
+
+class ProfilingMiddleware(object):
+    """Run requests picked by :func:`instrumentation.profiling.
+    reason_to_profile` under cProfile and save the profiles.
+
+    It should be first in ``MIDDLEWARE`` so profiles cover the whole stack.
+    It's only installed when ``settings.PROFILING_DIR`` is set.
+    """
+
+    def __init__(self, get_response):
+        if not profiling.get_directory():
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = profiling.reason_to_profile(request)
+        if reason is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        # in case the request itself logged them out
+        if reason == profiling.STAFF and not profiling.is_staff(request):
+            return response
+
+        name = profiling.save(profiler, request, response, reason, duration)
+        if reason != profiling.SAMPLED:
+            response['X-Profile'] = name
+
+        return response
@@ -0,0 +1,218 @@
+"""Capturing cProfile profiles of single requests.
+
+A request is profiled, by :class:`instrumentation.middleware.
+ProfilingMiddleware`, when any of these is true:
+
+* A staff member asks for it by adding ``?profile`` to the URL.
+* It has an ``X-Profile`` header matching ``settings.PROFILING_SECRET``.
+* It's randomly sampled: ``settings.PROFILING_SAMPLE_RATES`` maps URL names
+  to the fraction of their requests to profile.
+
+Profiles are saved in pstats format under ``settings.PROFILING_DIR``, where
+``python -m pstats`` or snakeviz can open them. What they're of is kept in
+the file name, so listing them doesn't mean opening each one, and the oldest
+are removed past ``settings.PROFILING_MAX_FILES``.
+"""
+import io
+import os
+import pstats
+import random
+import re
+from collections import namedtuple
+from datetime import datetime
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib import auth
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+STAFF = 'staff'
+SECRET = 'secret'
+SAMPLED = 'sampled'
+
+HEADER = 'HTTP_X_PROFILE'
+
+_TIME_FORMAT = '%Y%m%dT%H%M%S.%f'
+_FILE_NAME = ('{time}_{view}_{method}_{status}_{duration:d}ms_{reason}'
+              '.prof')
+_FILE_NAME_RE = re.compile(
+    r'^(?P<time>\d{8}T\d{6}\.\d{6})_(?P<view>[\w.-]+)_(?P<method>[A-Z]+)_'
+    r'(?P<status>\d{3})_(?P<duration>\d+)ms_(?P<reason>[a-z]+)\.prof$'
+)
+
+
+class Profile(namedtuple('Profile', ['name', 'time', 'view', 'method',
+                                     'status', 'duration', 'reason'])):
+    """A saved profile, as described by its file name."""
+    __slots__ = ()
+
+    @classmethod
+    def from_name(cls, name):
+        """Parse a profile's file name.
+
+        Returns:
+            Profile: The profile, or None if ``name`` isn't a profile's.
+        """
+        match = _FILE_NAME_RE.match(name)
+        if match is None:
+            return None
+
+        time = timezone.make_aware(
+            datetime.strptime(match.group('time'), _TIME_FORMAT), timezone.utc
+        )
+        return cls(name, time, match.group('view').replace('.', ':'),
+                   match.group('method'), int(match.group('status')),
+                   int(match.group('duration')), match.group('reason'))
+
+
+def get_directory():
+    return getattr(settings, 'PROFILING_DIR', None)
+
+
+def _sampled_view(request):
+    rates = getattr(settings, 'PROFILING_SAMPLE_RATES', None)
+    if not rates:
+        return False
+
+    # one draw decides for every view: resolving the URL is only worth it
+    # when the draw is under the highest rate
+    draw = random.random()
+    if draw >= max(rates.values()):
+        return False
+
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+
+    return draw < rates.get(match.view_name, 0)
+
+
+def reason_to_profile(request):
+    """Why ``request`` should be profiled, if it should be.
+
+    This runs before authentication, so a ``?profile`` request looks up the
+    user in its session itself, and is only profiled for active staff.
+
+    Returns:
+        str: :data:`SECRET`, :data:`STAFF` or :data:`SAMPLED`, or None.
+    """
+    secret = getattr(settings, 'PROFILING_SECRET', None)
+    header = request.META.get(HEADER)
+    if secret and header and constant_time_compare(header, secret):
+        return SECRET
+
+    if 'profile' in request.GET and _session_is_staff(request):
+        return STAFF
+
+    if _sampled_view(request):
+        return SAMPLED
+
+    return None
+
+
+def _session_is_staff(request):
+    """Whether the user logged in to the request's session is staff, found
+    the way ``AuthenticationMiddleware`` will find them.
+    """
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return False
+
+    engine = import_module(settings.SESSION_ENGINE)
+    user = auth.get_user(SimpleNamespace(
+        session=engine.SessionStore(session_key)
+    ))
+    return bool(user.is_active and user.is_staff)
+
+
+def is_staff(request):
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def save(profiler, request, response, reason, duration):
+    """Save a finished profile.
+
+    Args:
+        profiler (cProfile.Profile): The profiler, stopped.
+        request (django.http.HttpRequest): The request it profiled.
+        response (django.http.HttpResponse): The response to the request.
+        reason (str): Why the request was profiled.
+        duration (float): How long the request took, in seconds.
+
+    Returns:
+        str: The profile's file name.
+    """
+    directory = get_directory()
+    os.makedirs(directory, exist_ok=True)
+
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match and match.view_name else 'none'
+    name = _FILE_NAME.format(
+        time=timezone.now().astimezone(timezone.utc).strftime(_TIME_FORMAT),
+        view=re.sub(r'[^\w-]', '.', view), method=request.method,
+        status=response.status_code, duration=int(duration * 1000),
+        reason=reason,
+    )
+    profiler.dump_stats(os.path.join(directory, name))
+    prune()
+
+    return name
+
+
+def list_profiles():
+    """Every saved profile, newest first.
+
+    Returns:
+        list[Profile]: The profiles.
+    """
+    directory = get_directory()
+    try:
+        names = os.listdir(directory) if directory else []
+    except FileNotFoundError:
+        names = []
+
+    profiles = (Profile.from_name(name) for name in names)
+    return sorted((profile for profile in profiles if profile is not None),
+                  key=lambda profile: profile.time, reverse=True)
+
+
+def get_path(name):
+    """The path to the profile called ``name``.
+
+    Returns:
+        str: The path, or None if there's no such profile. Only names of
+        profiles are accepted, so this never points outside the directory.
+    """
+    directory = get_directory()
+    if not directory or Profile.from_name(name) is None:
+        return None
+
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
+
+
+def prune():
+    """Remove the oldest profiles past ``settings.PROFILING_MAX_FILES``."""
+    limit = getattr(settings, 'PROFILING_MAX_FILES', 500)
+    for profile in list_profiles()[limit:]:
+        try:
+            os.remove(os.path.join(get_directory(), profile.name))
+        except FileNotFoundError:
+            pass
+
+
+def format_stats(path, sort='cumulative', limit=60):
+    """The top functions in a profile, as ``pstats`` prints them.
+
+    Returns:
+        str: The report.
+    """
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,81 @@
+"""Logging SQL statements slower than ``settings.SLOW_QUERY_THRESHOLD_MS``.
+
+:class:`instrumentation.middleware.InstrumentationMiddleware` runs every
+query in a request through :func:`log_slow_query`. Slow ones are logged to
+``instrumentation.slow_queries`` with the view that ran them and the last few
+frames of our own code that led there. The query's parameters aren't logged,
+since they can hold emails and password hashes.
+"""
+import json
+import logging
+import os
+import time
+import traceback
+
+from django.conf import settings
+
+from . import timings
+
+logger = logging.getLogger('instrumentation.slow_queries')
+
+#: How many of our own frames to show for each slow query.
+STACK_DEPTH = 5
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_OWN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_threshold():
+    """The slow query threshold in seconds, or None if it's off."""
+    threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+    return None if threshold is None else threshold / 1000
+
+
+def stack_summary(depth=STACK_DEPTH):
+    """Where in the project the current code was called from.
+
+    Frames from Django, other libraries and this app are left out, so it
+    points at the view, model or template tag to look at.
+
+    Returns:
+        list[str]: Up to ``depth`` ``"path:line in function"`` entries,
+        innermost last.
+    """
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_PROJECT_DIR)
+        and not frame.filename.startswith(_OWN_DIR)
+        and 'site-packages' not in frame.filename
+    ]
+    return ['{}:{} in {}'.format(os.path.relpath(frame.filename,
+                                                 _PROJECT_DIR),
+                                 frame.lineno, frame.name)
+            for frame in frames[-depth:]]
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """An ``execute_wrapper`` logging queries over the threshold."""
+    threshold = get_threshold()
+    if threshold is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if duration >= threshold:
+            request_timings = timings.current()
+            request = request_timings and request_timings.request
+            match = getattr(request, 'resolver_match', None)
+            record = {
+                'sql': sql,
+                'many': many,
+                'duration_ms': round(duration * 1000, 3),
+                'view': match.view_name if match else None,
+                'path': request.path if request is not None else None,
+                'stack': stack_summary(),
+            }
+            logger.warning(json.dumps(record, sort_keys=True), extra={
+                'slow_query': record,
+            })
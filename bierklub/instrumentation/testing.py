@@ -0,0 +1,60 @@
+"""Test helpers for keeping views' query counts in check."""
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin(object):
+    """Fail tests when a view runs more queries than its budget.
+
+    Budgets live in a JSON file, named by ``query_budget_file``, mapping URL
+    names to the most queries each HTTP method may run::
+
+        {"klubevents:index": {"GET": 2}}
+
+    Raising a budget is then a reviewed change to that file, rather than
+    something an N+1 slips past quietly. Every view checked has to have a
+    budget; savepoints count as queries.
+    """
+    query_budget_file = None
+
+    @classmethod
+    def get_query_budgets(cls):
+        if '_query_budgets' not in cls.__dict__:
+            with open(cls.query_budget_file) as f:
+                cls._query_budgets = json.load(f)
+
+        return cls._query_budgets
+
+    def assertQueryBudget(self, method, path, data=None, **extra):
+        """Request ``path`` with the test client and check the queries it
+        ran against its view's budget.
+
+        Returns:
+            django.http.HttpResponse: The response.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data,
+                                                            **extra)
+            if response.streaming:
+                # a streaming response runs its queries as it's read
+                response.streaming_content = list(response.streaming_content)
+
+        view = response.resolver_match.view_name
+        budget = self.get_query_budgets().get(view, {}).get(method.upper())
+        if budget is None:
+            self.fail('{} has no query budget for {} in {}.'.format(
+                view, method.upper(), self.query_budget_file
+            ))
+
+        if len(queries) > budget:
+            self.fail(
+                '{} {} ran {} queries, over its budget of {}:\n{}'.format(
+                    method.upper(), view, len(queries), budget,
+                    '\n'.join('{}. {}'.format(i, query['sql'])
+                              for i, query in enumerate(queries, 1)),
+                )
+            )
+
+        return response
@@ -0,0 +1,543 @@
+import datetime
+import json
+import os
+import pstats
+import re
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from klubevents import cache as page_cache
+from klubevents.models import Event
+
+from . import db, metrics, profiling, timings
+
+
+def create_event(**kwargs):
+    now = timezone.now()
+    defaults = dict(name='Lager Night', description='Beer.', number=1,
+                    location='123 Fake Street', date=now,
+                    published_date=now - datetime.timedelta(days=1))
+    defaults.update(kwargs)
+    return Event.objects.create(**defaults)
+
+
+class ExecuteWrapperTests(TestCase):
+    def test_wrapper_sees_queries(self):
+        """Wrappers should see each query, and only inside the block."""
+        seen = []
+
+        def wrapper(execute, sql, params, many, context):
+            seen.append((sql, params, many))
+            return execute(sql, params, many, context)
+
+        with db.execute_wrapper(wrapper):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT %s', [1])
+                self.assertEqual(cursor.fetchone(), (1,))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 2')
+
+        self.assertEqual(seen, [('SELECT %s', [1], False)])
+
+    def test_queries_still_logged(self):
+        """Wrapping shouldn't hide queries from the debug cursor."""
+        with db.execute_wrapper(lambda execute, *args: execute(*args)):
+            with CaptureQueriesContext(connection) as queries:
+                Event.objects.count()
+
+        self.assertEqual(len(queries), 1)
+
+
+class TimerTests(TestCase):
+    def tearDown(self):
+        timings.stop()
+
+    def test_timer_outside_request(self):
+        """Timers should do nothing when no request is being timed."""
+        with timings.timer('markdown'):
+            pass
+
+        self.assertIsNone(timings.current())
+
+    def test_nested_timers(self):
+        """Only the outermost of nested timers should count."""
+        request_timings = timings.start()
+        with timings.timer('template'):
+            with timings.timer('template'):
+                pass
+        with timings.timer('template'):
+            pass
+
+        self.assertEqual(request_timings.counts['template'], 2)
+
+    def test_markdown_timed(self):
+        request_timings = timings.start()
+        create_event()
+
+        self.assertEqual(request_timings.counts['markdown'], 4)
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class InstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        self.event = create_event()
+        self.url = reverse('klubevents:detail', args=(self.event.pk,))
+
+    def get(self, url):
+        with self.assertLogs('instrumentation.requests', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(url)
+
+        self.assertEqual(len(logs.records), 1)
+        return resp, logs.records[0], len(queries)
+
+    def test_server_timing(self):
+        resp, _, _ = self.get(self.url)
+
+        metrics = [metric.split(';')[0]
+                   for metric in resp['Server-Timing'].split(', ')]
+        self.assertEqual(metrics, ['db', 'template', 'total'])
+
+    def test_log_record(self):
+        """Every request should log one line of JSON."""
+        _, record, queries = self.get(self.url)
+
+        logged = json.loads(record.getMessage())
+        self.assertEqual(logged, record.instrumentation)
+        self.assertEqual(logged['view'], 'klubevents:detail')
+        self.assertEqual(logged['status'], 200)
+        self.assertEqual(logged['db_count'], queries)
+        self.assertEqual(logged['template_count'], 1)
+        self.assertGreater(logged['total_ms'], 0)
+        self.assertGreaterEqual(logged['total_ms'], logged['db_ms'])
+
+    def test_not_found(self):
+        _, record, _ = self.get('/nowhere/')
+
+        self.assertEqual(record.instrumentation['status'], 404)
+        self.assertIsNone(record.instrumentation['view'])
+
+    @override_settings(INSTRUMENTATION_SERVER_TIMING=False)
+    def test_server_timing_off(self):
+        resp, _, _ = self.get(self.url)
+
+        self.assertFalse(resp.has_header('Server-Timing'))
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        self.event = create_event()
+        self.url = reverse('klubevents:detail', args=(self.event.pk,))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_logged(self):
+        """Slow queries should be logged with their view and origin."""
+        with self.assertLogs('instrumentation', 'INFO') as logs:
+            self.client.get(self.url)
+
+        slow = [record.slow_query for record in logs.records
+                if record.name == 'instrumentation.slow_queries']
+        self.assertEqual(len(slow), 3)
+        self.assertTrue(all(query['view'] == 'klubevents:detail'
+                            for query in slow))
+        self.assertTrue(slow[0]['sql'].startswith('SELECT'))
+        # the first query is for the conditional GET validators
+        self.assertIn('klubevents/conditional.py', slow[0]['stack'][-1])
+        self.assertFalse(any('instrumentation' in frame
+                             for query in slow for frame in query['stack']))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_turned_off(self):
+        with self.assertLogs('instrumentation', 'INFO') as logs:
+            self.client.get(self.url)
+
+        self.assertEqual([record.name for record in logs.records],
+                         ['instrumentation.requests'])
+
+
+class InstrumentationDisabledTests(TestCase):
+    def test_disabled(self):
+        """The middleware should stay out of the way when turned off."""
+        event = create_event()
+
+        resp = self.client.get(reverse('klubevents:detail', args=(event.pk,)))
+
+        self.assertFalse(resp.has_header('Server-Timing'))
+
+
+def scrape(text):
+    """A stand-in for Prometheus: parse an exposition into samples.
+
+    Returns:
+        dict: Maps ``(name, frozenset(labels))`` to each sample's value, and
+        ``'# TYPE', family`` to each family's type.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, family, kind = line.split(' ')
+            samples['# TYPE', family] = kind
+            continue
+        if not line or line.startswith('#'):
+            continue
+
+        sample, value = line.rsplit(' ', 1)
+        labels = frozenset()
+        if '{' in sample:
+            sample, label_text = sample[:-1].split('{', 1)
+            labels = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"',
+                                          label_text))
+        samples[sample, labels] = float(value)
+
+    return samples
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(setattr, metrics, '_store', None)
+        self.settings = override_settings(INSTRUMENTATION_ENABLED=True,
+                                          METRICS_DIR=self.directory)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        self.event = create_event()
+        self.url = reverse('klubevents:detail', args=(self.event.pk,))
+
+    def scrape(self):
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            resp = self.client.get(reverse('metrics'))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        return scrape(resp.content.decode('utf-8'))
+
+    def test_requests_counted(self):
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            for _ in range(3):
+                self.client.get(self.url)
+            self.client.get('/nowhere/')
+
+        samples = self.scrape()
+
+        detail = frozenset({('view', 'klubevents:detail'), ('method', 'GET'),
+                            ('status', '200')})
+        self.assertEqual(samples['bierklub_http_requests_total', detail], 3)
+        missing = frozenset({('view', 'none'), ('method', 'GET'),
+                             ('status', '404')})
+        self.assertEqual(samples['bierklub_http_requests_total', missing], 1)
+        self.assertEqual(samples['# TYPE', 'bierklub_http_requests_total'],
+                         'counter')
+
+        view = frozenset({('view', 'klubevents:detail')})
+        self.assertGreater(samples['bierklub_db_queries_total', view], 0)
+        self.assertIn(('bierklub_db_query_duration_seconds_total', view),
+                      samples)
+
+    def test_not_found_by_prefix(self):
+        """404s should be counted by their first path segment, up to a
+        limit.
+        """
+        paths = ['/wp-admin/install.php', '/wp-admin/setup.php', '/.env',
+                 '/events/999999/', '/a/', '/b/']
+        self.addCleanup(setattr, metrics, 'NOT_FOUND_PREFIXES',
+                        metrics.NOT_FOUND_PREFIXES)
+        metrics.NOT_FOUND_PREFIXES = 3
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            for path in paths:
+                self.client.get(path)
+
+        samples = self.scrape()
+
+        def count(prefix):
+            return samples['bierklub_http_not_found_total',
+                           frozenset({('prefix', prefix)})]
+
+        self.assertEqual(count('/wp-admin/'), 2)
+        self.assertEqual(count('/.env'), 1)
+        self.assertEqual(count('/events/'), 1)
+        self.assertEqual(count('other'), 2)
+
+    @override_settings(PAGE_CACHE_ALIAS='pages_local')
+    def test_page_cache_counted(self):
+        """Page cache hits and misses should be counted from the
+        ``X-Page-Cache`` header, and add up for ``manage.py pagecache``.
+        """
+        page_cache.get_page_cache().clear()
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            for _ in range(3):
+                self.client.get(self.url)
+
+        samples = self.scrape()
+
+        def count(outcome):
+            return samples['bierklub_page_cache_total',
+                           frozenset({('view', 'klubevents:detail'),
+                                      ('outcome', outcome)})]
+
+        self.assertEqual(count('miss'), 1)
+        self.assertEqual(count('hit'), 2)
+        self.assertEqual(page_cache.get_stats(), {'hits': 2, 'misses': 1})
+
+    def test_latency_histogram(self):
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            for _ in range(2):
+                self.client.get(self.url)
+
+        samples = self.scrape()
+
+        self.assertEqual(
+            samples['# TYPE', 'bierklub_http_request_duration_seconds'],
+            'histogram',
+        )
+        buckets = sorted(
+            (float(dict(labels)['le']), value)
+            for (name, labels), value in samples.items()
+            if name == 'bierklub_http_request_duration_seconds_bucket'
+            and ('view', 'klubevents:detail') in labels
+        )
+        self.assertEqual(buckets[-1], (float('inf'), 2))
+        counts = [value for _, value in buckets]
+        self.assertEqual(counts, sorted(counts))
+
+        view = frozenset({('view', 'klubevents:detail')})
+        self.assertEqual(
+            samples['bierklub_http_request_duration_seconds_count', view], 2)
+        self.assertGreater(
+            samples['bierklub_http_request_duration_seconds_sum', view], 0)
+
+    def test_workers_added_up(self):
+        """Samples from every worker's file should be added together."""
+        other = metrics.Store(self.directory, pid=-1)
+        other.inc('bierklub_http_requests_total', {
+            'view': 'klubevents:detail', 'method': 'GET', 'status': '200',
+        }, 5)
+        other.observe('bierklub_http_request_duration_seconds',
+                      {'view': 'klubevents:detail'}, 20.0)
+        other.flush()
+
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            self.client.get(self.url)
+
+        samples = self.scrape()
+
+        detail = frozenset({('view', 'klubevents:detail'), ('method', 'GET'),
+                            ('status', '200')})
+        self.assertEqual(samples['bierklub_http_requests_total', detail], 6)
+        slow = frozenset({('view', 'klubevents:detail'), ('le', '+Inf')})
+        self.assertEqual(
+            samples['bierklub_http_request_duration_seconds_bucket', slow], 2)
+        fast = frozenset({('view', 'klubevents:detail'), ('le', '10.0')})
+        self.assertEqual(
+            samples['bierklub_http_request_duration_seconds_bucket', fast], 1)
+
+    def dead_worker(self, pid, name, labels, value):
+        """A worker's flushed file, as it's left when the worker exits."""
+        store = metrics.Store(self.directory, pid=pid)
+        store.inc(name, labels, value)
+        store.flush()
+        store.lock_file.close()
+        return store
+
+    def test_pid_reused(self):
+        """A worker that gets a dead worker's pid shouldn't overwrite its
+        counts.
+        """
+        labels = {'view': 'klubevents:detail', 'method': 'GET',
+                  'status': '200'}
+        self.dead_worker(1, 'bierklub_http_requests_total', labels, 5)
+        self.dead_worker(1, 'bierklub_http_requests_total', labels, 2)
+
+        samples = metrics.collect(self.directory)
+
+        key = ('bierklub_http_requests_total',
+               tuple(sorted(labels.items())))
+        self.assertEqual(samples[key], 7)
+
+    def test_dead_workers_archived(self):
+        """Dead workers' files should be folded into the archive, keeping
+        their counts, and live workers' files left alone.
+        """
+        labels = {'view': 'klubevents:detail', 'method': 'GET',
+                  'status': '200'}
+        dead = self.dead_worker(1, 'bierklub_http_requests_total', labels, 5)
+        live = metrics.Store(self.directory, pid=2)
+        live.inc('bierklub_http_requests_total', labels, 1)
+        live.flush()
+        before = metrics.collect(self.directory)
+
+        archived = metrics.archive(self.directory)
+
+        self.assertEqual(archived, [os.path.basename(dead.path)])
+        self.assertEqual(metrics.collect(self.directory), before)
+        self.assertFalse(os.path.exists(dead.path))
+        self.assertTrue(os.path.exists(live.path))
+
+        # and again, with nothing left to archive
+        self.assertEqual(metrics.archive(self.directory), [])
+        self.assertEqual(metrics.collect(self.directory), before)
+
+    def test_archive_caps_not_found(self):
+        """The archive should keep no more 404 prefixes than a worker."""
+        self.addCleanup(setattr, metrics, 'NOT_FOUND_PREFIXES',
+                        metrics.NOT_FOUND_PREFIXES)
+        metrics.NOT_FOUND_PREFIXES = 2
+        for pid, prefix in enumerate(['/a/', '/b/', '/c/', '/a/']):
+            self.dead_worker(pid, 'bierklub_http_not_found_total',
+                             {'prefix': prefix}, 1)
+
+        metrics.archive(self.directory)
+
+        samples = metrics.collect(self.directory)
+        prefixes = {dict(labels)['prefix']: value
+                    for (name, labels), value in samples.items()}
+        # which prefix misses out depends on the order the files are merged
+        self.assertEqual(sum(prefixes.values()), 4)
+        self.assertEqual(len(prefixes), 3)
+        self.assertIn('other', prefixes)
+
+    def test_label_escaping(self):
+        text = metrics.render({
+            ('bierklub_http_requests_total', (('view', 'a "b"\\c\n'),)): 1,
+        })
+
+        self.assertIn(r'view="a \"b\"\\c\n"', text)
+
+    @override_settings(METRICS_DIR=None)
+    def test_turned_off(self):
+        with self.assertLogs('instrumentation.requests', 'INFO'):
+            resp = self.client.get(reverse('metrics'))
+
+        self.assertEqual(resp.status_code, 404)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.settings = override_settings(PROFILING_DIR=self.directory,
+                                          PROFILING_SECRET='sekrit',
+                                          PROFILING_SAMPLE_RATES={})
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        self.event = create_event()
+        self.url = reverse('klubevents:detail', args=(self.event.pk,))
+
+    def login(self, is_staff=True):
+        User.objects.create_user('admin', 'admin@example.com', 'admin',
+                                 is_staff=is_staff)
+        self.client.login(username='admin', password='admin')
+
+    def test_staff_profile(self):
+        """Staff should be able to profile a request with ?profile."""
+        self.login()
+
+        resp = self.client.get(self.url, {'profile': ''})
+
+        self.assertEqual(resp.status_code, 200)
+        profiles = profiling.list_profiles()
+        self.assertEqual([profile.name for profile in profiles],
+                         [resp['X-Profile']])
+        self.assertEqual(profiles[0].view, 'klubevents:detail')
+        self.assertEqual(profiles[0].status, 200)
+        self.assertEqual(profiles[0].reason, profiling.STAFF)
+
+        # a real pstats file, reaching down into the view
+        stats = pstats.Stats(os.path.join(self.directory, profiles[0].name))
+        self.assertTrue(any(function == 'get_object'
+                            for _, _, function in stats.stats))
+
+    def test_not_staff(self):
+        """Nobody else should be able to profile with ?profile."""
+        self.client.get(self.url, {'profile': ''})
+        self.login(is_staff=False)
+        resp = self.client.get(self.url, {'profile': ''})
+
+        self.assertFalse(resp.has_header('X-Profile'))
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_not_staff_not_profiled(self):
+        """Only a staff member's session should be profiled at all, not any
+        request with a session cookie.
+        """
+        factory = RequestFactory()
+        self.login(is_staff=False)
+
+        for cookie in ['made-up', self.client.cookies['sessionid'].value]:
+            request = factory.get(self.url, {'profile': ''})
+            request.COOKIES['sessionid'] = cookie
+            self.assertIsNone(profiling.reason_to_profile(request))
+
+    def test_secret_header(self):
+        resp = self.client.get(self.url, HTTP_X_PROFILE='sekrit')
+        self.assertTrue(resp.has_header('X-Profile'))
+
+        resp = self.client.get(self.url, HTTP_X_PROFILE='guess')
+        self.assertFalse(resp.has_header('X-Profile'))
+
+        self.assertEqual([profile.reason
+                          for profile in profiling.list_profiles()],
+                         [profiling.SECRET])
+
+    def test_sampling(self):
+        """Sampled requests should be profiled by URL name."""
+        rates = {'klubevents:detail': 1.0, 'klubevents:index': 0.0}
+        with override_settings(PROFILING_SAMPLE_RATES=rates):
+            resp = self.client.get(self.url)
+            self.client.get(reverse('klubevents:index'))
+            self.client.get(reverse('klubevents:archive'))
+
+        # nobody asked for it, so nobody's told
+        self.assertFalse(resp.has_header('X-Profile'))
+        self.assertEqual([(profile.view, profile.reason)
+                          for profile in profiling.list_profiles()],
+                         [('klubevents:detail', profiling.SAMPLED)])
+
+    def test_pruning(self):
+        with override_settings(PROFILING_MAX_FILES=2):
+            for _ in range(3):
+                self.client.get(self.url, HTTP_X_PROFILE='sekrit')
+
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_get_path(self):
+        """Only saved profiles should be reachable by name."""
+        self.assertIsNone(profiling.get_path('../db.sqlite3'))
+        self.assertIsNone(profiling.get_path(
+            '20261017T143501.123456_none_GET_404_1ms_staff.prof'
+        ))
+
+    def test_admin_pages(self):
+        self.login()
+        name = self.client.get(self.url, {'profile': ''})['X-Profile']
+
+        resp = self.client.get(reverse('instrumentation:profile_list'))
+        self.assertContains(resp, 'klubevents:detail')
+        self.assertContains(resp, reverse('instrumentation:profile_detail',
+                                          args=(name,)))
+
+        resp = self.client.get(reverse('instrumentation:profile_detail',
+                                       args=(name,)), {'sort': 'tottime'})
+        self.assertContains(resp, 'function calls')
+        self.assertContains(resp, 'Ordered by: internal time')
+
+        resp = self.client.get(reverse('instrumentation:profile_download',
+                                       args=(name,)))
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            self.assertEqual(b''.join(resp.streaming_content), f.read())
+
+    def test_admin_pages_staff_only(self):
+        resp = self.client.get(reverse('instrumentation:profile_list'))
+
+        self.assertEqual(resp.status_code, 302)
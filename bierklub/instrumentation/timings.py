@@ -0,0 +1,108 @@
+"""Where the time in a request goes.
+
+:class:`instrumentation.middleware.InstrumentationMiddleware` starts a
+:class:`RequestTimings` for each request, and anything that wants its time
+accounted for wraps itself in :func:`timer`. Outside of an instrumented
+request :func:`timer` does nothing beyond a thread-local lookup, so it's safe
+to leave in library code like :mod:`klubevents.rendering`.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class RequestTimings(object):
+    """The time spent in, and number of calls to, each part of a request.
+
+    Timers nest: while a timer is running, starting another one with the same
+    name only counts the outermost, so an ``{% include %}`` isn't counted on
+    top of the template including it.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.durations = OrderedDict()
+        self.counts = Counter()
+        self._running = Counter()
+
+    def add(self, name, seconds, count=1):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] += count
+
+    @contextmanager
+    def timer(self, name):
+        self._running[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._running[name] -= 1
+            if not self._running[name]:
+                self.add(name, time.perf_counter() - started)
+
+    def query(self, execute, sql, params, many, context):
+        """An ``execute_wrapper`` timing every query as ``db``."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+
+def start(request=None):
+    """Start timing a request on this thread.
+
+    Args:
+        request (django.http.HttpRequest): The request being timed.
+
+    Returns:
+        RequestTimings: The timings for the request.
+    """
+    _local.timings = RequestTimings(request)
+    return _local.timings
+
+
+def stop():
+    _local.timings = None
+
+
+def current():
+    """The timings for this thread's request, or None outside of one."""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def timer(name):
+    """Count the time spent in the block towards ``name`` on the current
+    request.
+    """
+    timings = current()
+    if timings is None:
+        yield
+        return
+
+    with timings.timer(name):
+        yield
+
+
+def instrument_templates():
+    """Time every template render as ``template``.
+
+    Django 1.11 has no signal for template rendering outside of the test
+    runner, so this wraps :meth:`django.template.base.Template.render`, once.
+    """
+    from django.template.base import Template
+
+    render = Template.render
+    if getattr(render, 'instrumented', False):
+        return
+
+    def instrumented_render(self, context):
+        with timer('template'):
+            return render(self, context)
+    instrumented_render.instrumented = True
+
+    Template.render = instrumented_render
@@ -0,0 +1,18 @@
+from django.conf.urls import url
+
+from . import views
+
+app_name = 'instrumentation'
+urlpatterns = [
+    # ex: /admin/profiles/
+    url(r'^$', views.profile_list, name='profile_list'),
+
+    # ex: /admin/profiles/20261017T143501.123456_klubevents.detail_GET_200_
+    # 152ms_staff.prof
+    url(r'^(?P<name>[\w.-]+\.prof)$', views.profile_detail,
+        name='profile_detail'),
+
+    # ex: /admin/profiles/<name>/download
+    url(r'^(?P<name>[\w.-]+\.prof)/download$', views.profile_download,
+        name='profile_download'),
+]
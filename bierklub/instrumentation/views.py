@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from . import metrics as request_metrics
+from . import profiling
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+#: The orders a profile's functions can be listed in.
+SORT_ORDERS = ('cumulative', 'tottime', 'ncalls')
+
+
+@require_safe
+def metrics(request):
+    """Every worker's request metrics, for Prometheus to scrape."""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        raise Http404('Metrics are turned off.')
+
+    # this worker's latest counts, rather than as of its last flush
+    store = request_metrics.get_store()
+    store.flush()
+
+    return HttpResponse(
+        request_metrics.render(request_metrics.collect(directory)),
+        content_type=CONTENT_TYPE,
+    )
+
+
+@staff_member_required
+def profile_list(request):
+    """The profiles captured by :class:`instrumentation.middleware.
+    ProfilingMiddleware`, newest first.
+    """
+    return render(request, 'instrumentation/profile_list.html', dict(
+        admin.site.each_context(request),
+        title='Request profiles',
+        profiles=profiling.list_profiles(),
+        directory=profiling.get_directory(),
+    ))
+
+
+@staff_member_required
+def profile_detail(request, name):
+    path = profiling.get_path(name)
+    if path is None:
+        raise Http404('No such profile.')
+
+    sort = request.GET.get('sort')
+    if sort not in SORT_ORDERS:
+        sort = SORT_ORDERS[0]
+
+    return render(request, 'instrumentation/profile_detail.html', dict(
+        admin.site.each_context(request),
+        title='Profile of {}'.format(name),
+        profile=profiling.Profile.from_name(name),
+        sort=sort,
+        sort_orders=SORT_ORDERS,
+        stats=profiling.format_stats(path, sort),
+    ))
+
+
+@staff_member_required
+def profile_download(request, name):
+    path = profiling.get_path(name)
+    if path is None:
+        raise Http404('No such profile.')
+
+    response = FileResponse(open(path, 'rb'),
+                            content_type='application/octet-stream')
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(name)
+    return response
@@ -1,6 +1,13 @@
+import csv
+import io
+
 from django import forms
+from django.conf.urls import url
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
 
+from . import export, importer, search
 from .models import Event, Member
 
 
@@ -15,6 +22,34 @@ class EventModelForm(forms.ModelForm):
         fields = '__all__'
 
 
+class MemberImportForm(forms.Form):
+    file = forms.FileField(
+        label='CSV file',
+        help_text='With "email", "name" and "event_id" or "event_number" '
+                  'columns.',
+    )
+
+
+class WhenListFilter(admin.SimpleListFilter):
+    """Narrows the change list down in SQL with :class:`EventQuerySet`."""
+    title = 'when'
+    parameter_name = 'when'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('upcoming', 'Upcoming'),
+            ('soon', 'Soon'),
+            ('published', 'Published'),
+            ('recently_published', 'Recently published'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() in dict(self.lookup_choices):
+            return getattr(queryset, self.value())()
+
+        return queryset
+
+
 class EventAdmin(admin.ModelAdmin):
     fieldsets = [
         (None, {'fields': ['name', 'number', 'date', 'location']}),
@@ -24,10 +59,104 @@ class EventAdmin(admin.ModelAdmin):
     ]
 
     form = EventModelForm
-    list_display = ('name', 'location', 'number', 'date', 'is_soon',)
-    list_filter = ('date',)
+    # a multi-select would render every Member on every change page, so
+    # attendees are picked from the searchable, paginated Member change list
+    raw_id_fields = ('attendees',)
+    list_display = ('name', 'location', 'number', 'date', 'attendee_count',
+                    'is_soon',)
+    list_filter = (WhenListFilter, 'date',)
     search_fields = ('name', 'location',)
+    show_full_result_count = False
+    actions = ('export_attendees',)
+
+    def export_attendees(self, request, queryset):
+        """Stream the guest lists of the selected events as one CSV."""
+        events = queryset.only('name').order_by('date')
+        return export.response(export.attendees(events.iterator()),
+                               export.ATTENDEE_COLUMNS, 'csv', 'attendees')
+    export_attendees.short_description = 'Export attendees as CSV'
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search with the full-text index rather than LIKE scans."""
+        if not search_term:
+            return queryset, False
+
+        return search.filter_events(queryset, search_term), False
+
+
+class AttendanceInline(admin.TabularInline):
+    """The events a Member is going to, one row per event.
+
+    Rows are read-only, since picking an event from a drop-down would render
+    every Event, and deleting a row here would skip the ``m2m_changed``
+    signals that keep ``attendee_count`` right. RSVPs are changed from the
+    event's own page.
+    """
+    model = Event.attendees.through
+    fields = ('event', 'event_date',)
+    readonly_fields = ('event', 'event_date',)
+    extra = 0
+    can_delete = False
+    verbose_name = 'attendance'
+    verbose_name_plural = 'attendance'
+
+    def get_queryset(self, request):
+        return (super(AttendanceInline, self).get_queryset(request)
+                .select_related('event')
+                .order_by('-event__date'))
+
+    def has_add_permission(self, request):
+        return False
+
+    def event_date(self, attendance):
+        return attendance.event.date
+    event_date.short_description = 'date'
+
+
+class MemberAdmin(admin.ModelAdmin):
+    fields = ('name', 'email', 'join_date', 'user',)
+    inlines = (AttendanceInline,)
+    raw_id_fields = ('user',)
+    list_display = ('name', 'email', 'join_date', 'user',)
+    list_select_related = ('user',)
+    search_fields = ('name', 'email',)
+    show_full_result_count = False
+    change_list_template = 'admin/klubevents/member/change_list.html'
+
+    def get_urls(self):
+        return [
+            url(r'^import/$', self.admin_site.admin_view(self.import_view),
+                name='klubevents_member_import'),
+        ] + super(MemberAdmin, self).get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV of members and RSVPs to :mod:`klubevents.importer`."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        result = None
+        form = MemberImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            f = io.TextIOWrapper(form.cleaned_data['file'].file,
+                                 encoding='utf-8-sig', newline='')
+            result = importer.import_csv(csv.DictReader(f))
+            if result.read_error:
+                # the rows before it are in, and the result says how many
+                form.add_error('file', 'This is not a UTF-8 CSV file all '
+                                       'the way through.')
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title='Import members',
+            form=form,
+            result=result,
+            # a sheet full of mistakes shouldn't make a page full of them
+            errors=result.errors[:100] if result else [],
+        )
+        return TemplateResponse(request,
+                                'admin/klubevents/member/import.html', context)
 
 
 admin.site.register(Event, EventAdmin)
-admin.site.register(Member)
+admin.site.register(Member, MemberAdmin)
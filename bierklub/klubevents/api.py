@@ -0,0 +1,131 @@
+"""A read-only JSON view of the published events.
+
+Events are serialized straight from ``values()`` rows, selecting only the
+columns asked for with ``fields=``, so a request never builds Event instances
+or renders markdown; the HTML fields are the copies rendered when the event
+was saved.
+"""
+from .models import Event
+from .pagination import PER_PAGE, Cursor, paginate_published
+
+#: Every column the API can return.
+FIELDS = ('id', 'name', 'number', 'date', 'location', 'published_date',
+          'updated_at', 'attendee_count', 'preamble', 'description',
+          'additional_notes', 'title_html', 'preamble_html',
+          'description_html', 'additional_notes_html')
+
+#: Fields that aren't columns: the names of everyone attending, which only a
+#: single event has.
+GUESTS = 'guests'
+
+#: What's returned when ``fields=`` isn't given.
+DEFAULT_FIELDS = ('id', 'name', 'number', 'date', 'location',
+                  'published_date', 'attendee_count')
+DEFAULT_DETAIL_FIELDS = DEFAULT_FIELDS + ('description', GUESTS)
+
+#: The most events on a page.
+MAX_PER_PAGE = 100
+
+
+class APIError(ValueError):
+    """A request the API can't answer, with a message for the client."""
+
+
+def parse_fields(value, defaults, extra=()):
+    """Work out which fields a request asked for.
+
+    Args:
+        value (str): The ``fields`` parameter, comma separated, or None.
+        defaults (tuple[str]): The fields to use when there's no ``value``.
+        extra (tuple[str]): Fields allowed here besides :data:`FIELDS`.
+
+    Returns:
+        list[str]: The fields, in the order asked for.
+
+    Raises:
+        APIError: If a field doesn't exist.
+    """
+    if not value:
+        return list(defaults)
+
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if not field or field in fields:
+            continue
+        if field not in FIELDS and field not in extra:
+            raise APIError('There is no "{}" field.'.format(field))
+        fields.append(field)
+
+    return fields
+
+
+def _values(queryset, fields, *required):
+    """A ``values()`` queryset of ``fields``, plus any ``required`` ones
+    the query itself needs.
+    """
+    columns = {field for field in fields if field in FIELDS}
+    columns.update(required)
+    return queryset.values(*columns)
+
+
+def _serialize(row, fields):
+    return {field: row[field] for field in fields if field in FIELDS}
+
+
+def list_events(fields, cursor=None, per_page=None):
+    """One page of published events, newest first.
+
+    Args:
+        fields (list[str]): What to include for each event.
+        cursor (str): Where the previous page left off, from its ``next``.
+        per_page (str): How many events to include, up to
+            :data:`MAX_PER_PAGE`.
+
+    Returns:
+        tuple(list[dict], str): The events, and the cursor for the next page,
+        or None if this is the last one.
+
+    Raises:
+        APIError: If the cursor or page size isn't valid.
+    """
+    try:
+        cursor = Cursor.decode(cursor) if cursor else None
+    except ValueError:
+        raise APIError('Invalid cursor.')
+
+    try:
+        per_page = min(int(per_page or PER_PAGE), MAX_PER_PAGE)
+    except ValueError:
+        raise APIError('Invalid limit.')
+    if per_page < 1:
+        raise APIError('Invalid limit.')
+
+    rows, next_cursor = paginate_published(
+        _values(Event.objects.all(), fields, 'id', 'published_date'),
+        cursor, per_page
+    )
+
+    return ([_serialize(row, fields) for row in rows],
+            next_cursor.encode() if next_cursor else None)
+
+
+def get_event(pk, fields):
+    """A single published event.
+
+    Returns:
+        dict: The event, or None if there's no such published event.
+    """
+    row = (_values(Event.objects.published().filter(pk=pk), fields, 'id')
+           .first())
+    if row is None:
+        return None
+
+    event = _serialize(row, fields)
+    if GUESTS in fields:
+        event[GUESTS] = list(Event.attendees.through.objects
+                             .filter(event_id=pk)
+                             .order_by('member_id')
+                             .values_list('member__name', flat=True))
+
+    return event
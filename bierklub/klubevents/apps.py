@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def install_search(sender, using, **kwargs):
+    """Put back the search triggers SQLite drops when a migration rebuilds
+    the event table.
+    """
+    from . import search
+
+    connection = connections[using]
+    if 'klubevents_event' in connection.introspection.table_names():
+        search.install(connection)
 
 
 class KlubeventsConfig(AppConfig):
     name = 'klubevents'
+
+    def ready(self):
+        from . import signals  # connects the receivers
+
+        post_migrate.connect(install_search, sender=self)
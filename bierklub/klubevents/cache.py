@@ -0,0 +1,191 @@
+"""Full-page caching for the public event pages.
+
+Anonymous visitors all see the same index, archive, detail and attending
+pages, and those only change when an Event is edited or someone RSVPs. So we
+keep the rendered pages in the cache named by ``settings.PAGE_CACHE_ALIAS``
+and throw them away when that happens (see :mod:`klubevents.signals`).
+
+Pages are grouped: every listing page shares the ``listings`` group, and the
+pages for a single event share that event's group. Each group has a random
+generation stored in the cache which is part of every page key, so
+invalidating a group is a single write that orphans all of its pages,
+whatever query strings they were cached under.
+
+Pages with a ``{% csrf_token %}`` are rendered with a placeholder token which
+is swapped for the visitor's own token whenever the page is served.
+
+Every page served through the cache says whether it was a hit or a miss in an
+``X-Page-Cache`` header, which :mod:`instrumentation.metrics` counts.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+
+CSRF_PLACEHOLDER = 'bierklubpagecachecsrftoken'
+
+LISTINGS = 'listings'
+
+GENERATION_KEY = 'page-cache:generation:{}'
+PAGE_KEY = 'page-cache:page:{}:{}'
+
+
+def get_page_cache():
+    """Return the page cache, or None if page caching is turned off."""
+    alias = getattr(settings, 'PAGE_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def event_group(event_id):
+    """The group for the pages about a single event."""
+    return 'event:{}'.format(event_id)
+
+
+def _generation(cache, group):
+    key = GENERATION_KEY.format(group)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+
+    return generation
+
+
+def _invalidate_now(groups):
+    cache = get_page_cache()
+    if cache is None:
+        return
+
+    cache.set_many({GENERATION_KEY.format(group): uuid.uuid4().hex
+                    for group in groups}, None)
+
+
+def invalidate(*groups):
+    """Throw away every cached page in ``groups``.
+
+    This happens straight away, so the current transaction sees it, and once
+    more when the transaction commits, so a page rendered from the old data
+    by another request in the meantime doesn't outlive it.
+    """
+    _invalidate_now(groups)
+    transaction.on_commit(lambda: _invalidate_now(groups))
+
+
+def invalidate_events(event_ids, listings=True):
+    """Throw away the cached pages for events.
+
+    Args:
+        event_ids (iterable[int]): The events that changed.
+        listings (bool): Whether the listing pages need to go too.
+    """
+    groups = [event_group(event_id) for event_id in event_ids]
+    if listings:
+        groups.append(LISTINGS)
+
+    invalidate(*groups)
+
+
+def get_stats():
+    """Add up the hits and misses every worker has counted, see
+    :mod:`instrumentation.metrics`.
+
+    Returns:
+        dict: ``hits`` and ``misses``.
+    """
+    from instrumentation import metrics
+
+    stats = {'hits': 0, 'misses': 0}
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return stats
+
+    for (name, labels), value in metrics.collect(directory).items():
+        if name == 'bierklub_page_cache_total':
+            outcome = dict(labels)['outcome']
+            stats['hits' if outcome == 'hit' else 'misses'] += int(value)
+
+    return stats
+
+
+def listing_timeout():
+    """How long a listing page can be cached for.
+
+    That's the page cache's usual timeout, unless an event is due to be
+    published before then, in which case it's until that event goes live.
+    """
+    from .models import Event
+
+    timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+    now = timezone.now()
+    upcoming = (Event.objects
+                .filter(published_date__gt=now)
+                .order_by('published_date')
+                .values_list('published_date', flat=True)
+                .first())
+    if upcoming is not None:
+        timeout = min(timeout, int((upcoming - now).total_seconds()) + 1)
+
+    return timeout
+
+
+class PageCacheMixin(object):
+    """Serve a template view's page from the page cache to anonymous visitors.
+
+    Views say which group their page belongs to with
+    :meth:`get_page_cache_group`; it defaults to the listings.
+    """
+    page_cache_group = LISTINGS
+
+    def get_page_cache_group(self):
+        return self.page_cache_group
+
+    def get_page_cache_timeout(self):
+        if self.get_page_cache_group() == LISTINGS:
+            return listing_timeout()
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+
+    def dispatch(self, request, *args, **kwargs):
+        cache = get_page_cache()
+        if (cache is None or request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return super(PageCacheMixin, self).dispatch(request, *args,
+                                                        **kwargs)
+
+        group = self.get_page_cache_group()
+        path = hashlib.md5(request.get_full_path().encode('utf-8'))
+        key = PAGE_KEY.format(_generation(cache, group), path.hexdigest())
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            return self._finish_page(request, response, 'hit')
+
+        response = super(PageCacheMixin, self).dispatch(request, *args,
+                                                        **kwargs)
+        if response.status_code != 200 or not hasattr(response, 'render'):
+            return response
+
+        response.context_data['csrf_token'] = CSRF_PLACEHOLDER
+        response.render()
+        cache.set(key, (response.content, response['Content-Type']),
+                  self.get_page_cache_timeout())
+
+        return self._finish_page(request, response, 'miss')
+
+    @staticmethod
+    def _finish_page(request, response, outcome):
+        placeholder = CSRF_PLACEHOLDER.encode('ascii')
+        if placeholder in response.content:
+            response.content = response.content.replace(
+                placeholder, get_token(request).encode('ascii')
+            )
+        response['X-Page-Cache'] = outcome
+
+        return response
@@ -0,0 +1,125 @@
+"""Validators for conditional GETs of the public event pages.
+
+Each page gets a strong ETag and a Last-Modified computed from a single,
+indexed query, so Django's ``condition`` decorator can answer a repeat visitor
+with a 304 before the view touches a template. Both functions for a page share
+that query through :func:`_memoize`.
+
+The ETag also covers the logged-in user, since their name is in the
+navigation bar. Calendars (see :mod:`klubevents.ical`) and the API have no
+navigation bar, so theirs don't.
+"""
+import hashlib
+
+from . import ical
+from .models import Event
+
+#: How many events the index shows.
+INDEX_SIZE = 5
+
+
+def _memoize(request, name, compute):
+    cache = request.__dict__.setdefault('_klubevents_validators', {})
+    if name not in cache:
+        cache[name] = compute()
+
+    return cache[name]
+
+
+def _hash(*parts):
+    return hashlib.sha1(
+        '|'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest()
+
+
+def _etag(request, *parts):
+    user = request.user
+    parts += (user.pk if user.is_authenticated else 'anonymous',)
+    return _hash(*parts)
+
+
+def index_events():
+    """The ``(pk, updated_at, published_date)`` of the events on the index.
+
+    Returns:
+        list[tuple]: The rows, newest first.
+    """
+    return list(Event.objects
+                .published()
+                .order_by('-published_date')
+                .values_list('pk', 'updated_at', 'published_date')
+                [:INDEX_SIZE])
+
+
+def index_etag(request, *args, **kwargs):
+    rows = _memoize(request, 'index', index_events)
+    return _etag(request, 'index', *(
+        '{}@{}'.format(pk, updated_at.isoformat())
+        for pk, updated_at, _ in rows
+    ))
+
+
+def index_last_modified(request, *args, **kwargs):
+    """When the index last changed.
+
+    Deleting an event can move this backwards, which only the ETag notices;
+    clients sending both validators are judged on the ETag alone.
+    """
+    rows = _memoize(request, 'index', index_events)
+    return max([max(updated_at, published_date)
+                for _, updated_at, published_date in rows] or [None])
+
+
+def _event_updated_at(pk):
+    return (Event.objects
+            .published()
+            .filter(pk=pk)
+            .values_list('updated_at', flat=True)
+            .first())
+
+
+def event_etag(request, pk, *args, **kwargs):
+    updated_at = _memoize(request, 'event', lambda: _event_updated_at(pk))
+    if updated_at is None:
+        # let the view 404
+        return None
+
+    return _etag(request, 'event', pk, updated_at.isoformat())
+
+
+def event_last_modified(request, pk, *args, **kwargs):
+    return _memoize(request, 'event', lambda: _event_updated_at(pk))
+
+
+def feed_etag(request, *args, **kwargs):
+    version = _memoize(request, 'feed', ical.feed_version)
+    return _hash('feed', *version)
+
+
+def feed_last_modified(request, *args, **kwargs):
+    """When the feed last changed, which like the index can't see
+    deletions.
+    """
+    _, updated_at, published_date = _memoize(request, 'feed',
+                                             ical.feed_version)
+    if updated_at is None:
+        return None
+
+    return max(updated_at, published_date)
+
+
+def _anonymous_event_etag(name):
+    """An ETag for a page about an event that looks the same to everyone."""
+    def etag(request, pk, *args, **kwargs):
+        updated_at = _memoize(request, 'event',
+                              lambda: _event_updated_at(pk))
+        if updated_at is None:
+            return None
+
+        return _hash(name, pk, updated_at.isoformat())
+
+    return etag
+
+
+event_calendar_etag = _anonymous_event_etag('event.ics')
+api_event_etag = _anonymous_event_etag('api')
@@ -0,0 +1,129 @@
+"""Streaming CSV and JSON exports of members and guest lists.
+
+Rows are read :data:`~klubevents.pagination.CHUNK_SIZE` at a time with
+:func:`~klubevents.pagination.iterate_in_chunks` and written out as they're
+read, so an export uses the same memory for a hundred members as for a
+million.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import Event, Member
+from .pagination import iterate_in_chunks
+
+MEMBER_COLUMNS = ('id', 'name', 'email', 'join_date', 'registered')
+ATTENDEE_COLUMNS = ('event_id', 'event_name') + MEMBER_COLUMNS
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+}
+
+# spreadsheets run cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _member_row(member_id, name, email, join_date, user_id):
+    return {'id': member_id, 'name': name, 'email': email,
+            'join_date': join_date, 'registered': user_id is not None}
+
+
+def members():
+    """Every Member, oldest first.
+
+    Yields:
+        dict: A row with each of :data:`MEMBER_COLUMNS`.
+    """
+    rows = Member.objects.values('pk', 'name', 'email', 'join_date',
+                                 'user_id')
+    for row in iterate_in_chunks(rows):
+        yield _member_row(row['pk'], row['name'], row['email'],
+                          row['join_date'], row['user_id'])
+
+
+def attendees(events):
+    """The guest lists of ``events``, one event after another.
+
+    Each guest list is read along the ``(event_id, member_id)`` index on the
+    attendees table.
+
+    Args:
+        events (iterable[klubevents.models.Event]): The events.
+
+    Yields:
+        dict: A row with each of :data:`ATTENDEE_COLUMNS`.
+    """
+    through = Event.attendees.through.objects
+    for event in events:
+        rows = through.filter(event_id=event.pk).values(
+            'member_id', 'member__name', 'member__email',
+            'member__join_date', 'member__user_id',
+        )
+        for row in iterate_in_chunks(rows, key='member_id'):
+            member = _member_row(row['member_id'], row['member__name'],
+                                 row['member__email'],
+                                 row['member__join_date'],
+                                 row['member__user_id'])
+            member.update(event_id=event.pk, event_name=event.name)
+            yield member
+
+
+class _Echo(object):
+    """A file-like object handing back whatever's written to it, so
+    :mod:`csv` can format rows one at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def to_csv(rows, columns):
+    """Format rows as CSV, a line at a time, header first."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(row[column]) for column in columns])
+
+
+def to_json(rows, columns):
+    """Format rows as a JSON array of objects, an object at a time."""
+    encoder = DjangoJSONEncoder()
+    separator = '[\n'
+    for row in rows:
+        yield separator + encoder.encode({column: row[column]
+                                          for column in columns})
+        separator = ',\n'
+
+    yield '[]\n' if separator == '[\n' else '\n]\n'
+
+
+def response(rows, columns, format, filename):
+    """Stream rows to the client as a file download.
+
+    Args:
+        rows (iterable[dict]): The rows, generated lazily.
+        columns (tuple[str]): The columns to write, in order.
+        format (str): One of :data:`FORMATS`.
+        filename (str): The download's name, without an extension.
+
+    Returns:
+        django.http.StreamingHttpResponse: The export.
+    """
+    formatter = to_csv if format == 'csv' else to_json
+    resp = StreamingHttpResponse(formatter(rows, columns),
+                                 content_type=FORMATS[format])
+    resp['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(
+        filename, format
+    )
+    # personal details, so keep them out of every cache on the way
+    resp['Cache-Control'] = 'private, no-store'
+
+    return resp
@@ -1,5 +1,4 @@
 from django import forms
-from django.contrib.auth.models import User
 
 from .models import Member
 
@@ -11,6 +10,9 @@ class MemberRegistrationForm(forms.Form):
     confirm_password = forms.CharField(min_length=8,
                                        widget=forms.PasswordInput())
 
+    def clean_email(self):
+        return Member.objects.normalize_email(self.cleaned_data['email'])
+
     def clean(self):
         """This is how you can manually hook into clean and do this yourself
         without a validator.
@@ -25,9 +27,8 @@ class MemberRegistrationForm(forms.Form):
             )
 
         email = cleaned_data.get('email')
-        user = User.objects.filter(email=email)
 
-        if len(user):
+        if Member.objects.email_registered(email):
             raise forms.ValidationError(
                 'A user with this email already exists!'
             )
@@ -0,0 +1,122 @@
+"""Password hashing off the request thread, with back-pressure.
+
+Hashing a password is slow on purpose; PBKDF2 at Django's default iterations
+takes tens of milliseconds of solid CPU. Done inline, a burst of sign-ups
+holds every thread of a worker for that long.
+
+Instead, :func:`make_password` hands the work to a small per-process thread
+pool. ``hashlib.pbkdf2_hmac`` lets go of the GIL while it works, so with
+threaded workers the rest of the site keeps serving while the pool hashes,
+and the pool's size caps how much CPU sign-ups can take at once. Past that,
+a few more can wait their turn, and anyone after them is told to try again
+(:class:`PoolFull`) rather than piling up behind the rest.
+
+The pool is made on first use, so each gunicorn worker gets its own after
+forking.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+#: How many seconds to tell a client to wait before trying again.
+RETRY_AFTER = 5
+
+
+class PoolFull(Exception):
+    """There's no room for another password to hash right now."""
+
+
+class HashingPool(object):
+    """A thread pool for hashing passwords, which refuses work once
+    ``workers`` hashes are running and ``queue`` more are waiting.
+
+    Args:
+        workers (int): How many passwords to hash at once.
+        queue (int): How many more can wait for a free thread.
+        timeout (float): How long a caller waits for its hash, in seconds,
+            before giving up on it.
+    """
+
+    def __init__(self, workers, queue, timeout):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.timeout = timeout
+
+    def _release(self, future):
+        self.slots.release()
+
+    def make_password(self, password, **kwargs):
+        """Hash ``password`` on the pool, waiting for the result.
+
+        Kwargs:
+            salt (str): Passed on to Django's ``make_password``.
+            hasher (str): Likewise.
+
+        Returns:
+            str: The encoded hash, as stored in ``User.password``.
+
+        Raises:
+            PoolFull: If the pool has no room, or the hash took longer than
+                ``timeout``.
+        """
+        if not self.slots.acquire(blocking=False):
+            raise PoolFull()
+
+        try:
+            future = self.executor.submit(hashers.make_password, password,
+                                          **kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # it still finishes, and frees its slot, in the background
+            raise PoolFull()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process's :class:`HashingPool`, made from the
+    ``PASSWORD_HASHING_*`` settings the first time it's asked for.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    getattr(settings, 'PASSWORD_HASHING_WORKERS', 2),
+                    getattr(settings, 'PASSWORD_HASHING_QUEUE', 4),
+                    getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 10),
+                )
+
+    return _pool
+
+
+def reset_pool():
+    """Throw away the process's pool, e.g. after changing its settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+
+def make_password(password, **kwargs):
+    """Hash ``password`` with the first of ``PASSWORD_HASHERS`` on the
+    process's pool.
+
+    Raises:
+        PoolFull: If there's no room to hash it right now.
+    """
+    return get_pool().make_password(password, **kwargs)
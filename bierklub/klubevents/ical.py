@@ -0,0 +1,207 @@
+"""iCalendar (RFC 5545) feeds of events.
+
+Calendar apps poll a subscribed feed every few minutes whether anything has
+changed or not, so the feed is built to be cheap to ask about again: its ETag
+comes from one aggregate query (see :func:`feed_version`), a client that's up
+to date gets a 304, and a stale one gets the calendar from the page cache,
+keyed by that same version so there's nothing to invalidate.
+
+Calendars are written out a line at a time, and on a cache miss stored as
+they stream by.
+"""
+import datetime
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .cache import get_page_cache
+from .models import Event
+from .pagination import iterate_in_chunks
+
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+PRODID = '-//bierklub//klubevents//EN'
+
+#: How far back the feed goes; calendar apps already have anything older.
+FEED_HISTORY = datetime.timedelta(days=365)
+
+#: Events don't have an end time, so they're put in calendars as lasting
+#: this long.
+EVENT_LENGTH = datetime.timedelta(hours=3)
+
+#: The fields a calendar entry is made from.
+FIELDS = ('pk', 'name', 'number', 'date', 'location', 'description',
+          'updated_at')
+
+#: How long clients may use a calendar before asking about it again.
+MAX_AGE = 60 * 5
+
+FEED_KEY = 'ical:feed:{}:{}'
+
+# RFC 5545 3.1: lines are at most 75 octets, not counting the CRLF
+_LINE_LENGTH = 75
+
+
+def feed_events():
+    """The events in the feed: everything published from the last
+    :data:`FEED_HISTORY` on.
+    """
+    return Event.objects.published().filter(
+        date__gte=timezone.now() - FEED_HISTORY
+    )
+
+
+def feed_version():
+    """What the feed is made from, in one indexed aggregate.
+
+    Editing, adding, deleting or publishing an event, or an event aging out
+    of the feed, changes at least one of these.
+
+    Returns:
+        tuple: The number of events in the feed and the latest
+        ``updated_at`` and ``published_date`` among them.
+    """
+    version = feed_events().aggregate(count=Count('pk'),
+                                      updated_at=Max('updated_at'),
+                                      published_date=Max('published_date'))
+    return version['count'], version['updated_at'], version['published_date']
+
+
+def escape(text):
+    """Escape a TEXT property value (RFC 5545 3.3.11)."""
+    return (text.replace('\\', '\\\\')
+            .replace(';', '\\;')
+            .replace(',', '\\,')
+            .replace('\r\n', '\\n')
+            .replace('\n', '\\n')
+            .replace('\r', '\\n'))
+
+
+def fold(line):
+    """Fold a content line into lines of at most 75 octets, without
+    splitting a UTF-8 character.
+
+    Returns:
+        str: The line, CRLF terminated.
+    """
+    if len(line.encode('utf-8')) <= _LINE_LENGTH:
+        return line + '\r\n'
+
+    lines, current, size, limit = [], '', 0, _LINE_LENGTH
+    for character in line:
+        width = len(character.encode('utf-8'))
+        if size + width > limit:
+            lines.append(current)
+            # continuation lines start with a space, which counts
+            current, size, limit = '', 0, _LINE_LENGTH - 1
+        current += character
+        size += width
+    lines.append(current)
+
+    return '\r\n '.join(lines) + '\r\n'
+
+
+def _timestamp(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def vevent(event, base_url):
+    """The lines of a VEVENT for one event.
+
+    Args:
+        event (dict): The event's :data:`FIELDS`.
+        base_url (str): The site's scheme and host, for links back to it.
+
+    Yields:
+        str: Each folded content line.
+    """
+    url = base_url + Event(pk=event['pk']).get_absolute_url()
+    lines = (
+        'BEGIN:VEVENT',
+        'UID:klubevents-event-{}@{}'.format(
+            event['pk'], base_url.partition('://')[2]),
+        'DTSTAMP:' + _timestamp(event['updated_at']),
+        'LAST-MODIFIED:' + _timestamp(event['updated_at']),
+        'DTSTART:' + _timestamp(event['date']),
+        'DTEND:' + _timestamp(event['date'] + EVENT_LENGTH),
+        'SUMMARY:' + escape('#{} {}'.format(event['number'], event['name'])),
+        'LOCATION:' + escape(event['location']),
+        'DESCRIPTION:' + escape(event['description']),
+        'URL:' + url,
+        'END:VEVENT',
+    )
+    for line in lines:
+        yield fold(line)
+
+
+def calendar(events, base_url, name=None):
+    """Write out a VCALENDAR, one line at a time.
+
+    Args:
+        events (iterable[dict]): The events, each with :data:`FIELDS`.
+        base_url (str): The site's scheme and host, e.g.
+            ``https://bierklub.example.com``.
+        name (str): What calendar apps should call the calendar.
+
+    Yields:
+        str: Each folded content line.
+    """
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:' + PRODID)
+    yield fold('CALSCALE:GREGORIAN')
+    if name:
+        yield fold('X-WR-CALNAME:' + escape(name))
+
+    for event in events:
+        for line in vevent(event, base_url):
+            yield line
+
+    yield fold('END:VCALENDAR')
+
+
+def feed(base_url):
+    """The whole feed, read from the database in chunks.
+
+    Yields:
+        str: Each folded content line.
+    """
+    events = iterate_in_chunks(feed_events().values(*FIELDS))
+    return calendar(events, base_url, name='bierklub')
+
+
+def _store_as_it_goes(lines, cache, key, timeout):
+    written = []
+    for line in lines:
+        written.append(line)
+        yield line
+
+    cache.set(key, ''.join(written).encode('utf-8'), timeout)
+
+
+def cached_feed(base_url, version_etag, timeout):
+    """The feed, from the page cache if it's there.
+
+    Args:
+        base_url (str): The site's scheme and host.
+        version_etag (str): The ETag for the current :func:`feed_version`,
+            so a cached feed is never served once events change.
+        timeout (int): How long to keep a newly written feed, in seconds.
+
+    Returns:
+        tuple(iterable, str): The feed, as either the cached bytes or a
+        generator of lines, and whether it came from the cache ("hit",
+        "miss", or None with no page cache).
+    """
+    cache = get_page_cache()
+    if cache is None:
+        return feed(base_url), None
+
+    key = FEED_KEY.format(version_etag,
+                          hashlib.md5(base_url.encode('utf-8')).hexdigest())
+    content = cache.get(key)
+    if content is not None:
+        return [content], 'hit'
+
+    return _store_as_it_goes(feed(base_url), cache, key, timeout), 'miss'
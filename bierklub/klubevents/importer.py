@@ -0,0 +1,261 @@
+"""Bulk importing members and RSVPs from CSV.
+
+Each row is a person, keyed by email, and optionally an event they signed up
+for::
+
+    email,name,event_number
+    tom.hanks@example.com,Tom Hanks,12
+
+Events can be given by ``event_id`` or by ``event_number``. Rows are imported
+:data:`CHUNK_SIZE` at a time, each chunk in its own transaction, so a bad row
+only costs its own import and a huge file never holds the write lock for
+long.
+
+Members are upserted on email: new ones are made, and existing ones without
+an account get the name from the sheet. RSVPs are added with ``bulk_create``
+on the attendees table, skipping the ones already there.
+
+A file that can't be read to the end, because it isn't UTF-8 or isn't
+really CSV, keeps the rows imported before the problem, and the problem is
+recorded on the :class:`ImportResult` like a bad row.
+
+Bulk writes skip the signals that keep ``attendee_count``, ``updated_at`` and
+the page cache in step (see :mod:`klubevents.signals`), so the importer
+brings those up to date itself after each chunk.
+"""
+import csv
+from collections import namedtuple
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import cache
+from .models import Event, Member
+
+#: Rows per chunk. Each chunk looks up its emails with one ``IN`` query, so
+#: this stays under SQLite's 999 parameters.
+CHUNK_SIZE = 500
+
+#: How often a chunk is retried after losing a race with another writer.
+RETRIES = 2
+
+Row = namedtuple('Row', ['line', 'email', 'name', 'event_id'])
+
+
+class ImportResult(object):
+    """What an import did, added up as it goes."""
+
+    def __init__(self):
+        self.rows = 0
+        self.members_created = 0
+        self.members_updated = 0
+        self.rsvps_created = 0
+        self.rsvps_existing = 0
+        #: ``(line, message)`` for every row that wasn't imported.
+        self.errors = []
+        #: Why the file couldn't be read to the end, if it couldn't.
+        self.read_error = None
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    def stop_reading(self, line, error):
+        self.read_error = 'Stopped reading after line {}: {}'.format(
+            line - 1, error)
+        self.add_error(line, self.read_error)
+
+    def summary(self):
+        return ('{rows} rows: {members_created} members made, '
+                '{members_updated} updated, {rsvps_created} RSVPs added, '
+                '{rsvps_existing} already there, {error_count} errors'.format(
+                    error_count=len(self.errors), **vars(self)))
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class EventLookup(object):
+    """Resolves the event columns of a row, remembering what it's seen."""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_number = {}
+
+    def resolve(self, record):
+        """Work out which event a row is for.
+
+        Returns:
+            int: The event's id, or None if the row names no event.
+
+        Raises:
+            ValueError: If the row names an event that doesn't exist.
+        """
+        event_id = (record.get('event_id') or '').strip()
+        number = (record.get('event_number') or '').strip()
+        if event_id:
+            key, lookup, field = event_id, self.by_id, 'pk'
+        elif number:
+            key, lookup, field = number, self.by_number, 'number'
+        else:
+            return None
+
+        if key not in lookup:
+            try:
+                lookup[key] = (Event.objects
+                               .filter(**{field: int(key)})
+                               .order_by('pk')
+                               .values_list('pk', flat=True)
+                               .first())
+            except ValueError:
+                lookup[key] = None
+
+        if lookup[key] is None:
+            raise ValueError('There is no event {} {}.'.format(
+                'with id' if field == 'pk' else 'number', key
+            ))
+
+        return lookup[key]
+
+
+def parse(reader, result, events=None):
+    """Validate rows from a :class:`csv.DictReader`.
+
+    Rows that don't validate are recorded on ``result`` and skipped. If the
+    file can't be read any further, that's recorded too, and the rows read
+    before it are still yielded.
+
+    Yields:
+        Row: Each valid row.
+    """
+    events = events or EventLookup()
+    records = iter(reader)
+    try:
+        fieldnames = reader.fieldnames
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.stop_reading(1, e)
+        return
+    if 'email' not in (fieldnames or ()):
+        result.add_error(1, 'There is no "email" column.')
+        return
+
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as e:
+            # the decoder reads ahead, so this is as close as it gets
+            result.stop_reading(reader.line_num + 1, e)
+            return
+
+        result.rows += 1
+        line = reader.line_num
+        email = Member.objects.normalize_email(record.get('email'))
+        try:
+            validate_email(email)
+        except ValidationError:
+            result.add_error(line, '"{}" is not a valid email.'.format(
+                record.get('email') or ''))
+            continue
+
+        try:
+            event_id = events.resolve(record)
+        except ValueError as e:
+            result.add_error(line, str(e))
+            continue
+
+        name = (record.get('name') or '').strip()[:128]
+        yield Row(line, email, name, event_id)
+
+
+def _import_chunk(rows, result):
+    """Import one chunk of valid rows in one transaction."""
+    emails = {row.email for row in rows}
+    names = {}
+    for row in rows:
+        if row.name:
+            names[row.email] = row.name
+
+    existing = {member.email: member for member in
+                Member.objects.filter(email__in=emails)
+                .only('email', 'name', 'user_id')}
+
+    Member.objects.bulk_create(
+        Member(email=email, name=names.get(email, email.split('@')[0]))
+        for email in sorted(emails - set(existing))
+    )
+    created = len(emails) - len(existing)
+
+    renamed = {member.pk: names[email] for email, member in existing.items()
+               if member.user_id is None
+               and names.get(email, member.name) != member.name}
+    for pk, name in renamed.items():
+        Member.objects.filter(pk=pk).update(name=name)
+
+    member_ids = dict(Member.objects.filter(email__in=emails)
+                      .values_list('email', 'pk'))
+    wanted = {(row.event_id, member_ids[row.email])
+              for row in rows if row.event_id is not None}
+    through = Event.attendees.through
+    there = set(through.objects
+                .filter(event_id__in={event for event, _ in wanted},
+                        member_id__in={member for _, member in wanted})
+                .values_list('event_id', 'member_id')) & wanted
+    through.objects.bulk_create(
+        through(event_id=event_id, member_id=member_id)
+        for event_id, member_id in sorted(wanted - there)
+    )
+
+    # the bookkeeping the signals would have done
+    counted = {event_id for event_id, _ in wanted - there}
+    Event.objects.update_attendee_counts(counted)
+    touched = set(through.objects.filter(member_id__in=renamed)
+                  .values_list('event_id', flat=True)) - counted
+    Event.objects.touch(touched)
+    cache.invalidate_events(counted | touched, listings=False)
+
+    result.members_created += created
+    result.members_updated += len(renamed)
+    result.rsvps_created += len(wanted - there)
+    result.rsvps_existing += len(there)
+
+
+def import_csv(reader, chunk_size=CHUNK_SIZE, progress=None):
+    """Import members and RSVPs from a :class:`csv.DictReader`.
+
+    Args:
+        reader (csv.DictReader): The rows.
+        chunk_size (int): How many rows to import per transaction.
+        progress (callable): Called with the :class:`ImportResult` so far
+            after every chunk.
+
+    Returns:
+        ImportResult: What was imported, and the rows that weren't.
+    """
+    result = ImportResult()
+    for chunk in _chunks(parse(reader, result), chunk_size):
+        for attempt in range(RETRIES + 1):
+            try:
+                with transaction.atomic():
+                    _import_chunk(chunk, result)
+                break
+            except IntegrityError as e:
+                # someone else signed one of these people up in the
+                # meantime; the next attempt will see them
+                if attempt == RETRIES:
+                    for row in chunk:
+                        result.add_error(row.line,
+                                         'Not imported: {}'.format(e))
+
+        if progress is not None:
+            progress(result)
+
+    return result
@@ -0,0 +1,238 @@
+import datetime
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from klubevents import cache
+from klubevents.models import Event, Member
+from klubevents.rendering import MARKDOWN_FIELDS, render_markdown, \
+    render_title
+
+FIRST_NAMES = ('Ada', 'Bert', 'Cleo', 'Dmitri', 'Esme', 'Farid', 'Greta',
+               'Hiro', 'Ines', 'Jonas', 'Kemi', 'Lars', 'Mina', 'Nils',
+               'Oona', 'Pavel', 'Quinn', 'Rosa', 'Sven', 'Tove')
+LAST_NAMES = ('Andersen', 'Becker', 'Costa', 'Dubois', 'Eriksen', 'Fischer',
+              'Garcia', 'Hansen', 'Ivanova', 'Jensen', 'Kowalski', 'Larsen',
+              'Meyer', 'Novak', 'Olsen', 'Petrov', 'Quist', 'Richter',
+              'Schmidt', 'Tanaka')
+STYLES = ('Lager', 'Stout', 'Porter', 'Pilsner', 'Saison', 'Dubbel',
+          'Tripel', 'Gose', 'Kolsch', 'Bock', 'Weissbier', 'Lambic')
+FORMATS = ('Night', 'Tasting', 'Tour', 'Takeover', 'Release Party',
+           'Festival', 'Showdown', 'Pairing Dinner')
+BREWERIES = ('Other Half', 'Grimm', 'Threes', 'KCBC', 'Finback',
+             'Interboro', 'Transmitter', 'Evil Twin', 'Torch & Crown')
+STREETS = ('Bedford Ave', 'Flushing Ave', 'Grand St', 'Metropolitan Ave',
+           'Atlantic Ave', 'Court St', 'Vernon Blvd', 'Bowery')
+
+#: How many different invitations generated events share.
+BODIES = 100
+
+PARAGRAPHS = (
+    'We are heading to **{brewery}** for a night of *{style}*.',
+    'Their {style} is one of the best in the city, so come thirsty.',
+    'Tickets get you a flight of four and a souvenir glass.',
+    '- Bring ID\n- Bring a friend\n- Bring an appetite',
+    'See [their site](https://example.com/{slug}) for the tap list.',
+    '> "Beer is proof that God loves us." -- not actually Franklin',
+    'Food trucks will be out front from 6pm.',
+    '1. Meet at the bar\n2. Drink\n3. Repeat',
+)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Bulk-generate realistic events, members, users and RSVPs for '
+            'scale testing.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--members', type=int, default=200000)
+        parser.add_argument('--users', type=float, default=0.1,
+                            help='The fraction of members with a login.')
+        parser.add_argument('--attendees', type=int, default=1000,
+                            help='The average number of RSVPs per event.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not 0 <= options['users'] <= 1:
+            raise CommandError('--users is a fraction, between 0 and 1.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.perf_counter()
+
+        with transaction.atomic():
+            member_ids = self.create_members(options['members'],
+                                             options['users'])
+            self.create_events(options['events'], member_ids,
+                               options['attendees'])
+
+            # bulk inserts skip the signals that usually do this
+            cache.invalidate(cache.LISTINGS)
+
+    def log(self, message, *args):
+        self.stdout.write('[{:7.1f}s] {}'.format(
+            time.perf_counter() - self.started, message.format(*args)
+        ))
+
+    @staticmethod
+    def next_pk(model):
+        return (model.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+
+    def create_members(self, count, user_fraction):
+        """Make ``count`` Members, some with Users.
+
+        Emails are numbered on from the highest Member id so far, so running
+        the command again adds more members rather than clashing.
+
+        Returns:
+            list[int]: The new Members' ids.
+        """
+        first_pk = self.next_pk(Member)
+        people = [
+            (self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+             self.rng.random() < user_fraction)
+            for _ in range(count)
+        ]
+
+        def email(i, first, last):
+            return '{}.{}.{}@example.com'.format(first, last,
+                                                 first_pk + i).lower()
+
+        # every user shares one hash, since hashing is slow by design
+        password = make_password('password')
+        first_user_pk = self.next_pk(User)
+        users = (
+            User(username=email(i, first, last), email=email(i, first, last),
+                 first_name=first, last_name=last, password=password)
+            for i, (first, last, has_user) in enumerate(people) if has_user
+        )
+        for batch in batches(users, self.batch_size):
+            User.objects.bulk_create(batch)
+        user_ids = dict(User.objects
+                        .filter(pk__gte=first_user_pk)
+                        .values_list('username', 'pk')
+                        .iterator())
+        self.log('Made {} users.', len(user_ids))
+
+        today = timezone.now().date()
+        members = (
+            Member(name='{} {}'.format(first, last),
+                   email=email(i, first, last),
+                   user_id=user_ids.get(email(i, first, last)),
+                   join_date=today - datetime.timedelta(
+                       days=self.rng.randrange(3650)))
+            for i, (first, last, _) in enumerate(people)
+        )
+        for batch in batches(members, self.batch_size):
+            Member.objects.bulk_create(batch)
+
+        member_ids = list(Member.objects
+                          .filter(pk__gte=first_pk)
+                          .values_list('pk', flat=True)
+                          .iterator())
+        self.log('Made {} members.', len(member_ids))
+        return member_ids
+
+    def make_bodies(self, count):
+        """Write ``count`` different invitations for events to share.
+
+        Rendering markdown is the slow part of making an event, so there are
+        only so many invitations to go round, each rendered once.
+
+        Returns:
+            list[dict]: The markdown and HTML fields for each invitation.
+        """
+        bodies = []
+        for _ in range(count):
+            values = {'style': self.rng.choice(STYLES),
+                      'brewery': self.rng.choice(BREWERIES)}
+            values['slug'] = values['brewery'].lower().replace(' ', '-')
+
+            def text(paragraphs):
+                return '\n\n'.join(
+                    paragraph.format(**values)
+                    for paragraph in self.rng.sample(PARAGRAPHS, paragraphs)
+                )
+
+            body = {'preamble': text(1), 'description': text(4),
+                    'additional_notes': text(2)}
+            for source, html in MARKDOWN_FIELDS:
+                body[html] = render_markdown(body[source])
+            bodies.append(body)
+
+        return bodies
+
+    def make_event(self, number, date, attendee_count, body):
+        event = Event(
+            name='{} {}'.format(self.rng.choice(STYLES),
+                                self.rng.choice(FORMATS)),
+            number=number, date=date,
+            location='{} {}, Brooklyn'.format(self.rng.randrange(1, 999),
+                                              self.rng.choice(STREETS)),
+            published_date=date - datetime.timedelta(days=14),
+            attendee_count=attendee_count, **body
+        )
+        event.title_html = render_title(event)
+
+        return event
+
+    def create_events(self, count, member_ids, average_attendees):
+        """Make ``count`` weekly Events, the last few still to come, along
+        with their RSVPs.
+        """
+        first_pk = self.next_pk(Event)
+        first_number = (Event.objects.aggregate(number=Max('number'))['number']
+                        or 0) + 1
+        sizes = [min(len(member_ids),
+                     int(self.rng.expovariate(1 / average_attendees)))
+                 if average_attendees else 0
+                 for _ in range(count)]
+
+        bodies = self.make_bodies(min(count, BODIES))
+        latest = timezone.now() + datetime.timedelta(weeks=4)
+        events = (
+            self.make_event(first_number + i,
+                            latest - datetime.timedelta(weeks=count - i - 1),
+                            size, self.rng.choice(bodies))
+            for i, size in enumerate(sizes)
+        )
+        for batch in batches(events, self.batch_size):
+            Event.objects.bulk_create(batch)
+        event_ids = list(Event.objects
+                         .filter(pk__gte=first_pk)
+                         .order_by('pk')
+                         .values_list('pk', flat=True))
+        self.log('Made {} events.', len(event_ids))
+
+        rows = (
+            (event_id, member_id)
+            for event_id, size in zip(event_ids, sizes)
+            for member_id in self.rng.sample(member_ids, size)
+        )
+        table = Event.attendees.through._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            for batch in batches(rows, self.batch_size):
+                cursor.executemany(
+                    'INSERT INTO {} (event_id, member_id) VALUES (%s, %s)'
+                    .format(connection.ops.quote_name(table)), batch
+                )
+                total += len(batch)
+        self.log('Made {} RSVPs.', total)
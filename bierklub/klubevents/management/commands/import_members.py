@@ -0,0 +1,40 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from klubevents import importer
+
+
+class Command(BaseCommand):
+    help = ('Import members and RSVPs from a CSV with "email", "name" and '
+            '"event_id" or "event_number" columns.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The CSV file, or - for stdin.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=importer.CHUNK_SIZE,
+                            help='Rows to import per transaction.')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            result = self.run(sys.stdin, options['chunk_size'])
+        else:
+            try:
+                with open(options['path'], newline='',
+                          encoding='utf-8-sig') as f:
+                    result = self.run(f, options['chunk_size'])
+            except OSError as e:
+                raise CommandError(e)
+
+        for line, message in result.errors:
+            self.stderr.write('line {}: {}'.format(line, message))
+        self.stdout.write(result.summary())
+        if result.read_error:
+            raise CommandError(result.read_error)
+
+    def run(self, f, chunk_size):
+        def progress(result):
+            self.stdout.write('... {} rows'.format(result.rows))
+
+        return importer.import_csv(csv.DictReader(f), chunk_size, progress)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from klubevents import cache
+
+
+class Command(BaseCommand):
+    help = ('Show the page cache hit and miss counters, or clear the cache. '
+            'The counters come from the request metrics, so they need '
+            'INSTRUMENTATION_ENABLED and METRICS_DIR.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true',
+                            help='Throw away every cached page.')
+
+    def handle(self, *args, **options):
+        page_cache = cache.get_page_cache()
+        if page_cache is None:
+            raise CommandError('Page caching is turned off, see '
+                               'PAGE_CACHE_ALIAS.')
+
+        if options['clear']:
+            page_cache.clear()
+            self.stdout.write('Cleared the page cache.')
+
+        counted = (getattr(settings, 'INSTRUMENTATION_ENABLED', False) and
+                   getattr(settings, 'METRICS_DIR', None))
+        if not counted:
+            if options['clear']:
+                return
+            # zeros would look like a cold cache rather than no counters
+            raise CommandError('Page cache hits and misses are only counted '
+                               'by the request metrics, see '
+                               'INSTRUMENTATION_ENABLED and METRICS_DIR.')
+
+        stats = cache.get_stats()
+        total = stats['hits'] + stats['misses']
+        self.stdout.write('hits: {hits}\nmisses: {misses}'.format(**stats))
+        if total:
+            self.stdout.write('hit ratio: {:.1%}'.format(
+                stats['hits'] / total
+            ))
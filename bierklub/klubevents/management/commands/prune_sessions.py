@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Delete expired sessions from the database a batch at a time, '
+            'so the write lock is never held for long.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Sessions to delete per transaction.')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches, to let '
+                                 'other writers in.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['pause'] < 0:
+            raise CommandError('--pause can\'t be negative.')
+
+        # sessions expiring while this runs are left for next time
+        now = timezone.now()
+        expired = (Session.objects
+                   .filter(expire_date__lt=now)
+                   .values_list('session_key', flat=True))
+
+        total = 0
+        while True:
+            with transaction.atomic():
+                keys = list(expired[:batch_size])
+                if keys:
+                    Session.objects.filter(session_key__in=keys).delete()
+            total += len(keys)
+
+            if len(keys) < batch_size:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write('Pruned {} expired session(s).'.format(total))
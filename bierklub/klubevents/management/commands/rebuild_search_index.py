@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from klubevents import search
+
+
+class Command(BaseCommand):
+    help = 'Re-create the event full-text search index from scratch.'
+
+    def handle(self, *args, **options):
+        if not search.install():
+            raise CommandError('This database has no FTS5 support, search '
+                               'falls back to scanning the event table.')
+
+        search.rebuild()
+        self.stdout.write('Rebuilt the event search index.')
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from klubevents import cache
+from klubevents.models import Event
+from klubevents.rendering import MARKDOWN_FIELDS, RENDERED_FIELDS, \
+    render_event
+
+
+class Command(BaseCommand):
+    help = ('Re-render the stored HTML for events, e.g. after changing '
+            'MARKDOWN_DEUX_STYLES.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int,
+                            help='Only re-render these events.')
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event_ids']:
+            events = events.filter(pk__in=options['event_ids'])
+
+        sources = ['name', 'number', 'date']
+        sources.extend(source for source, _ in MARKDOWN_FIELDS)
+        events = events.only('pk', *(sources + list(RENDERED_FIELDS)))
+
+        changed = []
+        with transaction.atomic():
+            for event in events.iterator():
+                rendered = render_event(event)
+                if all(getattr(event, field) == html
+                       for field, html in rendered.items()):
+                    continue
+
+                # update() rather than save() so nothing but the HTML is
+                # rewritten
+                Event.objects.filter(pk=event.pk).update(
+                    updated_at=timezone.now(), **rendered
+                )
+                changed.append(event.pk)
+
+            # update() skips the signals that usually do this
+            cache.invalidate_events(changed, listings=False)
+
+        self.stdout.write('Re-rendered {} event(s).'.format(len(changed)))
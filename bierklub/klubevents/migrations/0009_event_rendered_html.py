@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-17 14:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from klubevents.rendering import render_event
+
+
+def render_events(apps, schema_editor):
+    Event = apps.get_model('klubevents', 'Event')
+    for event in Event.objects.using(schema_editor.connection.alias).iterator():
+        (Event.objects
+         .using(schema_editor.connection.alias)
+         .filter(pk=event.pk)
+         .update(**render_event(event)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0008_merge_20170813_1552'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='additional_notes_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='description_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='preamble_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='title_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(render_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-17 14:16
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def count_attendees(apps, schema_editor):
+    Event = apps.get_model('klubevents', 'Event')
+    events = Event.objects.using(schema_editor.connection.alias)
+    for event in events.iterator():
+        events.filter(pk=event.pk).update(
+            attendee_count=event.attendees.count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0009_event_rendered_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='attendee_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_attendees, migrations.RunPython.noop),
+    ]
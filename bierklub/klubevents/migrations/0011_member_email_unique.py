@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-17 14:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from ._members import merge_duplicate_members
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0010_event_attendee_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_members,
+                             migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='member',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+    ]
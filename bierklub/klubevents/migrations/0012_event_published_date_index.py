@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-17 14:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0011_member_email_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='published_date',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='date event was created'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-17 14:18
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from ._members import merge_duplicate_members
+
+
+def normalize_email(email):
+    # frozen copy of MemberManager.normalize_email
+    return (email or '').strip().lower()
+
+
+def merge_case_duplicates(apps, schema_editor):
+    merge_duplicate_members(apps, schema_editor, normalize=normalize_email)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0011_member_email_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-17 14:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0013_event_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='date',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from klubevents import search
+
+
+def install_search(apps, schema_editor):
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('klubevents', '0014_event_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
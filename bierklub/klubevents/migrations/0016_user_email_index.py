@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def normalize_email(email):
+    # frozen copy of MemberManager.normalize_email
+    return (email or '').strip().lower()
+
+
+def normalize_user_emails(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    db = schema_editor.connection.alias
+    for pk, email in User.objects.using(db).values_list('pk', 'email'):
+        if email != normalize_email(email):
+            (User.objects.using(db).filter(pk=pk)
+             .update(email=normalize_email(email)))
+
+
+class Migration(migrations.Migration):
+    """Index ``auth_user.email``, which Django doesn't, so sign-ups can check
+    it for duplicates (see ``MemberManager.email_registered``).
+    """
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('klubevents', '0015_event_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_user_emails,
+                             migrations.RunPython.noop),
+        migrations.RunSQL(
+            ['CREATE INDEX klubevents_auth_user_email ON auth_user (email)'],
+            ['DROP INDEX klubevents_auth_user_email'],
+        ),
+    ]
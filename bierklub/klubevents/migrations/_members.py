@@ -0,0 +1,70 @@
+"""Helpers shared by the data migrations that tighten up Member.email.
+
+The loader skips modules starting with an underscore, so this isn't picked up
+as a migration itself.
+"""
+from collections import OrderedDict
+
+
+def _unchanged(email):
+    return email
+
+
+def merge_duplicate_members(apps, schema_editor, normalize=_unchanged):
+    """Fold Members sharing an email into a single Member.
+
+    The Member tied to a login wins, falling back to the oldest one. Every
+    event the duplicates were attending is moved over to the survivor before
+    the duplicates are deleted.
+
+    Args:
+        apps: The historical app registry handed to ``RunPython``.
+        schema_editor: The schema editor handed to ``RunPython``.
+        normalize (callable): Maps an email to the key duplicates are grouped
+            on; the survivor is given the normalized email. Defaults to
+            grouping on the email as is.
+    """
+    db = schema_editor.connection.alias
+    Member = apps.get_model('klubevents', 'Member')
+    Event = apps.get_model('klubevents', 'Event')
+    Attendance = Event.attendees.through
+
+    groups = OrderedDict()
+    members = (Member.objects.using(db)
+               .order_by('pk')
+               .values_list('pk', 'email', 'user_id'))
+    for pk, email, user_id in members.iterator():
+        groups.setdefault(normalize(email), []).append((pk, email, user_id))
+
+    touched_events = set()
+    for email, group in groups.items():
+        keep = next((pk for pk, _, user_id in group if user_id), group[0][0])
+        duplicates = [pk for pk, _, _ in group if pk != keep]
+
+        if duplicates:
+            attending = set(Attendance.objects.using(db)
+                            .filter(member_id=keep)
+                            .values_list('event_id', flat=True))
+            moved = set(Attendance.objects.using(db)
+                        .filter(member_id__in=duplicates)
+                        .values_list('event_id', flat=True))
+            Attendance.objects.using(db).bulk_create([
+                Attendance(event_id=event_id, member_id=keep)
+                for event_id in moved - attending
+            ])
+            touched_events.update(moved)
+
+            Attendance.objects.using(db).filter(
+                member_id__in=duplicates
+            ).delete()
+            Member.objects.using(db).filter(pk__in=duplicates).delete()
+
+        if any(original != email for _, original, _ in group):
+            Member.objects.using(db).filter(pk=keep).update(email=email)
+
+    for event_id in touched_events:
+        Event.objects.using(db).filter(pk=event_id).update(
+            attendee_count=Attendance.objects.using(db)
+            .filter(event_id=event_id)
+            .count()
+        )
@@ -1,27 +1,129 @@
 import datetime
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.urls import reverse
 from django.utils import timezone
 
+from .rendering import MARKDOWN_FIELDS, RENDERED_FIELDS, render_event
+
+#: How far ahead an event has to be to count as "soon".
+SOON = datetime.timedelta(days=7)
+
+#: How long an event counts as "recently published" for.
+RECENT = datetime.timedelta(days=1)
+
+
+class EventQuerySet(models.QuerySet):
+    """Filters that run in SQL against the indexed date columns.
+
+    These match the per-event checks on :class:`Event`, so use them whenever
+    you'd otherwise load events just to throw most of them away.
+    """
+
+    def published(self):
+        """Events whose invite is up on the site."""
+        return self.filter(published_date__lte=timezone.now())
+
+    def upcoming(self):
+        """Events that haven't happened yet, soonest first."""
+        return self.filter(date__gt=timezone.now()).order_by('date')
+
+    def soon(self, days=SOON.days):
+        """Upcoming events happening within ``days`` days.
+
+        See :meth:`Event.is_soon`.
+        """
+        now = timezone.now()
+        return self.upcoming().filter(
+            date__lte=now + datetime.timedelta(days=days)
+        )
+
+    def recently_published(self):
+        """Events published within the last day.
+
+        See :meth:`Event.was_published_recently`.
+        """
+        now = timezone.now()
+        return self.filter(published_date__gte=now - RECENT,
+                           published_date__lte=now)
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    def update_attendee_counts(self, event_ids):
+        """Recount the attendees for the given events.
+
+        Args:
+            event_ids (iterable[int]): Primary keys of the events to recount.
+        """
+        through = self.model.attendees.through
+        for event_id in event_ids:
+            count = (through.objects.using(self.db)
+                     .filter(event_id=event_id)
+                     .count())
+            self.filter(pk=event_id).update(attendee_count=count,
+                                            updated_at=timezone.now())
+
+    def touch(self, event_ids):
+        """Mark events as modified without saving them.
+
+        Args:
+            event_ids (iterable[int]): Primary keys of the events to touch.
+        """
+        self.filter(pk__in=event_ids).update(updated_at=timezone.now())
+
 
 class Event(models.Model):
     name = models.CharField(max_length=200)
     description = models.CharField(max_length=4096)
-    date = models.DateTimeField()
+    date = models.DateTimeField(db_index=True)
     number = models.IntegerField('event #')
     location = models.CharField('address of brewery', max_length=128)
     attendees = models.ManyToManyField('Member',
                                        db_table='klubevents_event_members')
     published_date = models.DateTimeField('date event was created',
-                                          default=timezone.now)
+                                          default=timezone.now, db_index=True)
     preamble = models.CharField(max_length=1024, default='')
     additional_notes = models.CharField(max_length=2048, default='')
+    # denormalized from attendees, see klubevents.signals
+    attendee_count = models.PositiveIntegerField(default=0, editable=False)
+    # also bumped when the guest list changes, see klubevents.signals
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # HTML rendered from the markdown fields above, kept current by save()
+    title_html = models.TextField(default='', editable=False)
+    preamble_html = models.TextField(default='', editable=False)
+    description_html = models.TextField(default='', editable=False)
+    additional_notes_html = models.TextField(default='', editable=False)
+
+    objects = EventManager()
 
     def __str__(self):
         return (self.name + ' at ' + self.location + ' on '
                 + self.date.strftime('%Y-%m-%d'))
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        sources = {'name', 'number', 'date'}
+        sources.update(source for source, _ in MARKDOWN_FIELDS)
+
+        if update_fields is None or sources.intersection(update_fields):
+            self.render_markdown()
+            if update_fields is not None:
+                update_fields = set(update_fields) | set(RENDERED_FIELDS)
+
+        if update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+
+        super(Event, self).save(*args, **kwargs)
+
+    def render_markdown(self):
+        """Re-render the stored HTML for this event from its markdown.
+
+        This does not save the event.
+        """
+        for field, html in render_event(self).items():
+            setattr(self, field, html)
+
     def get_absolute_url(self):
         return reverse('klubevents:detail', args=[self.id])
 
@@ -35,8 +137,7 @@ class Event(models.Model):
             bool: True if event was created within the past day.
         """
         now = timezone.now()
-        recent = timezone.now() - datetime.timedelta(days=1)
-        return recent <= self.published_date <= now
+        return now - RECENT <= self.published_date <= now
 
     def is_soon(self):
         """Has the event happened yet and, if not, will it happen in a week.
@@ -44,22 +145,95 @@ class Event(models.Model):
         Returns:
             bool: Whether or not the event will happen in a week.
         """
-        soon = timezone.now() + datetime.timedelta(days=7)
         now = timezone.now()
-        return now < self.date <= soon
+        return now < self.date <= now + SOON
 
     is_soon.admin_order_field = 'date'
     is_soon.boolean = True
     is_soon.short_description = 'Is Soon?'
 
 
+class MemberManager(models.Manager):
+    @staticmethod
+    def normalize_email(email):
+        """Normalize an email into the form Members are stored and looked up
+        by.
+
+        Emails are compared case-insensitively, so the whole address is
+        lowercased (Django's own ``normalize_email`` only lowercases the
+        domain). That keeps lookups on the plain unique index on ``email``.
+
+        Args:
+            email (str): The email to normalize.
+
+        Returns:
+            str: The normalized email.
+        """
+        return (email or '').strip().lower()
+
+    def email_registered(self, email):
+        """Whether someone has already signed up with ``email``.
+
+        Signing up makes a User with the email as its username, but Users made
+        any other way (``createsuperuser``, the admin) may have another
+        username, so their email is checked too. Emails are normalized as
+        they're saved (see :mod:`klubevents.signals`), so every lookup here
+        is an exact match on an index.
+
+        Args:
+            email (str): The email to check.
+
+        Returns:
+            bool: True if a User or a signed up Member has the email.
+        """
+        from django.contrib.auth.models import User
+
+        email = self.normalize_email(email)
+        return (
+            User.objects.using(self.db)
+            .filter(models.Q(username=email) | models.Q(email=email))
+            .exists()
+            or self.filter(email=email, user__isnull=False).exists()
+        )
+
+    def create_or_get(self, email, **defaults):
+        """Fetch the Member with ``email``, making them if they don't exist.
+
+        This is :meth:`get_or_create` turned around: the INSERT goes first and
+        we only read the existing row back when the unique index on ``email``
+        rejects it. Inside a transaction that means the first thing we ask
+        SQLite for is a write lock, so racing requests queue up for it rather
+        than both taking read locks and then failing to upgrade them.
+
+        Args:
+            email (str): The email to look the Member up by.
+            **defaults: Extra fields for a newly made Member.
+
+        Returns:
+            tuple(klubevents.models.Member, bool): The Member and whether or
+            not they were just made.
+        """
+        email = self.normalize_email(email)
+        try:
+            with transaction.atomic(using=self.db):
+                return self.create(email=email, **defaults), True
+        except IntegrityError:
+            return self.get(email=email), False
+
+
 class Member(models.Model):
     name = models.CharField('full name', max_length=128)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     join_date = models.DateField(default=timezone.now)
     user = models.ForeignKey('auth.User', on_delete=models.PROTECT, null=True,
                              blank=True)
 
+    objects = MemberManager()
+
     def __str__(self):
         return self.name + ' <' + self.email + '>'
 
+    def save(self, *args, **kwargs):
+        self.email = Member.objects.normalize_email(self.email)
+        super(Member, self).save(*args, **kwargs)
+
@@ -0,0 +1,139 @@
+"""Keyset ("cursor") pagination over published events.
+
+Pages are ordered newest first by ``(published_date, id)`` and each page
+starts right after the last event of the one before it, rather than at an
+OFFSET. The query for page 1,000 therefore walks the same handful of index
+entries as the query for page one.
+
+:func:`iterate_in_chunks` uses the same trick to walk through whole tables.
+"""
+import datetime
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+#: How many events go on a page unless told otherwise.
+PER_PAGE = 20
+
+#: The largest primary key a cursor can point past, SQLite's largest integer.
+MAX_PK = 2 ** 63 - 1
+
+#: How many rows :func:`iterate_in_chunks` fetches at a time.
+CHUNK_SIZE = 2000
+
+
+class Cursor(namedtuple('Cursor', ['published_date', 'pk'])):
+    """Points at the last event shown, which the next page starts after."""
+
+    @classmethod
+    def decode(cls, value):
+        """Parse a cursor made by :meth:`encode`.
+
+        Raises:
+            ValueError: If ``value`` isn't a valid cursor.
+        """
+        micros, _, pk = value.partition('-')
+        pk = int(pk)
+        if not 0 <= pk <= MAX_PK:
+            raise ValueError('Cursor pk out of range: {}'.format(pk))
+
+        try:
+            published_date = EPOCH + datetime.timedelta(
+                microseconds=int(micros)
+            )
+        except OverflowError:
+            raise ValueError('Cursor date out of range: {}'.format(micros))
+
+        return cls(published_date, pk)
+
+    def encode(self):
+        """Return the cursor as an opaque, URL-safe string."""
+        delta = self.published_date - EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 10 ** 6 \
+            + delta.microseconds
+        return '{}-{}'.format(micros, self.pk)
+
+
+def published_before(queryset, cursor=None):
+    """Narrow a queryset to the published events after ``cursor``.
+
+    Args:
+        queryset (django.db.models.QuerySet): The events to page through.
+        cursor (Cursor): Where the previous page left off, or None to start
+            from the newest event.
+
+    Returns:
+        django.db.models.QuerySet: The events, newest first.
+    """
+    # fold "published" and "older than the cursor" into a single upper bound
+    # so SQLite seeks straight to it in the published_date index
+    bound = timezone.now()
+    if cursor is not None:
+        bound = min(bound, cursor.published_date)
+        queryset = queryset.filter(Q(published_date__lt=cursor.published_date)
+                                   | Q(pk__lt=cursor.pk))
+
+    return (queryset
+            .filter(published_date__lte=bound)
+            .order_by('-published_date', '-pk'))
+
+
+def paginate_published(queryset, cursor=None, per_page=PER_PAGE):
+    """Fetch one page of published events, newest first.
+
+    Args:
+        queryset (django.db.models.QuerySet): The events to page through. It
+            may be a ``values()`` queryset as long as it includes
+            ``published_date`` and ``id``.
+        cursor (Cursor): Where the previous page left off, or None for the
+            first page.
+        per_page (int): The number of events on a page.
+
+    Returns:
+        tuple(list, Cursor): The events on this page, and the cursor for the
+        next page, or None if this is the last one.
+    """
+    events = list(published_before(queryset, cursor)[:per_page + 1])
+
+    next_cursor = None
+    if len(events) > per_page:
+        events = events[:per_page]
+        last = events[-1]
+        if isinstance(last, dict):
+            next_cursor = Cursor(last['published_date'], last['id'])
+        else:
+            next_cursor = Cursor(last.published_date, last.pk)
+
+    return events, next_cursor
+
+
+def iterate_in_chunks(queryset, key='pk', chunk_size=CHUNK_SIZE):
+    """Iterate over a ``values()`` queryset of any size in flat memory.
+
+    Django 1.11's ``iterator()`` has no ``chunk_size``, and on SQLite it
+    reads the whole result into memory anyway. This fetches ``chunk_size``
+    rows at a time instead, each chunk starting after the last ``key`` of
+    the one before, so every query is a short walk along an index.
+
+    Args:
+        queryset (django.db.models.QuerySet): The rows, as dicts. ``key``
+            must be among their fields and unique within the queryset.
+        key (str): The field to order and page by.
+        chunk_size (int): How many rows to fetch per query.
+
+    Yields:
+        dict: Each row, ordered by ``key``.
+    """
+    queryset = queryset.order_by(key)
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        for row in chunk:
+            yield row
+
+        if len(chunk) < chunk_size:
+            return
+        chunk = list(queryset.filter(**{key + '__gt': chunk[-1][key]})
+                     [:chunk_size])
@@ -0,0 +1,69 @@
+"""Markdown rendering for Event invites.
+
+Rendering markdown is by far the most expensive part of showing an event, so
+we do it once when an Event is saved and keep the HTML on the row. These
+helpers only read plain attributes off the event they're given, which means
+they work just as well with the historical models handed to data migrations.
+"""
+import markdown_deux
+from django.utils import timezone
+from django.utils.dateformat import format as format_date
+from django.utils.html import conditional_escape
+
+from instrumentation.timings import timer
+
+#: Pairs of (markdown source field, rendered HTML field) on Event.
+MARKDOWN_FIELDS = (
+    ('preamble', 'preamble_html'),
+    ('description', 'description_html'),
+    ('additional_notes', 'additional_notes_html'),
+)
+
+#: Every field holding HTML rendered from the event, including the title.
+RENDERED_FIELDS = ('title_html',) + tuple(html for _, html in MARKDOWN_FIELDS)
+
+
+def render_markdown(text, style='default'):
+    """Render a chunk of markdown with the configured markdown_deux style.
+
+    Args:
+        text (str): The markdown to render.
+        style (str): The ``MARKDOWN_DEUX_STYLES`` style to render with.
+
+    Returns:
+        str: The rendered HTML, or an empty string for empty text.
+    """
+    with timer('markdown'):
+        return markdown_deux.markdown(text, style)
+
+
+def render_title(event):
+    """Render the "Bier Klub Round N" heading for an event.
+
+    Args:
+        event (klubevents.models.Event): The event to render the title of.
+
+    Returns:
+        str: The rendered HTML for the title.
+    """
+    date = format_date(timezone.template_localtime(event.date), 'Y-m-d')
+    title = 'Bier Klub Round {}: \n{} ({})'.format(
+        event.number, conditional_escape(event.name), date
+    )
+    return render_markdown(title)
+
+
+def render_event(event):
+    """Render all of the markdown on an event.
+
+    Args:
+        event (klubevents.models.Event): The event to render.
+
+    Returns:
+        dict: Maps each name in :data:`RENDERED_FIELDS` to its fresh HTML.
+    """
+    rendered = {'title_html': render_title(event)}
+    for source, html in MARKDOWN_FIELDS:
+        rendered[html] = render_markdown(getattr(event, source))
+
+    return rendered
@@ -0,0 +1,217 @@
+"""Full-text search over events, backed by an SQLite FTS5 index.
+
+The index is an external-content FTS5 table over the event text, kept in sync
+by triggers on ``klubevents_event``. Because it's the database keeping it in
+sync, bulk inserts and ``QuerySet.update()`` are indexed too.
+
+SQLite drops a table's triggers whenever Django rebuilds that table during a
+migration, so :func:`install` is idempotent and runs again after every
+``migrate`` (see :class:`klubevents.apps.KlubeventsConfig`).
+
+Databases without FTS5 fall back to ``icontains`` scans of the same fields.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Event
+
+TABLE = 'klubevents_event_search'
+
+#: The indexed Event fields, along with how much a match in each one counts
+#: towards an event's rank.
+FIELDS = (
+    ('name', 10.0),
+    ('location', 5.0),
+    ('preamble', 2.0),
+    ('description', 1.0),
+    ('additional_notes', 1.0),
+)
+
+#: How many results the public search shows.
+LIMIT = 50
+
+_COLUMNS = ', '.join(field for field, _ in FIELDS)
+_NEW = ', '.join('new.' + field for field, _ in FIELDS)
+_OLD = ', '.join('old.' + field for field, _ in FIELDS)
+
+_INSTALL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+        {columns},
+        content='klubevents_event', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_insert
+       AFTER INSERT ON klubevents_event BEGIN
+        INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_delete
+       AFTER DELETE ON klubevents_event BEGIN
+        INSERT INTO {table}({table}, rowid, {columns})
+            VALUES ('delete', old.id, {old});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_update
+       AFTER UPDATE OF {columns} ON klubevents_event BEGIN
+        INSERT INTO {table}({table}, rowid, {columns})
+            VALUES ('delete', old.id, {old});
+        INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new});
+    END""",
+)
+
+_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS {table}_insert',
+    'DROP TRIGGER IF EXISTS {table}_delete',
+    'DROP TRIGGER IF EXISTS {table}_update',
+    'DROP TABLE IF EXISTS {table}',
+)
+
+
+def _sql(statements):
+    return [statement.format(table=TABLE, columns=_COLUMNS, new=_NEW,
+                             old=_OLD)
+            for statement in statements]
+
+
+def supported(connection=default_connection):
+    """Whether ``connection`` can hold the FTS5 index."""
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+
+    return 'ENABLE_FTS5' in options
+
+
+def installed(connection=default_connection):
+    """Whether the FTS5 index exists on ``connection``."""
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master "
+                       "WHERE type = 'table' AND name = %s", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def install(connection=default_connection):
+    """Create the FTS5 index and its triggers if they're missing, indexing
+    every event if the index is new.
+
+    Returns:
+        bool: Whether the index is now there.
+    """
+    if not supported(connection):
+        return False
+
+    existed = installed(connection)
+    with connection.cursor() as cursor:
+        for statement in _sql(_INSTALL):
+            cursor.execute(statement)
+
+    if not existed:
+        rebuild(connection)
+
+    return True
+
+
+def uninstall(connection=default_connection):
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for statement in _sql(_UNINSTALL):
+            cursor.execute(statement)
+
+
+def rebuild(connection=default_connection):
+    """Re-index every event from scratch."""
+    with connection.cursor() as cursor:
+        for command in ('rebuild', 'optimize'):
+            cursor.execute("INSERT INTO {0}({0}) VALUES ('{1}')".format(
+                TABLE, command
+            ))
+
+
+def to_match(query):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every word has to appear, and the last one may be the start of a word so
+    results show up while people are still typing. Words are quoted, so
+    nothing a visitor types is treated as FTS5 syntax.
+
+    Returns:
+        str: The expression, or an empty string if there's nothing to search
+        for.
+    """
+    words = re.findall(r'\w+', query, re.UNICODE)
+    if not words:
+        return ''
+
+    terms = ['"{}"'.format(word) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def filter_events(queryset, query):
+    """Narrow a queryset of events down to those matching ``query``.
+
+    This doesn't rank the events, so it suits the admin where the change list
+    does its own ordering.
+    """
+    match = to_match(query)
+    if not match:
+        return queryset.none()
+
+    if installed():
+        return queryset.extra(
+            where=['klubevents_event.id IN (SELECT rowid FROM {0} '
+                   'WHERE {0} MATCH %s)'.format(TABLE)],
+            params=[match],
+        )
+
+    words = re.findall(r'\w+', query, re.UNICODE)
+    for word in words:
+        queryset = queryset.filter(reduce(or_, (
+            Q(**{field + '__icontains': word}) for field, _ in FIELDS
+        )))
+
+    return queryset
+
+
+def search_events(query, limit=LIMIT):
+    """Find published events matching ``query``, best matches first.
+
+    Args:
+        query (str): What the visitor typed.
+        limit (int): The most events to return.
+
+    Returns:
+        list[klubevents.models.Event]: The events, with everything but the
+        fields the results page shows deferred.
+    """
+    match = to_match(query)
+    if not match:
+        return []
+
+    if not installed():
+        return list(filter_events(Event.objects.published(), query)
+                    .only('name', 'location', 'date')
+                    .order_by('-published_date')[:limit])
+
+    weights = ', '.join(str(weight) for _, weight in FIELDS)
+    return list(Event.objects.raw(
+        'SELECT e.id, e.name, e.location, e.date '
+        'FROM {0} JOIN klubevents_event e ON e.id = {0}.rowid '
+        'WHERE {0} MATCH %s AND e.published_date <= %s '
+        'ORDER BY bm25({0}, {1}) '
+        'LIMIT %s'.format(TABLE, weights),
+        [match,
+         default_connection.ops.adapt_datetimefield_value(timezone.now()),
+         limit],
+    ))
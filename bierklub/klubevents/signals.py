@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Event, Member
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed(sender, instance, **kwargs):
+    """Throw away the cached pages showing an event that changed."""
+    cache.invalidate_events([instance.pk])
+
+
+@receiver(pre_save, sender=User)
+def normalize_user_email(sender, instance, **kwargs):
+    """Store Users' emails the way Members' are, so sign-ups can look them up
+    by index (see :meth:`MemberManager.email_registered`).
+    """
+    instance.email = Member.objects.normalize_email(instance.email)
+
+
+@receiver(post_save, sender=Member)
+def member_changed(sender, instance, created, using, **kwargs):
+    """A renamed member changes the guest list of every event they're going
+    to.
+    """
+    if created:
+        return
+
+    event_ids = list(Event.attendees.through.objects.using(using)
+                     .filter(member=instance)
+                     .values_list('event_id', flat=True))
+    if event_ids:
+        Event.objects.db_manager(using).touch(event_ids)
+        cache.invalidate_events(event_ids, listings=False)
+
+
+@receiver(pre_delete, sender=Member)
+def member_deleting(sender, instance, using, **kwargs):
+    """Note which events a member is going to before their rows go; the
+    cascade that deletes them doesn't send ``m2m_changed``.
+    """
+    instance._deleted_event_ids = list(
+        Event.attendees.through.objects.using(using)
+        .filter(member=instance)
+        .values_list('event_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Member)
+def member_deleted(sender, instance, using, **kwargs):
+    """Recount the events a deleted member was going to."""
+    event_ids = instance.__dict__.pop('_deleted_event_ids', [])
+    if event_ids:
+        Event.objects.db_manager(using).update_attendee_counts(event_ids)
+        cache.invalidate_events(event_ids, listings=False)
+
+
+@receiver(m2m_changed, sender=Event.attendees.through)
+def attendees_changed(sender, instance, action, reverse, pk_set, using,
+                      **kwargs):
+    """Keep :attr:`Event.attendee_count` in sync with ``Event.attendees``,
+    and throw away the cached guest lists.
+
+    This handles both sides of the relation, so ``event.attendees.add()`` and
+    ``member.event_set.add()`` are counted the same way.
+    """
+    if reverse and action == 'pre_clear':
+        # once the rows are gone we can't tell which events lost this member
+        instance._cleared_event_ids = list(
+            sender.objects.using(using)
+            .filter(member=instance)
+            .values_list('event_id', flat=True)
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action != 'post_clear' and not pk_set:
+        # add() and remove() skip rows that didn't change
+        return
+
+    if not reverse:
+        event_ids = [instance.pk]
+    elif action == 'post_clear':
+        event_ids = instance.__dict__.pop('_cleared_event_ids', [])
+    else:
+        event_ids = pk_set
+
+    Event.objects.db_manager(using).update_attendee_counts(event_ids)
+    # the listings don't show who's coming
+    cache.invalidate_events(event_ids, listings=False)
@@ -1,11 +1,35 @@
+import csv
 import datetime
-
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
 from django.urls import reverse
 from django.utils import timezone
-from django.test import TestCase
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, \
+    TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from bierklub.middleware import HybridSessionMiddleware
+from instrumentation import metrics
+from instrumentation.testing import QueryBudgetMixin
 
+from . import api, cache, hashing, ical, importer, search
 from .models import Event, Member
+from .pagination import PER_PAGE, Cursor, iterate_in_chunks, \
+    published_before
 
 DEFAULT_MEMBER_NAME = 'Tom Hanks'
 DEFAULT_MEMBER_EMAIL = 'tom.hanks@example.com'
@@ -125,6 +149,123 @@ def create_member(name=DEFAULT_MEMBER_NAME, email=DEFAULT_MEMBER_EMAIL,
     return member
 
 
+class EventQuerySetTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.past = create_event(name='Past', description='Test',
+                                 location='123 Fake Street',
+                                 date=now - datetime.timedelta(days=7),
+                                 published_date=now - datetime.timedelta(30))
+        self.soon = create_event(name='Soon', description='Test',
+                                 location='123 Fake Street',
+                                 date=now + datetime.timedelta(days=6),
+                                 published_date=now - datetime.timedelta(
+                                     hours=1))
+        self.later = create_event(name='Later', description='Test',
+                                  location='123 Fake Street',
+                                  date=now + datetime.timedelta(days=8),
+                                  published_date=now + datetime.timedelta(1))
+
+    def test_published(self):
+        """published() should skip events whose invite isn't up yet."""
+        self.assertCountEqual(Event.objects.published(),
+                              [self.past, self.soon])
+
+    def test_upcoming(self):
+        """upcoming() should skip past events and order by date."""
+        self.assertEqual(list(Event.objects.upcoming()),
+                         [self.soon, self.later])
+
+    def test_soon(self):
+        """soon() should agree with Event.is_soon()."""
+        self.assertEqual(list(Event.objects.soon()), [self.soon])
+        self.assertEqual(list(Event.objects.soon(days=9)),
+                         [self.soon, self.later])
+        for event in Event.objects.all():
+            self.assertEqual(event in Event.objects.soon(), event.is_soon())
+
+    def test_recently_published(self):
+        """recently_published() should agree with
+        Event.was_published_recently().
+        """
+        self.assertEqual(list(Event.objects.recently_published()),
+                         [self.soon])
+        for event in Event.objects.all():
+            self.assertEqual(event in Event.objects.recently_published(),
+                             event.was_published_recently())
+
+    def test_upcoming_uses_date_index(self):
+        """Listing upcoming events shouldn't scan past ones."""
+        sql, params = Event.objects.upcoming().query.sql_with_params()
+
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in db.fetchall())
+
+        self.assertIn('USING INDEX klubevents_event_date', plan)
+
+    def test_admin_when_filter(self):
+        """The admin should filter events with the queryset methods."""
+        User.objects.create_superuser('admin', 'admin@example.com',
+                                      DEFAULT_MEMBER_PASSWORD)
+        self.client.login(username='admin', password=DEFAULT_MEMBER_PASSWORD)
+        url = reverse('admin:klubevents_event_changelist')
+
+        resp = self.client.get(url, {'when': 'soon'})
+
+        self.assertEqual(list(resp.context['cl'].result_list), [self.soon])
+
+
+class EventRenderingTests(TestCase):
+    def test_markdown_rendered_on_save(self):
+        """Saving an event should store the HTML for all of its markdown."""
+        when = timezone.now() + datetime.timedelta(days=2)
+        event = create_event(days=-1, name='Render Test', number=4,
+                             description='Some *fancy* beer', date=when,
+                             location='123 Fake Street',
+                             preamble='Come **drink**',
+                             additional_notes='')
+
+        self.assertIn('Bier Klub Round 4', event.title_html)
+        self.assertIn('Render Test', event.title_html)
+        self.assertIn('<strong>drink</strong>', event.preamble_html)
+        self.assertIn('<em>fancy</em>', event.description_html)
+        self.assertEqual(event.additional_notes_html, '')
+
+        event.description = 'Changed'
+        event.save(update_fields=['description'])
+        event.refresh_from_db()
+        self.assertIn('Changed', event.description_html)
+
+    def test_detail_uses_stored_html(self):
+        """The detail page should show the stored HTML, not the markdown."""
+        when = timezone.now() + datetime.timedelta(days=2)
+        event = create_event(days=-1, name='Render Test',
+                             description='Some *fancy* beer', date=when,
+                             location='123 Fake Street')
+        Event.objects.filter(pk=event.pk).update(
+            description_html='<p>Stored HTML</p>'
+        )
+
+        resp = self.client.get(reverse('klubevents:detail', args=(event.id,)))
+
+        self.assertContains(resp, '<p>Stored HTML</p>', html=True)
+        self.assertNotContains(resp, '<em>fancy</em>')
+
+    def test_rerender_events_command(self):
+        """The rerender_events command should refresh stale HTML."""
+        when = timezone.now() + datetime.timedelta(days=2)
+        event = create_event(days=-1, name='Render Test',
+                             description='Some *fancy* beer', date=when,
+                             location='123 Fake Street')
+        Event.objects.filter(pk=event.pk).update(description_html='stale')
+
+        call_command('rerender_events', stdout=io.StringIO())
+
+        event.refresh_from_db()
+        self.assertIn('<em>fancy</em>', event.description_html)
+
+
 class EventViewTestCase(TestCase):
     def test_index_view_with_no_events(self):
         """If no events exist, an appropriate message should be displayed.
@@ -231,6 +372,135 @@ class EventViewTestCase(TestCase):
         self.assertQuerysetEqual(resp.context['latest_event_list'], expected)
 
 
+class EventArchiveTests(TestCase):
+    def create_events(self, count, published_date=None):
+        when = timezone.now() + datetime.timedelta(days=2)
+        return [
+            create_event(name='Archived {}'.format(i), description='Test',
+                         date=when, location='123 Fake Street', number=i,
+                         published_date=(
+                             published_date
+                             or timezone.now() - datetime.timedelta(hours=i)
+                         ))
+            for i in range(count)
+        ]
+
+    def get_all_pages(self):
+        names, cursors = [], []
+        url = reverse('klubevents:archive')
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            names.extend(event.name for event in resp.context['event_list'])
+            cursor = resp.context['next_cursor']
+            cursors.append(cursor)
+            url = (reverse('klubevents:archive') + '?before=' + cursor
+                   if cursor else None)
+
+        return names, cursors
+
+    def test_archive_pages(self):
+        """The archive should walk through every published event, newest
+        first, a page at a time.
+        """
+        events = self.create_events(PER_PAGE + 5)
+        create_event(days=3, name='Future', description='Test',
+                     date=timezone.now(), location='123 Fake Street')
+
+        names, cursors = self.get_all_pages()
+
+        self.assertEqual(names, [event.name for event in events])
+        self.assertEqual(len(cursors), 2)
+
+    def test_archive_same_published_date(self):
+        """Events published at the same moment shouldn't be skipped or
+        repeated across pages.
+        """
+        events = self.create_events(PER_PAGE * 2 + 1,
+                                    published_date=timezone.now())
+
+        names, _ = self.get_all_pages()
+
+        self.assertEqual(sorted(names), sorted(event.name for event in events))
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_archive_cursor_cannot_reach_future_events(self):
+        """A cursor from the future should not show unpublished events."""
+        self.create_events(1)
+        future = create_event(days=3, name='Future', description='Test',
+                              date=timezone.now(),
+                              location='123 Fake Street')
+        cursor = Cursor(future.published_date + datetime.timedelta(days=1),
+                        future.pk + 1)
+
+        resp = self.client.get(reverse('klubevents:archive'),
+                               {'before': cursor.encode()})
+
+        self.assertNotContains(resp, 'Future')
+        self.assertContains(resp, 'Archived 0')
+
+    def test_archive_browse_by_month(self):
+        """Browsing by month should start from a year that has events, even
+        when this year doesn't have any yet.
+        """
+        published = timezone.now() - datetime.timedelta(days=800)
+        self.create_events(1, published_date=published)
+        year_url = reverse('klubevents:archive_year', args=(
+            timezone.localtime(published).strftime('%Y'),
+        ))
+
+        resp = self.client.get(reverse('klubevents:archive'))
+
+        self.assertContains(resp, 'href="{}"'.format(year_url))
+        self.assertEqual(self.client.get(year_url).status_code, 200)
+
+    def test_archive_invalid_cursor(self):
+        """A garbage cursor should 404, including ones with numbers too big
+        for a date or the database.
+        """
+        for before in ['garbage', '1-99999999999999999999',
+                       '99999999999999999999-1', '1--1']:
+            resp = self.client.get(reverse('klubevents:archive'),
+                                   {'before': before})
+
+            self.assertEqual(resp.status_code, 404, before)
+
+    def test_archive_uses_published_date_index(self):
+        """Deep pages should seek the published_date index rather than scan
+        and sort the table.
+        """
+        cursor = Cursor(timezone.now() - datetime.timedelta(days=365), 1000)
+        queryset = published_before(Event.objects.only('name'), cursor)
+        sql, params = queryset[:PER_PAGE + 1].query.sql_with_params()
+
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in db.fetchall())
+
+        self.assertIn('USING INDEX klubevents_event_published_date', plan)
+        self.assertIn('(published_date<?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_month_archive(self):
+        """The month archive should list the events published that month.
+        """
+        published = timezone.now() - datetime.timedelta(days=40)
+        self.create_events(2, published_date=published)
+        local = timezone.localtime(published)
+
+        resp = self.client.get(reverse('klubevents:archive_month',
+                                       args=(local.strftime('%Y'),
+                                             local.strftime('%m'))))
+
+        self.assertContains(resp, 'Archived 0')
+        self.assertContains(resp, 'Archived 1')
+
+        resp = self.client.get(reverse('klubevents:archive_year',
+                                       args=(local.strftime('%Y'),)))
+
+        self.assertContains(resp, local.strftime('%B'))
+
+
 class EventDetailTests(TestCase):
     def test_detail_with_future_event(self):
         """The detail view of an Event with a future published date should 404.
@@ -257,6 +527,86 @@ class EventDetailTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertContains(resp, 'Past Test')
 
+    def test_detail_query_count_is_constant(self):
+        """The detail page should cost the same number of queries however
+        many members are attending.
+        """
+        when = timezone.now() + datetime.timedelta(7)
+        event = create_event(days=-5, name='Past Test',
+                             description='Past Test', date=when,
+                             location='123 Fake Street')
+        url = reverse('klubevents:detail', args=(event.id,))
+
+        for count in (1, 25):
+            event.attendees.clear()
+            event.attendees.add(*[
+                Member.objects.create(name='Guest {}'.format(i),
+                                      email='guest{}@example.com'.format(i))
+                for i in range(count)
+            ])
+
+            # the conditional GET validators, the event and its guest list
+            with self.assertNumQueries(3):
+                resp = self.client.get(url)
+
+            self.assertContains(resp, 'Guest {}'.format(count - 1))
+            Member.objects.all().delete()
+
+
+class AttendeeCountTests(TestCase):
+    def setUp(self):
+        when = timezone.now() + datetime.timedelta(7)
+        self.event = create_event(days=-5, name='Count Test',
+                                  description='Count Test', date=when,
+                                  location='123 Fake Street')
+        self.members = [
+            Member.objects.create(name='Guest {}'.format(i),
+                                  email='guest{}@example.com'.format(i))
+            for i in range(3)
+        ]
+
+    def assertAttendeeCount(self, expected):
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, expected)
+
+    def test_add_and_remove(self):
+        """Adding and removing attendees should update the count."""
+        self.event.attendees.add(*self.members)
+        self.assertAttendeeCount(3)
+
+        # adding someone twice shouldn't count them twice
+        self.event.attendees.add(self.members[0])
+        self.assertAttendeeCount(3)
+
+        self.event.attendees.remove(self.members[0])
+        self.assertAttendeeCount(2)
+
+        self.event.attendees.clear()
+        self.assertAttendeeCount(0)
+
+    def test_reverse_side(self):
+        """Changes made from the Member side should update the count."""
+        other = create_event(days=-5, name='Other', description='Other',
+                             date=self.event.date, location='Elsewhere')
+        member = self.members[0]
+
+        member.event_set.add(self.event, other)
+        self.assertAttendeeCount(1)
+
+        member.event_set.clear()
+        self.assertAttendeeCount(0)
+        other.refresh_from_db()
+        self.assertEqual(other.attendee_count, 0)
+
+    def test_member_deleted(self):
+        """Deleting a member should take them off the count; the cascade
+        that does it doesn't send ``m2m_changed``.
+        """
+        self.event.attendees.add(*self.members)
+        self.members[0].delete()
+
+        self.assertAttendeeCount(2)
+
 
 class AttendingSubmitTests(TestCase):
     def test_attending_submit_successful(self):
@@ -387,6 +737,1486 @@ class AttendingSubmitTests(TestCase):
         # the form should refill itself, so this should be on the page
         self.assertContains(resp, 'testuser@example.com')
 
+    def test_attending_submit_twice(self):
+        """Submitting the same RSVP twice should be a no-op the second time.
+        """
+        when = timezone.now() + datetime.timedelta(30)
+        event = create_event(days=-7, name='Member Test',
+                             description='Member Test', date=when,
+                             location='123 Fake Street')
+        url = reverse('klubevents:attending_submit', args=(event.id,))
+        payload = {'name': DEFAULT_MEMBER_NAME, 'email': DEFAULT_MEMBER_EMAIL}
+
+        first = self.client.post(url, payload)
+        second = self.client.post(url, payload)
+
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(Member.objects.count(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.attendees.count(), 1)
+        self.assertEqual(event.attendee_count, 1)
+
+    def test_attending_submit_email_case(self):
+        """Emails should match an existing member whatever their case."""
+        when = timezone.now() + datetime.timedelta(30)
+        event = create_event(days=-7, name='Member Test',
+                             description='Member Test', date=when,
+                             location='123 Fake Street')
+        member = create_member()
+
+        url = reverse('klubevents:attending_submit', args=(event.id,))
+        self.client.post(url, {
+            'name': DEFAULT_MEMBER_NAME,
+            'email': '  ' + DEFAULT_MEMBER_EMAIL.upper(),
+        })
+
+        self.assertEqual(Member.objects.count(), 1)
+        self.assertEqual(list(event.attendees.all()), [member])
+
+    def test_attending_submit_does_not_rewrite_event(self):
+        """An RSVP should only touch the event's attendee count."""
+        when = timezone.now() + datetime.timedelta(30)
+        event = create_event(days=-7, name='Member Test',
+                             description='Member Test', date=when,
+                             location='123 Fake Street')
+        url = reverse('klubevents:attending_submit', args=(event.id,))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url, {'name': DEFAULT_MEMBER_NAME,
+                                   'email': DEFAULT_MEMBER_EMAIL})
+
+        event_writes = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "klubevents_event"')
+        ]
+        self.assertEqual(len(event_writes), 1)
+        self.assertIn('"attendee_count"', event_writes[0])
+        self.assertNotIn('"description"', event_writes[0])
+
+
+class AttendingSubmitConcurrencyTests(TransactionTestCase):
+    def test_parallel_submissions(self):
+        """A burst of RSVPs for one event should neither fail nor make
+        duplicate members, even when the same people submit more than once.
+        """
+        when = timezone.now() + datetime.timedelta(30)
+        event = create_event(days=-7, name='Member Test',
+                             description='Member Test', date=when,
+                             location='123 Fake Street')
+        url = reverse('klubevents:attending_submit', args=(event.id,))
+        statuses = []
+
+        def submit(i):
+            try:
+                resp = Client().post(url, {
+                    # everyone submits twice
+                    'name': 'Guest {}'.format(i % 10),
+                    'email': 'guest{}@example.com'.format(i % 10),
+                })
+                statuses.append(resp.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(i,))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [302] * 20)
+        self.assertEqual(Member.objects.count(), 10)
+        event.refresh_from_db()
+        self.assertEqual(event.attendees.count(), 10)
+        self.assertEqual(event.attendee_count, 10)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        when = timezone.now() + datetime.timedelta(30)
+        self.event = create_event(days=-7, name='Conditional Test',
+                                  description='Conditional Test', date=when,
+                                  location='123 Fake Street')
+        self.detail_url = reverse('klubevents:detail', args=(self.event.id,))
+
+    def test_detail_not_modified(self):
+        """A repeat visitor should get a 304 without rendering the page."""
+        resp = self.client.get(self.detail_url)
+        etag = resp['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('Last-Modified', resp)
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 304)
+        self.assertFalse(resp.content)
+        self.assertTemplateNotUsed(resp, 'klubevents/detail.html')
+
+        resp = self.client.get(
+            self.detail_url,
+            HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']
+        )
+        self.assertEqual(resp.status_code, 304)
+
+    def test_detail_etag_changes_with_attendees(self):
+        """Someone RSVPing should change the detail page's ETag."""
+        etag = self.client.get(self.detail_url)['ETag']
+
+        self.client.post(
+            reverse('klubevents:attending_submit', args=(self.event.id,)),
+            {'name': DEFAULT_MEMBER_NAME, 'email': DEFAULT_MEMBER_EMAIL}
+        )
+        resp = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertContains(resp, DEFAULT_MEMBER_NAME)
+
+    def test_member_rename_touches_events(self):
+        """Renaming a member changes the guest lists they're on."""
+        member = Member.objects.create(name='Old Name',
+                                       email=DEFAULT_MEMBER_EMAIL)
+        self.event.attendees.add(member)
+        etag = self.client.get(self.detail_url)['ETag']
+
+        member.name = 'New Name'
+        member.save()
+        resp = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'New Name')
+
+    def test_detail_etag_varies_by_user(self):
+        """Logged in members see their name, so they get their own ETag."""
+        etag = self.client.get(self.detail_url)['ETag']
+        member = create_member()
+        self.client.login(username=member.email,
+                          password=DEFAULT_MEMBER_PASSWORD)
+
+        resp = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+
+    def test_unpublished_detail_still_404s(self):
+        """Validators shouldn't leak unpublished events."""
+        future = create_event(days=7, name='Future', description='Future',
+                              date=self.event.date,
+                              location='123 Fake Street')
+
+        resp = self.client.get(reverse('klubevents:detail',
+                                       args=(future.id,)))
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertNotIn('ETag', resp)
+
+    def test_index_not_modified(self):
+        """The index should 304 until an event on it changes."""
+        url = reverse('klubevents:index')
+        etag = self.client.get(url)['ETag']
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        create_event(days=-1, name='Newer', description='Newer',
+                     date=self.event.date, location='123 Fake Street')
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'Newer')
+
+
+@override_settings(PAGE_CACHE_ALIAS='pages_local')
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.get_page_cache().clear()
+        when = timezone.now() + datetime.timedelta(30)
+        self.event = create_event(days=-7, name='Cache Test',
+                                  description='Cache Test', date=when,
+                                  location='123 Fake Street')
+        self.detail_url = reverse('klubevents:detail', args=(self.event.id,))
+
+    def test_detail_cached(self):
+        """The second anonymous view of an event should come straight from
+        the cache, only touching the database for its validators.
+        """
+        resp = self.client.get(self.detail_url)
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.detail_url)
+
+        self.assertEqual(resp['X-Page-Cache'], 'hit')
+        self.assertContains(resp, 'Cache Test')
+
+    def test_rsvp_invalidates_detail(self):
+        """Someone RSVPing should put them on the cached guest list."""
+        self.client.get(self.detail_url)
+
+        self.client.post(
+            reverse('klubevents:attending_submit', args=(self.event.id,)),
+            {'name': DEFAULT_MEMBER_NAME, 'email': DEFAULT_MEMBER_EMAIL}
+        )
+        resp = self.client.get(self.detail_url)
+
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertContains(resp, DEFAULT_MEMBER_NAME)
+
+    def test_event_save_invalidates_listings(self):
+        """Editing an event should refresh it on the index."""
+        index_url = reverse('klubevents:index')
+        self.client.get(index_url)
+        self.assertEqual(self.client.get(index_url)['X-Page-Cache'], 'hit')
+
+        self.event.name = 'Renamed'
+        self.event.save()
+        resp = self.client.get(index_url)
+
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertContains(resp, 'Renamed')
+
+    def test_event_delete_invalidates_detail(self):
+        """A deleted event's cached page should go with it."""
+        self.client.get(self.detail_url)
+
+        self.event.delete()
+
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+
+    def test_member_delete_invalidates_detail(self):
+        """A deleted member should come off the cached guest list."""
+        member = create_member()
+        self.event.attendees.add(member)
+        self.client.get(self.detail_url)
+
+        member.delete()
+        resp = self.client.get(self.detail_url)
+
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertNotContains(resp, DEFAULT_MEMBER_NAME)
+
+    def test_authenticated_not_cached(self):
+        """Logged in members see their own name, so skip the cache."""
+        member = create_member()
+        self.client.login(username=member.email,
+                          password=DEFAULT_MEMBER_PASSWORD)
+
+        self.client.get(self.detail_url)
+        resp = self.client.get(self.detail_url)
+
+        self.assertNotIn('X-Page-Cache', resp)
+        self.assertContains(resp, 'Cheers')
+
+    def test_cached_attending_form_csrf(self):
+        """Every visitor should get their own working CSRF token, even when
+        the attending form comes out of the cache.
+        """
+        url = reverse('klubevents:attending', args=(self.event.id,))
+        submit_url = reverse('klubevents:attending_submit',
+                             args=(self.event.id,))
+
+        forms = []
+        for outcome in ['miss', 'hit']:
+            client = Client(enforce_csrf_checks=True)
+            resp = client.get(url)
+            self.assertEqual(resp['X-Page-Cache'], outcome)
+            self.assertNotContains(resp, cache.CSRF_PLACEHOLDER)
+
+            token = re.search(r"name='csrfmiddlewaretoken' value='([^']+)'",
+                              resp.content.decode('utf-8')).group(1)
+            forms.append((client, token))
+
+        for i, (client, token) in enumerate(forms):
+            resp = client.post(submit_url, {
+                'name': 'Guest {}'.format(i),
+                'email': 'guest{}@example.com'.format(i),
+                'csrfmiddlewaretoken': token,
+            })
+            self.assertEqual(resp.status_code, 302)
+
+    def test_listing_timeout_until_next_publication(self):
+        """Listings shouldn't be cached past the next event going live."""
+        create_event(name='Soon', description='Soon', date=self.event.date,
+                     location='123 Fake Street',
+                     published_date=(timezone.now()
+                                     + datetime.timedelta(seconds=30)))
+
+        self.assertLessEqual(cache.listing_timeout(), 31)
+
+    def test_command_stats(self):
+        """``manage.py pagecache`` should add up the counted hits and
+        misses, and start them over from a cold cache with ``--clear``.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(setattr, metrics, '_store', None)
+        with self.settings(INSTRUMENTATION_ENABLED=True,
+                           METRICS_DIR=directory):
+            with self.assertLogs('instrumentation.requests', 'INFO'):
+                for _ in range(4):
+                    self.client.get(self.detail_url)
+            # the command runs in its own process, after this one has flushed
+            metrics.get_store().flush()
+
+            out = io.StringIO()
+            call_command('pagecache', stdout=out)
+            self.assertEqual(out.getvalue(),
+                             'hits: 3\nmisses: 1\nhit ratio: 75.0%\n')
+
+            out = io.StringIO()
+            call_command('pagecache', clear=True, stdout=out)
+            self.assertTrue(out.getvalue().startswith(
+                'Cleared the page cache.\n'))
+            with self.assertLogs('instrumentation.requests', 'INFO'):
+                resp = self.client.get(self.detail_url)
+            self.assertEqual(resp['X-Page-Cache'], 'miss')
+
+    def test_command_without_metrics(self):
+        """Without the request metrics there are no counters to show,
+        which should be an error rather than a row of zeros.
+        """
+        self.client.get(self.detail_url)
+
+        with self.assertRaisesMessage(CommandError, 'METRICS_DIR'):
+            call_command('pagecache', stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('pagecache', clear=True, stdout=out)
+        self.assertEqual(out.getvalue(), 'Cleared the page cache.\n')
+        resp = self.client.get(self.detail_url)
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+
+    @override_settings(PAGE_CACHE_ALIAS=None)
+    def test_command_cache_off(self):
+        with self.assertRaisesMessage(CommandError, 'PAGE_CACHE_ALIAS'):
+            call_command('pagecache', stdout=io.StringIO())
+
+
+class CalendarTests(TestCase):
+    def setUp(self):
+        when = timezone.now() + datetime.timedelta(30)
+        self.event = create_event(days=-7, name='Stout Night',
+                                  description='Bring friends, and ID',
+                                  date=when, location='123 Fake Street')
+        self.feed_url = reverse('klubevents:feed')
+
+    def get_content(self, resp):
+        return b''.join(resp.streaming_content).decode('utf-8')
+
+    def test_feed(self):
+        """The feed should be a calendar of published events."""
+        create_event(days=7, name='Unpublished', description='Secret',
+                     date=self.event.date, location='123 Fake Street')
+
+        resp = self.client.get(self.feed_url)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], ical.CONTENT_TYPE)
+        self.assertTrue(resp.streaming)
+        content = self.get_content(resp)
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('SUMMARY:#1 Stout Night\r\n', content)
+        self.assertIn('DESCRIPTION:Bring friends\\, and ID\r\n', content)
+        self.assertIn('DTSTART:' + self.event.date.astimezone(
+            timezone.utc).strftime('%Y%m%dT%H%M%SZ'), content)
+        self.assertNotIn('Unpublished', content)
+
+    def test_feed_not_modified(self):
+        """A client polling the feed should get a 304 until an event
+        changes, from a single query.
+        """
+        etag = self.client.get(self.feed_url)['ETag']
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        self.event.location = '456 Real Street'
+        self.event.save()
+        resp = self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('456 Real Street', self.get_content(resp))
+
+    def test_feed_etag_changes_on_delete(self):
+        etag = self.client.get(self.feed_url)['ETag']
+
+        self.event.delete()
+        resp = self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('VEVENT', self.get_content(resp))
+
+    def test_feed_same_for_everyone(self):
+        """Calendars don't show who's logged in, so neither does the ETag."""
+        etag = self.client.get(self.feed_url)['ETag']
+        member = create_member()
+        self.client.login(username=member.email,
+                          password=DEFAULT_MEMBER_PASSWORD)
+
+        resp = self.client.get(self.feed_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 304)
+
+    @override_settings(PAGE_CACHE_ALIAS='pages_local')
+    def test_feed_cached(self):
+        """Once one client has fetched the feed, the rest should get it from
+        the page cache, until an event changes.
+        """
+        cache.get_page_cache().clear()
+        resp = self.client.get(self.feed_url)
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        content = self.get_content(resp)
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.feed_url)
+        self.assertEqual(resp['X-Page-Cache'], 'hit')
+        self.assertEqual(self.get_content(resp), content)
+
+        self.event.name = 'Porter Night'
+        self.event.save()
+        resp = self.client.get(self.feed_url)
+
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertIn('Porter Night', self.get_content(resp))
+
+    def test_event_calendar(self):
+        url = reverse('klubevents:event_calendar', args=(self.event.id,))
+
+        resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('attachment', resp['Content-Disposition'])
+        content = self.get_content(resp)
+        self.assertEqual(content.count('BEGIN:VEVENT'), 1)
+        self.assertIn('LOCATION:123 Fake Street\r\n', content)
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_unpublished_event_calendar_404s(self):
+        future = create_event(days=7, name='Future', description='Future',
+                              date=self.event.date,
+                              location='123 Fake Street')
+
+        resp = self.client.get(reverse('klubevents:event_calendar',
+                                       args=(future.id,)))
+
+        self.assertEqual(resp.status_code, 404)
+
+    def test_fold(self):
+        """Long lines should be folded at 75 octets without splitting
+        characters.
+        """
+        line = 'DESCRIPTION:' + '\u00f8l ' * 40
+
+        folded = ical.fold(line)
+
+        lines = folded.split('\r\n')
+        self.assertEqual(lines[-1], '')
+        for part in lines[:-1]:
+            self.assertLessEqual(len(part.encode('utf-8')), 75)
+        self.assertEqual(''.join(part[1:] if i else part
+                                 for i, part in enumerate(lines[:-1])),
+                         line)
+
+
+class APITests(TestCase):
+    def setUp(self):
+        self.events = [
+            create_event(name='Event {}'.format(i),
+                         description='**Beer** {}.'.format(i), number=i,
+                         date=timezone.now(), days=-i - 1,
+                         location='123 Fake Street')
+            for i in range(5)
+        ]
+        self.list_url = reverse('klubevents:api_event_list')
+        self.detail_url = reverse('klubevents:api_event_detail',
+                                  args=(self.events[0].pk,))
+
+    def test_list(self):
+        """Published events should be listed newest first."""
+        create_event(days=7, name='Unpublished', description='Secret',
+                     date=timezone.now(), location='123 Fake Street')
+
+        data = self.client.get(self.list_url).json()
+
+        self.assertEqual([event['name'] for event in data['events']],
+                         ['Event {}'.format(i) for i in range(5)])
+        self.assertEqual(set(data['events'][0]), set(api.DEFAULT_FIELDS))
+        self.assertIsNone(data['next'])
+
+    def test_list_pages(self):
+        """Following ``next`` should walk through every event once."""
+        names = []
+        url = self.list_url + '?limit=2&fields=name'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['events']), 2)
+            names.extend(event['name'] for event in data['events'])
+            url = data['next']
+
+        self.assertEqual(names, ['Event {}'.format(i) for i in range(5)])
+
+    def test_fields_limit_columns(self):
+        """Only the columns asked for should be read."""
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.list_url,
+                                   {'fields': 'name,description_html'}).json()
+
+        event = data['events'][0]
+        self.assertEqual(event, {
+            'name': 'Event 0',
+            'description_html': self.events[0].description_html,
+        })
+        self.assertIn('<strong>Beer</strong>', event['description_html'])
+        select = queries[-1]['sql']
+        self.assertNotIn('"klubevents_event"."description"', select)
+        self.assertNotIn('"klubevents_event"."location"', select)
+
+    def test_bad_requests(self):
+        for params in [{'fields': 'name,password'}, {'cursor': 'nope'},
+                       {'limit': 'lots'}, {'limit': '0'},
+                       {'fields': 'guests'},
+                       {'cursor': '99999999999999999999-1'},
+                       {'cursor': '1-99999999999999999999'}]:
+            resp = self.client.get(self.list_url, params)
+            self.assertEqual(resp.status_code, 400, params)
+            self.assertIn('error', resp.json())
+
+    def test_detail(self):
+        """An event should come with its guest list."""
+        self.events[0].attendees.add(
+            Member.objects.create(name='Ada', email='ada@example.com'),
+            Member.objects.create(name='Bert', email='bert@example.com'),
+        )
+
+        data = self.client.get(self.detail_url).json()
+
+        self.assertEqual(data['name'], 'Event 0')
+        self.assertEqual(data['attendee_count'], 2)
+        self.assertEqual(data['guests'], ['Ada', 'Bert'])
+
+    def test_detail_fields(self):
+        data = self.client.get(self.detail_url,
+                               {'fields': 'title_html'}).json()
+
+        self.assertEqual(data, {'title_html': self.events[0].title_html})
+
+    def test_detail_not_modified(self):
+        etag = self.client.get(self.detail_url)['ETag']
+
+        resp = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        self.events[0].attendees.add(
+            Member.objects.create(name='Ada', email='ada@example.com'))
+        resp = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_unpublished_detail_404s(self):
+        future = create_event(days=7, name='Future', description='Future',
+                              date=timezone.now(), location='123 Fake Street')
+
+        resp = self.client.get(reverse('klubevents:api_event_detail',
+                                       args=(future.pk,)))
+
+        self.assertEqual(resp.status_code, 404)
+
+
+class EventSearchTests(TestCase):
+    def setUp(self):
+        self.url = reverse('klubevents:search')
+        self.date = timezone.now() + datetime.timedelta(days=7)
+
+    def create(self, name, **kwargs):
+        kwargs.setdefault('description', 'Beer.')
+        kwargs.setdefault('location', '123 Fake Street')
+        kwargs.setdefault('days', -1)
+        return create_event(name=name, date=self.date, **kwargs)
+
+    def test_index_installed(self):
+        """The migrations should leave the full-text index in place."""
+        self.assertTrue(search.installed())
+
+    def test_name_ranks_above_description(self):
+        """A match in the name should beat one in the description."""
+        described = self.create('Tasting', description='Plenty of lager.')
+        named = self.create('Lager Night')
+
+        self.assertEqual(search.search_events('lager'), [named, described])
+
+    def test_prefix_and_stemming(self):
+        """The last word may be unfinished, and words are stemmed."""
+        event = self.create('Brewing Workshop')
+
+        self.assertEqual(search.search_events('brew'), [event])
+        self.assertEqual(search.search_events('workshops'), [event])
+
+    def test_all_words_required(self):
+        self.create('Lager Night')
+        stout = self.create('Stout Night')
+
+        self.assertEqual(search.search_events('stout night'), [stout])
+
+    def test_only_published(self):
+        """Unpublished events shouldn't turn up in search results."""
+        published = self.create('Lager Night')
+        self.create('Lager Morning', days=1)
+
+        self.assertEqual(search.search_events('lager'), [published])
+
+    def test_index_follows_changes(self):
+        """Saves, updates and deletes should all reach the index."""
+        event = self.create('Lager Night')
+
+        event.name = 'Stout Night'
+        event.save()
+        self.assertEqual(search.search_events('lager'), [])
+        self.assertEqual(search.search_events('stout'), [event])
+
+        Event.objects.filter(pk=event.pk).update(location='The Porter House')
+        self.assertEqual(search.search_events('porter'), [event])
+
+        event.delete()
+        self.assertEqual(search.search_events('stout'), [])
+
+    def test_syntax_is_quoted(self):
+        """Nothing a visitor types should be parsed as FTS5 syntax."""
+        event = self.create('Lager Night')
+
+        for query in ('lager OR', '"lager', 'lager*)', 'NEAR(lager', 'name:'):
+            search.search_events(query)
+
+        self.assertEqual(search.search_events('-lager-'), [event])
+        self.assertEqual(search.search_events('!!!'), [])
+
+    def test_search_view(self):
+        event = self.create('Lager Night')
+        self.create('Stout Night')
+
+        resp = self.client.get(self.url, {'q': 'lager'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['event_list'], [event])
+        self.assertContains(resp, reverse('klubevents:detail',
+                                          args=(event.pk,)))
+        self.assertNotContains(resp, 'Stout Night')
+
+    def test_search_view_no_results(self):
+        resp = self.client.get(self.url, {'q': 'lager'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'No events match')
+
+    def test_admin_search(self):
+        """The admin change list should search through the index too."""
+        event = self.create('Lager Night')
+        self.create('Stout Night')
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+
+        resp = self.client.get(reverse('admin:klubevents_event_changelist'),
+                               {'q': 'lager'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(resp.context['cl'].result_list), [event])
+
+    def test_rebuild_command(self):
+        """Rebuilding should re-index events the triggers never saw."""
+        event = self.create('Lager Night')
+        search.uninstall()
+        self.assertFalse(search.installed())
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        self.assertTrue(search.installed())
+        self.assertEqual(search.search_events('lager'), [event])
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+
+        self.event = create_event(name='Lager Night', description='Beer.',
+                                  date=timezone.now(), days=-1,
+                                  location='123 Fake Street')
+
+    def add_members(self, count, start=0):
+        users = User.objects.bulk_create(
+            User(username='member{}@example.com'.format(i))
+            for i in range(start, start + count)
+        )
+        users = User.objects.filter(username__in=[u.username for u in users])
+        Member.objects.bulk_create(
+            Member(name='Member {}'.format(i), email=user.username, user=user)
+            for i, user in enumerate(users, start)
+        )
+
+    def capture_queries(self, url, data=None):
+        # the first request warms up the content type cache
+        self.client.get(url, data)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, data)
+        self.assertEqual(resp.status_code, 200)
+        return resp, [query['sql'] for query in queries]
+
+    def test_event_change_page_doesnt_list_members(self):
+        """The attendee picker shouldn't render every Member."""
+        self.add_members(50)
+        url = reverse('admin:klubevents_event_change', args=(self.event.pk,))
+
+        resp, before = self.capture_queries(url)
+        self.assertNotContains(resp, 'Member 49')
+        self.assertContains(resp, 'vManyToManyRawIdAdminField')
+
+        self.add_members(50, start=50)
+        _, after = self.capture_queries(url)
+        self.assertEqual(len(before), len(after))
+
+    def test_event_change_page_saves_attendees(self):
+        """Picking attendees by id should keep attendee_count right."""
+        self.add_members(2)
+        members = list(Member.objects.order_by('pk'))
+        url = reverse('admin:klubevents_event_change', args=(self.event.pk,))
+
+        resp = self.client.post(url, {
+            'name': self.event.name,
+            'number': self.event.number,
+            'date_0': self.event.date.strftime('%Y-%m-%d'),
+            'date_1': self.event.date.strftime('%H:%M:%S'),
+            'location': self.event.location,
+            'preamble': 'Preamble.',
+            'description': self.event.description,
+            'additional_notes': 'Notes.',
+            'published_date_0': self.event.published_date.strftime('%Y-%m-%d'),
+            'published_date_1': self.event.published_date.strftime('%H:%M:%S'),
+            'attendees': ','.join(str(member.pk) for member in members),
+        })
+
+        self.assertEqual(resp.status_code, 302)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, 2)
+
+    def test_member_changelist_queries(self):
+        """The Member change list shouldn't query once per row or count
+        every Member.
+        """
+        self.add_members(5)
+        url = reverse('admin:klubevents_member_changelist')
+
+        resp, before = self.capture_queries(url)
+        self.assertContains(resp, 'member4@example.com')
+
+        self.add_members(20, start=5)
+        _, after = self.capture_queries(url, {'q': 'member'})
+        self.assertEqual(len(before), len(after))
+        # with a search, a second, unfiltered COUNT(*) would be the full
+        # result count
+        self.assertEqual(len([sql for sql in after if 'COUNT(' in sql]), 1)
+
+    def test_member_search(self):
+        self.add_members(3)
+        url = reverse('admin:klubevents_member_changelist')
+
+        resp = self.client.get(url, {'q': 'member1@'})
+
+        self.assertEqual([member.email
+                          for member in resp.context['cl'].result_list],
+                         ['member1@example.com'])
+
+    def test_member_attendance_inline(self):
+        """A Member's page should list the events they're going to."""
+        member = create_member()
+        self.event.attendees.add(member)
+        other = create_event(name='Stout Night', description='Beer.',
+                             date=timezone.now(), days=-1,
+                             location='123 Fake Street')
+        other.attendees.add(member)
+        url = reverse('admin:klubevents_member_change', args=(member.pk,))
+
+        resp, before = self.capture_queries(url)
+        self.assertContains(resp, 'Lager Night')
+        self.assertContains(resp, 'Stout Night')
+
+        create_event(name='Porter Night', description='Beer.',
+                     date=timezone.now(), days=-1,
+                     location='123 Fake Street').attendees.add(member)
+        _, after = self.capture_queries(url)
+        self.assertEqual(len(before), len(after))
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Keep the busiest pages' query counts within
+    ``klubevents/query_budgets.json``.
+
+    Each page is loaded with more than one of everything, so queries run per
+    event or per member go over budget.
+    """
+    query_budget_file = os.path.join(os.path.dirname(__file__),
+                                     'query_budgets.json')
+
+    def setUp(self):
+        self.events = [
+            create_event(name='Event {}'.format(i), description='Beer.',
+                         number=i, date=timezone.now(), days=-i - 1,
+                         location='123 Fake Street')
+            for i in range(3)
+        ]
+        self.members = [
+            Member.objects.create(name='Member {}'.format(i),
+                                  email='member{}@example.com'.format(i))
+            for i in range(3)
+        ]
+        for event in self.events:
+            event.attendees.add(*self.members)
+
+    def test_index(self):
+        self.assertQueryBudget('GET', reverse('klubevents:index'))
+
+    def test_detail(self):
+        resp = self.assertQueryBudget(
+            'GET', reverse('klubevents:detail', args=(self.events[0].pk,))
+        )
+        self.assertContains(resp, 'Member 2')
+
+    def test_feed(self):
+        resp = self.assertQueryBudget('GET', reverse('klubevents:feed'))
+        self.assertEqual(
+            b''.join(resp.streaming_content).count(b'BEGIN:VEVENT'), 3
+        )
+
+    def test_api_event_list(self):
+        resp = self.assertQueryBudget('GET',
+                                      reverse('klubevents:api_event_list'))
+        self.assertEqual(len(resp.json()['events']), 3)
+
+    def test_api_event_detail(self):
+        resp = self.assertQueryBudget('GET', reverse(
+            'klubevents:api_event_detail', args=(self.events[0].pk,)
+        ))
+        self.assertEqual(len(resp.json()['guests']), 3)
+
+    def test_attending_success(self):
+        event, member = self.events[0], self.members[0]
+
+        resp = self.assertQueryBudget('GET', reverse(
+            'klubevents:attending_success', args=(event.pk, member.pk)
+        ))
+
+        self.assertContains(resp, 'Thanks for attending Event 0, Member 0.')
+
+    def test_attending_success_not_attending(self):
+        """Only members going to the event get a thank you."""
+        member = Member.objects.create(name='Stranger',
+                                       email='stranger@example.com')
+
+        resp = self.client.get(reverse('klubevents:attending_success',
+                                       args=(self.events[0].pk, member.pk)))
+
+        self.assertEqual(resp.status_code, 404)
+
+    def test_member_registration(self):
+        url = reverse('klubevents:member_registration')
+        self.assertQueryBudget('GET', url)
+
+        resp = self.assertQueryBudget('POST', url, {
+            'full_name': DEFAULT_MEMBER_NAME,
+            'email': DEFAULT_MEMBER_EMAIL,
+            'password': DEFAULT_MEMBER_PASSWORD,
+            'confirm_password': DEFAULT_MEMBER_PASSWORD,
+        })
+        self.assertContains(resp, 'Welcome to the site')
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, **options):
+        options = dict(dict(events=6, members=40, users=0.5, attendees=10,
+                            batch_size=7), **options)
+        call_command('generate_dataset', stdout=io.StringIO(), **options)
+
+    def test_generate(self):
+        self.generate()
+
+        self.assertEqual(Event.objects.count(), 6)
+        self.assertEqual(Member.objects.count(), 40)
+        self.assertTrue(0 < User.objects.count() < 40)
+        self.assertEqual(Member.objects.filter(user__isnull=False).count(),
+                         User.objects.count())
+        for member in Member.objects.filter(user__isnull=False):
+            self.assertEqual(member.user.email, member.email)
+
+        # some events are still to come
+        self.assertTrue(Event.objects.upcoming().exists())
+        self.assertTrue(Event.objects.published().exists())
+
+    def test_events_rendered_and_counted(self):
+        """Bulk-made events should look just like saved ones."""
+        self.generate()
+
+        through = Event.attendees.through.objects
+        for event in Event.objects.all():
+            self.assertEqual(event.attendee_count,
+                             through.filter(event=event).count())
+            self.assertIn('Bier Klub Round', event.title_html)
+            self.assertIn('<p>', event.description_html)
+
+            # re-rendering shouldn't change a thing
+            html = {field: getattr(event, field)
+                    for field in ('title_html', 'preamble_html',
+                                  'description_html', 'additional_notes_html')}
+            event.render_markdown()
+            self.assertEqual(html, {field: getattr(event, field)
+                                    for field in html})
+
+    def test_generate_twice(self):
+        """Running the command again should add to what's there."""
+        self.generate()
+        self.generate(seed=1)
+
+        self.assertEqual(Member.objects.count(), 80)
+        self.assertEqual(Event.objects.count(), 12)
+        self.assertEqual(Event.objects.values('number').distinct().count(),
+                         12)
+
+    def test_searchable(self):
+        """The search index should pick up the bulk-made events."""
+        self.generate(events=20)
+
+        self.assertTrue(search.search_events('brooklyn'))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.event = create_event(name='Lager Night', description='Beer.',
+                                  date=timezone.now(), days=-1,
+                                  location='123 Fake Street')
+        self.other = create_event(name='Stout Night', description='Beer.',
+                                  date=timezone.now(), days=-1,
+                                  location='123 Fake Street')
+        self.members = [
+            Member.objects.create(name='Member {}'.format(i),
+                                  email='member{}@example.com'.format(i))
+            for i in range(5)
+        ]
+        self.event.attendees.add(*self.members[:3])
+        self.other.attendees.add(*self.members[2:])
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def login(self):
+        self.client.login(username='admin', password='admin')
+
+    def get(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode('utf-8')
+
+    def test_staff_only(self):
+        for url in (reverse('klubevents:members_export', args=('csv',)),
+                    reverse('klubevents:attendees_export',
+                            args=(self.event.pk, 'csv'))):
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 302)
+            self.assertIn(reverse('admin:login'), resp['Location'])
+
+    def test_attendees_csv(self):
+        self.login()
+
+        rows = list(csv.DictReader(io.StringIO(self.get(reverse(
+            'klubevents:attendees_export', args=(self.event.pk, 'csv')
+        )))))
+
+        self.assertEqual([row['email'] for row in rows],
+                         ['member{}@example.com'.format(i) for i in range(3)])
+        self.assertEqual({row['event_name'] for row in rows}, {'Lager Night'})
+
+    def test_members_json(self):
+        self.members[0].user = User.objects.get(username='admin')
+        self.members[0].save()
+        self.login()
+
+        rows = json.loads(self.get(reverse('klubevents:members_export',
+                                           args=('json',))))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['registered'], True)
+        self.assertEqual(rows[1]['registered'], False)
+        self.assertEqual(rows[1]['join_date'], Member.objects.get(
+            pk=self.members[1].pk
+        ).join_date.isoformat())
+
+    def test_empty_json(self):
+        self.login()
+        event = create_event(name='Empty Night', description='Beer.',
+                             date=timezone.now(), days=-1,
+                             location='123 Fake Street')
+
+        self.assertEqual(json.loads(self.get(reverse(
+            'klubevents:attendees_export', args=(event.pk, 'json')
+        ))), [])
+
+    def test_formulas_escaped(self):
+        """Cells shouldn't run as spreadsheet formulas."""
+        self.members[0].name = '=HYPERLINK("http://evil.example.com")'
+        self.members[0].save()
+        self.login()
+
+        content = self.get(reverse('klubevents:members_export',
+                                   args=('csv',)))
+
+        self.assertIn('\'=HYPERLINK', content)
+
+    def test_chunked(self):
+        """Rows should be read a chunk at a time, each query starting after
+        the last chunk.
+        """
+        rows = Member.objects.values('pk', 'name')
+        with CaptureQueriesContext(connection) as queries:
+            names = [row['name']
+                     for row in iterate_in_chunks(rows, chunk_size=2)]
+
+        self.assertEqual(names, ['Member {}'.format(i) for i in range(5)])
+        self.assertEqual(len(queries), 3)
+        self.assertIn('LIMIT 2', queries[-1]['sql'])
+        self.assertIn('"id" >', queries[-1]['sql'])
+
+    def test_admin_action(self):
+        self.login()
+
+        resp = self.client.post(reverse('admin:klubevents_event_changelist'), {
+            'action': 'export_attendees',
+            '_selected_action': [self.event.pk, self.other.pk],
+        })
+
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(resp.streaming_content).decode('utf-8')
+        )))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row['event_id'] for row in rows},
+                         {str(self.event.pk), str(self.other.pk)})
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.event = create_event(name='Lager Night', description='Beer.',
+                                  number=12, date=timezone.now(), days=-1,
+                                  location='123 Fake Street')
+        self.other = create_event(name='Stout Night', description='Beer.',
+                                  number=13, date=timezone.now(), days=-1,
+                                  location='123 Fake Street')
+
+    def import_csv(self, text, **kwargs):
+        return importer.import_csv(csv.DictReader(io.StringIO(text)),
+                                   **kwargs)
+
+    def test_import(self):
+        result = self.import_csv(
+            'email,name,event_number\n'
+            'Ada@Example.com,Ada Lovelace,12\n'
+            'bert@example.com,Bert,12\n'
+            'bert@example.com,Bert,13\n'
+            'cleo@example.com,,\n',
+            chunk_size=2,
+        )
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual((result.rows, result.members_created,
+                          result.rsvps_created), (4, 3, 3))
+        self.assertEqual(Member.objects.get(email='ada@example.com').name,
+                         'Ada Lovelace')
+        self.assertEqual(Member.objects.get(email='cleo@example.com').name,
+                         'cleo')
+        self.assertEqual(
+            sorted(self.event.attendees.values_list('email', flat=True)),
+            ['ada@example.com', 'bert@example.com'],
+        )
+
+    def test_counts_and_updated_at(self):
+        """Imported RSVPs should be counted and make the event look
+        modified, like RSVPs made one at a time.
+        """
+        updated_at = self.event.updated_at
+
+        self.import_csv('email,event_id\n'
+                        'ada@example.com,{0}\n'
+                        'bert@example.com,{0}\n'.format(self.event.pk))
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, 2)
+        self.assertGreater(self.event.updated_at, updated_at)
+
+    @override_settings(PAGE_CACHE_ALIAS='pages_local')
+    def test_invalidates_cache(self):
+        cache.get_page_cache().clear()
+        url = reverse('klubevents:detail', args=(self.event.pk,))
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+
+        self.import_csv('email,name,event_id\n'
+                        'ada@example.com,Ada Lovelace,{}\n'.format(
+                            self.event.pk))
+
+        resp = self.client.get(url)
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertContains(resp, 'Ada Lovelace')
+
+    def test_upsert(self):
+        """Existing members and RSVPs should be reused, not duplicated."""
+        guest = Member.objects.create(name='Ada', email='ada@example.com')
+        member = create_member()
+        self.event.attendees.add(guest)
+
+        result = self.import_csv(
+            'email,name,event_id\n'
+            'ada@example.com,Ada Lovelace,{0}\n'
+            '{1},Someone Else,{0}\n'.format(self.event.pk,
+                                           DEFAULT_MEMBER_EMAIL.upper()),
+        )
+
+        self.assertEqual((result.members_created, result.members_updated,
+                          result.rsvps_created, result.rsvps_existing),
+                         (0, 1, 1, 1))
+        self.assertEqual(Member.objects.count(), 2)
+        guest.refresh_from_db()
+        self.assertEqual(guest.name, 'Ada Lovelace')
+        # people who registered keep the name they registered with
+        member.refresh_from_db()
+        self.assertEqual(member.name, DEFAULT_MEMBER_NAME)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, 2)
+
+    def test_errors(self):
+        result = self.import_csv('email,event_number\n'
+                                 'not an email,12\n'
+                                 'ada@example.com,99\n'
+                                 'bert@example.com,twelve\n'
+                                 'cleo@example.com,12\n')
+
+        self.assertEqual([line for line, _ in result.errors], [2, 3, 4])
+        self.assertIn('no event number 99', result.errors[1][1])
+        self.assertEqual(result.rsvps_created, 1)
+
+    def test_no_email_column(self):
+        result = self.import_csv('name\nAda\n')
+
+        self.assertEqual(result.errors, [(1, 'There is no "email" column.')])
+
+    def test_unreadable_file(self):
+        """Rows before a line that can't be read should still be imported,
+        and the problem recorded.
+        """
+        result = self.import_csv('email,name\n'
+                                 'ada@example.com,Ada\n'
+                                 'bert\0@example.com,Bert\n')
+
+        self.assertEqual(result.members_created, 1)
+        self.assertEqual(result.errors[-1][0], 3)
+        self.assertIn('Stopped reading after line 2', result.read_error)
+
+    def test_command_unreadable_file(self):
+        path = os.path.join(self.tmpdir(), 'sheet.csv')
+        with open(path, 'wb') as f:
+            f.write(b'email,name\nada@example.com,\xff\n')
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('import_members', path, stdout=stdout,
+                         stderr=stderr)
+
+        self.assertIn('Stopped reading', stderr.getvalue())
+
+    def test_command(self):
+        path = os.path.join(self.tmpdir(), 'sheet.csv')
+        with open(path, 'w') as f:
+            f.write('email,name,event_number\n'
+                    'ada@example.com,Ada,12\n'
+                    'oops,Bert,12\n')
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        call_command('import_members', path, stdout=stdout, stderr=stderr)
+
+        self.assertIn('1 members made', stdout.getvalue())
+        self.assertIn('line 3: "oops" is not a valid email.',
+                      stderr.getvalue())
+
+    def tmpdir(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return path
+
+    def test_admin_upload(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        url = reverse('admin:klubevents_member_import')
+        self.assertContains(
+            self.client.get(reverse('admin:klubevents_member_changelist')),
+            url,
+        )
+
+        sheet = io.BytesIO(b'email,name,event_number\n'
+                           b'ada@example.com,Ada,12\n'
+                           b'oops,Bert,12\n')
+        sheet.name = 'sheet.csv'
+        resp = self.client.post(url, {'file': sheet})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, '1 RSVPs added')
+        self.assertContains(resp, '&quot;oops&quot; is not a valid email.')
+        self.assertTrue(self.event.attendees.filter(
+            email='ada@example.com').exists())
+
+    def test_admin_upload_not_utf8(self):
+        """An upload that stops being UTF-8 should still report what it
+        imported.
+        """
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        # past the first chunk the decoder reads
+        rows = ''.join('guest{}@example.com,Guest,12\n'.format(i)
+                       for i in range(2000)).encode('utf-8')
+        sheet = io.BytesIO(b'email,name,event_number\n' + rows + b'\xff\n')
+        sheet.name = 'sheet.csv'
+
+        resp = self.client.post(reverse('admin:klubevents_member_import'),
+                                {'file': sheet})
+
+        self.assertContains(resp, 'not a UTF-8 CSV file all the way')
+        self.assertContains(resp, 'Stopped reading')
+        self.assertGreater(self.event.attendees.count(), 0)
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        when = timezone.now() + datetime.timedelta(30)
+        self.event = create_event(days=-7, name='Session Test',
+                                  description='Session Test', date=when,
+                                  location='123 Fake Street')
+        self.detail_url = reverse('klubevents:detail', args=(self.event.id,))
+
+    def session_queries(self, queries):
+        return [query['sql'] for query in queries
+                if 'django_session' in query['sql']]
+
+    def test_anonymous_browsing(self):
+        """Visitors just looking around shouldn't cost any session I/O."""
+        for url in [reverse('klubevents:index'), self.detail_url]:
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(url)
+
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(self.session_queries(queries), [])
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, resp.cookies)
+            self.assertIn('Cookie', resp['Vary'])
+
+    def test_member_session_from_cache(self):
+        """A logged in member's session should come from the cache."""
+        member = create_member()
+        self.client.login(username=member.email,
+                          password=DEFAULT_MEMBER_PASSWORD)
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.detail_url)
+
+        self.assertContains(resp, 'Cheers')
+        self.assertEqual(self.session_queries(queries), [])
+
+    def test_no_new_sessions_on_safe_requests(self):
+        """A new session is only started by an unsafe request."""
+        def view(request):
+            request.session['seen'] = True
+            return HttpResponse()
+
+        middleware = HybridSessionMiddleware(view)
+        factory = RequestFactory()
+
+        resp = middleware(factory.get('/'))
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, resp.cookies)
+        self.assertFalse(Session.objects.exists())
+
+        resp = middleware(factory.post('/'))
+        key = resp.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+
+        # an existing session is saved whatever the method
+        request = factory.get('/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = key
+        resp = middleware(request)
+        self.assertEqual(resp.cookies[settings.SESSION_COOKIE_NAME].value,
+                         key)
+
+    def test_prune_sessions(self):
+        """Only expired sessions should be pruned, however many batches it
+        takes.
+        """
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key='expired{}'.format(i),
+                                   session_data='',
+                                   expire_date=now - datetime.timedelta(1))
+        Session.objects.create(session_key='current', session_data='',
+                               expire_date=now + datetime.timedelta(1))
+        out = io.StringIO()
+
+        call_command('prune_sessions', batch_size=2, stdout=out)
+
+        self.assertIn('Pruned 5 expired session(s).', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['current']
+        )
+
+    def test_prune_sessions_bad_options(self):
+        for options in [{'batch_size': 0}, {'batch_size': -1},
+                        {'pause': -1}]:
+            with self.assertRaises(CommandError):
+                call_command('prune_sessions', stdout=io.StringIO(),
+                             **options)
+
+        with self.assertRaises(CommandError):
+            call_command('prune_sessions', '--batch-size', '0',
+                         stdout=io.StringIO())
+
+
+class LeanRouteTests(TestCase):
+    def setUp(self):
+        when = timezone.now() + datetime.timedelta(30)
+        self.event = create_event(days=-7, name='Lean Test',
+                                  description='Lean Test', date=when,
+                                  location='123 Fake Street')
+        self.detail_url = reverse('klubevents:detail', args=(self.event.id,))
+
+    def test_anonymous_skips_middleware(self):
+        """Anonymous visitors to a lean page shouldn't get a session, a user
+        from one, or messages, but should still get the security headers.
+        """
+        for url in [reverse('klubevents:index'), self.detail_url]:
+            resp = self.client.get(url)
+
+            self.assertEqual(resp.status_code, 200)
+            request = resp.wsgi_request
+            self.assertFalse(hasattr(request, 'session'))
+            self.assertFalse(hasattr(request, '_messages'))
+            self.assertTrue(request.user.is_anonymous)
+            self.assertEqual(resp['X-Frame-Options'], 'SAMEORIGIN')
+            self.assertIn('Cookie', resp['Vary'])
+            self.assertContains(resp, 'Register')
+
+    def test_members_get_the_full_pipeline(self):
+        """With a session cookie, a lean page should see who's logged in."""
+        member = create_member()
+        self.client.login(username=member.email,
+                          password=DEFAULT_MEMBER_PASSWORD)
+
+        resp = self.client.get(self.detail_url)
+
+        self.assertTrue(hasattr(resp.wsgi_request, 'session'))
+        self.assertContains(resp, 'Cheers')
+
+    def test_other_pages_get_the_full_pipeline(self):
+        resp = self.client.get(reverse('klubevents:attending',
+                                       args=(self.event.id,)))
+
+        self.assertTrue(hasattr(resp.wsgi_request, 'session'))
+        self.assertTrue(hasattr(resp.wsgi_request, '_messages'))
+
+    def test_unsafe_requests_get_the_full_pipeline(self):
+        resp = self.client.post(self.detail_url)
+
+        self.assertEqual(resp.status_code, 405)
+        self.assertTrue(hasattr(resp.wsgi_request, 'session'))
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(StaticFilesTests, cls).setUpClass()
+        # collecting takes a while, so the tests share one run of it
+        cls.root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            STATIC_ROOT=cls.root,
+            STATICFILES_STORAGE='bierklub.storage.'
+                                'CompressedManifestStaticFilesStorage',
+        )
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.root)
+        super(StaticFilesTests, cls).tearDownClass()
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), 'rb') as f:
+            return f.read()
+
+    def test_pages_link_hashed_minified_files(self):
+        resp = self.client.get(reverse('klubevents:index'))
+
+        links = re.findall(r'href="/static/klubevents/css/([^"]+)"',
+                           resp.content.decode())
+        self.assertEqual(len(links), 3)
+        for link in links:
+            self.assertRegex(link, r'\.[0-9a-f]{12}\.css$')
+        self.assertTrue(links[0].startswith('font-awesome.min.'))
+        self.assertTrue(links[1].startswith('milligram.min.'))
+
+    def test_stylesheets_link_hashed_fonts(self):
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            manifest = json.load(f)['paths']
+        css = self.read(manifest['klubevents/css/font-awesome.min.css'])
+
+        self.assertNotIn(b'fontawesome-webfont.woff2?', css)
+        self.assertRegex(css, br'fontawesome-webfont\.[0-9a-f]{12}\.woff2')
+
+    def test_compressed_copies(self):
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            manifest = json.load(f)['paths']
+        name = manifest['klubevents/css/milligram.min.css']
+
+        self.assertEqual(gzip.decompress(self.read(name + '.gz')),
+                         self.read(name))
+        # already compressed
+        woff2 = manifest['klubevents/fonts/fontawesome-webfont.woff2']
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, woff2 + '.gz')))
+
+
+class HashingPoolTests(TestCase):
+    def test_make_password(self):
+        pool = hashing.HashingPool(workers=1, queue=0, timeout=5)
+        self.addCleanup(pool.shutdown)
+
+        encoded = pool.make_password('password')
+
+        self.assertTrue(check_password('password', encoded))
+
+    def test_full(self):
+        """Work past the pool's workers and queue should be turned away,
+        and the pool should take work again once there's room.
+        """
+        pool = hashing.HashingPool(workers=1, queue=1, timeout=5)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        for _ in range(2):
+            pool.slots.acquire()
+            pool.executor.submit(release.wait).add_done_callback(
+                pool._release)
+
+        with self.assertRaises(hashing.PoolFull):
+            pool.make_password('password')
+
+        release.set()
+        # wait for a slot to come free
+        pool.slots.acquire()
+        pool.slots.release()
+        self.assertTrue(check_password('password',
+                                       pool.make_password('password')))
+
 
 class MemberRegistrationTests(TestCase):
     @classmethod
@@ -421,6 +2251,32 @@ class MemberRegistrationTests(TestCase):
         for input_ in inputs:
             self.assertIn(input_, resp.content)
 
+    def test_busy(self):
+        """When the hashing pool is full, people should be asked to try
+        again, and nothing should be saved.
+        """
+        pool = hashing.get_pool()
+        slots = (getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+                 + getattr(settings, 'PASSWORD_HASHING_QUEUE', 4))
+        for _ in range(slots):
+            pool.slots.acquire()
+        try:
+            resp = self.client.post(self.url, {
+                'full_name': DEFAULT_MEMBER_NAME,
+                'email': DEFAULT_MEMBER_EMAIL,
+                'password': DEFAULT_MEMBER_PASSWORD,
+                'confirm_password': DEFAULT_MEMBER_PASSWORD,
+            })
+        finally:
+            for _ in range(slots):
+                pool.slots.release()
+
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp['Retry-After'], str(hashing.RETRY_AFTER))
+        self.assertContains(resp, 'try again', status_code=503)
+        self.assertFalse(User.objects.filter(
+            username=DEFAULT_MEMBER_EMAIL).exists())
+
     def test_create_member(self):
         """Ensure we can easily create a member and a user from it.
         """
@@ -463,6 +2319,77 @@ class MemberRegistrationTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn(b'A user with this email already exists!', resp.content)
 
+    def test_create_duplicate_member_email_case(self):
+        """Emails differing only by case should count as duplicates."""
+        create_member()
+
+        resp = self.client.post(self.url, {
+            'full_name': DEFAULT_MEMBER_NAME,
+            'email': DEFAULT_MEMBER_EMAIL.upper(),
+            'password': DEFAULT_MEMBER_PASSWORD,
+            'confirm_password': DEFAULT_MEMBER_PASSWORD,
+        })
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b'A user with this email already exists!', resp.content)
+
+    def test_create_duplicate_user_email(self):
+        """Users whose username isn't their email, like ones made with
+        createsuperuser, should still count as duplicates.
+        """
+        User.objects.create_user('admin', DEFAULT_MEMBER_EMAIL.title(),
+                                 DEFAULT_MEMBER_PASSWORD)
+
+        resp = self.client.post(self.url, {
+            'full_name': DEFAULT_MEMBER_NAME,
+            'email': DEFAULT_MEMBER_EMAIL,
+            'password': DEFAULT_MEMBER_PASSWORD,
+            'confirm_password': DEFAULT_MEMBER_PASSWORD,
+        })
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b'A user with this email already exists!', resp.content)
+        self.assertFalse(User.objects.filter(
+            username=DEFAULT_MEMBER_EMAIL
+        ).exists())
+
+    def test_duplicate_check_uses_indexes(self):
+        """Checking a new email shouldn't scan the user or member tables."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(
+                Member.objects.email_registered('New.Member@Example.com')
+            )
+
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            with connection.cursor() as db:
+                db.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = ' '.join(row[-1] for row in db.fetchall())
+            self.assertNotIn('SCAN', plan, query['sql'])
+
+    def test_user_email_normalized(self):
+        user = User.objects.create_user('admin', ' Admin@Example.COM',
+                                        DEFAULT_MEMBER_PASSWORD)
+
+        user.refresh_from_db()
+        self.assertEqual(user.email, 'admin@example.com')
+
+    def test_create_member_after_attending(self):
+        """Registering should claim the Member made by an earlier RSVP."""
+        Member.objects.create(name='Tommy', email=DEFAULT_MEMBER_EMAIL)
+
+        resp = self.client.post(self.url, {
+            'full_name': DEFAULT_MEMBER_NAME,
+            'email': DEFAULT_MEMBER_EMAIL,
+            'password': DEFAULT_MEMBER_PASSWORD,
+            'confirm_password': DEFAULT_MEMBER_PASSWORD,
+        })
+
+        self.assertEqual(resp.status_code, 200)
+        member = Member.objects.get(email=DEFAULT_MEMBER_EMAIL)
+        self.assertEqual(member.name, DEFAULT_MEMBER_NAME)
+        self.assertEqual(member.user.email, DEFAULT_MEMBER_EMAIL)
+
     def test_create_password_mismatch(self):
         """Ensure that passwords must match."""
         resp = self.client.post(self.url, {
@@ -1,28 +1,73 @@
 from django.conf.urls import url
 
+from bierklub.middleware import lean
+
 from . import views
+from .views import api
+from .views.calendar import event_calendar, feed
+from .views.exports import attendees_export, members_export
 from .views.members import RegisterView
 
 
 app_name = 'klubevents'
+
+# read-only pages that look the same to every anonymous visitor are marked
+# lean(), so they skip sessions, auth and messages (see bierklub.middleware)
 urlpatterns = [
 
     # ex: /events/
-    url(r'^$', views.IndexView.as_view(), name='index'),
+    url(r'^$', lean(views.IndexView.as_view()), name='index'),
+
+    # ex: /events/archive/?before=1502646120000000-12
+    url(r'^archive/$', lean(views.ArchiveView.as_view()), name='archive'),
+
+    # ex: /events/archive/2017/
+    url(r'^archive/(?P<year>[0-9]{4})/$',
+        lean(views.EventYearArchiveView.as_view()), name='archive_year'),
+
+    # ex: /events/archive/2017/08/
+    url(r'^archive/(?P<year>[0-9]{4})/(?P<month>[0-9]{2})/$',
+        lean(views.EventMonthArchiveView.as_view()), name='archive_month'),
+
+    # ex: /events/search/?q=lager
+    url(r'^search/$', lean(views.SearchView.as_view()), name='search'),
+
+    # ex: /events/feed.ics
+    url(r'^feed\.ics$', lean(feed), name='feed'),
 
     # ex: /events/5/
-    url(r'(?P<pk>[0-9]+)/$', views.DetailView.as_view(), name='detail'),
+    url(r'^(?P<pk>[0-9]+)/$', lean(views.DetailView.as_view()),
+        name='detail'),
+
+    # ex: /events/5/event.ics
+    url(r'^(?P<pk>[0-9]+)/event\.ics$', lean(event_calendar),
+        name='event_calendar'),
 
     # ex: /events/5/attending/
-    url(r'(?P<pk>[0-9]+)/attending/$', views.AttendingView.as_view(),
+    url(r'^(?P<pk>[0-9]+)/attending/$', views.AttendingView.as_view(),
         name='attending'),
 
     # ex: /events/5/attending/submit
-    url(r'(?P<event_id>[0-9]+)/attending/submit/$', views.attending_submit,
+    url(r'^(?P<event_id>[0-9]+)/attending/submit/$', views.attending_submit,
         name='attending_submit'),
 
     # ex: events/5/attending/9
-    url(r'(?P<pk>[0-9]+)/attending/(?P<member_id>[0-9]+)',
+    url(r'^(?P<pk>[0-9]+)/attending/(?P<member_id>[0-9]+)',
         views.AttendingSuccessView.as_view(), name='attending_success'),
     url(r'^register/$', RegisterView.as_view(), name='member_registration'),
+
+    # ex: /events/api/?fields=name,date&limit=50
+    url(r'^api/$', lean(api.event_list), name='api_event_list'),
+
+    # ex: /events/api/5/?fields=name,guests
+    url(r'^api/(?P<pk>[0-9]+)/$', lean(api.event_detail),
+        name='api_event_detail'),
+
+    # ex: /events/5/attendees.csv
+    url(r'^(?P<pk>[0-9]+)/attendees\.(?P<format>csv|json)$', attendees_export,
+        name='attendees_export'),
+
+    # ex: /events/members.json
+    url(r'^members\.(?P<format>csv|json)$', members_export,
+        name='members_export'),
 ]
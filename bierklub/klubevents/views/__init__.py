@@ -1,40 +1,130 @@
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
-from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .. import conditional, search
+from ..cache import PageCacheMixin, event_group
 from ..models import Event, Member
+from ..pagination import Cursor, paginate_published
 
 
-class IndexView(generic.ListView):
+@method_decorator(
+    condition(etag_func=conditional.index_etag,
+              last_modified_func=conditional.index_last_modified),
+    name='dispatch'
+)
+class IndexView(PageCacheMixin, generic.ListView):
     template_name = 'klubevents/index.html'
     context_object_name = 'latest_event_list'
 
     def get_queryset(self):
         """Return the last 5 published events."""
         return (Event.objects
-                .filter(published_date__lte=timezone.now())
-                .order_by('-published_date')[:5])
+                .published()
+                .order_by('-published_date')[:conditional.INDEX_SIZE])
 
 
-class DetailView(generic.DetailView):
+class ArchiveView(PageCacheMixin, generic.ListView):
+    template_name = 'klubevents/archive.html'
+    context_object_name = 'event_list'
+
+    def get_queryset(self):
+        """Return one page of published events, newest first.
+
+        Pages are chained together by the ``before`` cursor rather than page
+        numbers, see :mod:`klubevents.pagination`.
+        """
+        before = self.request.GET.get('before')
+        try:
+            cursor = Cursor.decode(before) if before else None
+        except ValueError:
+            raise Http404('Invalid page.')
+
+        events, self.next_cursor = paginate_published(
+            Event.objects.only('name', 'published_date'), cursor
+        )
+        return events
+
+    def get_context_data(self, **kwargs):
+        context = super(ArchiveView, self).get_context_data(**kwargs)
+        context['next_cursor'] = (self.next_cursor.encode()
+                                  if self.next_cursor else None)
+
+        return context
+
+
+class EventYearArchiveView(PageCacheMixin, generic.YearArchiveView):
+    """Lists the months in a year that had events published."""
+    queryset = Event.objects.only('name', 'published_date')
+    date_field = 'published_date'
+    template_name = 'klubevents/archive_year.html'
+
+
+class EventMonthArchiveView(PageCacheMixin, generic.MonthArchiveView):
+    queryset = Event.objects.only('name', 'published_date')
+    date_field = 'published_date'
+    month_format = '%m'
+    template_name = 'klubevents/archive_month.html'
+
+
+class SearchView(PageCacheMixin, generic.ListView):
+    template_name = 'klubevents/search.html'
+    context_object_name = 'event_list'
+
+    def get_queryset(self):
+        """Return the published events matching ``q``, best match first."""
+        return search.search_events(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchView, self).get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+
+        return context
+
+
+@method_decorator(
+    condition(etag_func=conditional.event_etag,
+              last_modified_func=conditional.event_last_modified),
+    name='dispatch'
+)
+class DetailView(PageCacheMixin, generic.DetailView):
     model = Event
     template_name = 'klubevents/detail.html'
 
+    def get_page_cache_group(self):
+        return event_group(self.kwargs['pk'])
+
     def get_queryset(self):
         """Excludes any events that have a publish date in the future.
+
+        The guest list is fetched along with the event, so the page costs the
+        same number of queries no matter how many people are attending.
         """
-        return Event.objects.filter(published_date__lte=timezone.now())
+        guests = Prefetch('attendees', queryset=Member.objects.only('name'),
+                          to_attr='guest_list')
+        return Event.objects.published().prefetch_related(guests)
 
 
-class AttendingView(generic.DetailView):
+class AttendingView(PageCacheMixin, generic.DetailView):
     model = Event
     template_name = 'klubevents/attending.html'
 
+    def get_page_cache_group(self):
+        return event_group(self.kwargs['pk'])
+
 
 def attending_submit(request, event_id):
-    event = get_object_or_404(Event, pk=event_id)
+    """Mark someone as attending an event, making them a Member if needed.
+
+    The whole RSVP is one transaction, and submitting the same email twice
+    leaves things exactly as they were after the first submission.
+    """
+    event = get_object_or_404(Event.objects.only('name'), pk=event_id)
 
     email = request.POST.get('email')
     name = request.POST.get('name')
@@ -47,26 +137,37 @@ def attending_submit(request, event_id):
             'email': email,
         })
 
-    try:
-        member = Member.objects.get(email=email)
-    except Member.DoesNotExist:
-        member = Member(email=email, name=name)
-        member.save()
+    with transaction.atomic():
+        member, _ = Member.objects.create_or_get(email=email, name=name)
 
-    event.attendees.add(member)
-    event.save()
+        try:
+            with transaction.atomic():
+                event.attendees.add(member)
+        except IntegrityError:
+            # a racing submission from the same person got there first
+            pass
 
     return HttpResponseRedirect(reverse('klubevents:attending_success',
                                         args=(event.id, member.id)))
 
 
 class AttendingSuccessView(generic.DetailView):
-    model = Event
     template_name = 'klubevents/attending_success.html'
 
+    def get_object(self, queryset=None):
+        # the RSVP itself, so the event and member come back in one query
+        # and only for someone who's actually going
+        self.attendance = get_object_or_404(
+            Event.attendees.through.objects
+            .select_related('event', 'member')
+            .only('event__name', 'member__name'),
+            event_id=self.kwargs['pk'],
+            member_id=self.kwargs['member_id'],
+        )
+        return self.attendance.event
+
     def get_context_data(self, **kwargs):
         context = super(AttendingSuccessView, self).get_context_data(**kwargs)
-        context['member'] = get_object_or_404(Member,
-                                              pk=self.kwargs['member_id'])
+        context['member'] = self.attendance.member
 
         return context
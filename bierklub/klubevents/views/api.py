@@ -0,0 +1,56 @@
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_safe
+
+from .. import api, conditional
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+@require_safe
+def event_list(request):
+    """Published events, newest first, a page at a time.
+
+    Takes ``fields``, ``limit`` and ``cursor``; the response's ``next`` is
+    the URL of the next page, keeping the same fields and limit.
+    """
+    try:
+        fields = api.parse_fields(request.GET.get('fields'),
+                                  api.DEFAULT_FIELDS)
+        events, cursor = api.list_events(fields, request.GET.get('cursor'),
+                                         request.GET.get('limit'))
+    except api.APIError as e:
+        return _error(str(e))
+
+    next_url = None
+    if cursor is not None:
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        next_url = request.build_absolute_uri(
+            '{}?{}'.format(reverse('klubevents:api_event_list'),
+                           urlencode(sorted(query.items())))
+        )
+
+    return JsonResponse({'events': events, 'next': next_url})
+
+
+@require_safe
+@condition(etag_func=conditional.api_event_etag,
+           last_modified_func=conditional.event_last_modified)
+def event_detail(request, pk):
+    """A single published event, with the names on its guest list."""
+    try:
+        fields = api.parse_fields(request.GET.get('fields'),
+                                  api.DEFAULT_DETAIL_FIELDS,
+                                  extra=(api.GUESTS,))
+    except api.APIError as e:
+        return _error(str(e))
+
+    event = api.get_event(pk, fields)
+    if event is None:
+        raise Http404('No event found matching the query')
+
+    return JsonResponse(event)
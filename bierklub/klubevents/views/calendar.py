@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .. import conditional, ical
+from ..models import Event
+
+
+def _base_url(request):
+    return request.build_absolute_uri('/').rstrip('/')
+
+
+def _calendar_response(lines, filename=None):
+    response = StreamingHttpResponse(lines, content_type=ical.CONTENT_TYPE)
+    if filename:
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+            filename
+        )
+    patch_cache_control(response, public=True, max_age=ical.MAX_AGE)
+
+    return response
+
+
+@require_safe
+@condition(etag_func=conditional.feed_etag,
+           last_modified_func=conditional.feed_last_modified)
+def feed(request):
+    """The calendar of every recent and upcoming event, for subscribing to.
+
+    Only clients whose copy is out of date get past the ``condition``
+    decorator, and they're served the feed from the page cache if another
+    client has already asked for this version of it.
+    """
+    lines, outcome = ical.cached_feed(
+        _base_url(request), conditional.feed_etag(request),
+        getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+    )
+    response = _calendar_response(lines)
+    if outcome is not None:
+        response['X-Page-Cache'] = outcome
+
+    return response
+
+
+@require_safe
+@condition(etag_func=conditional.event_calendar_etag,
+           last_modified_func=conditional.event_last_modified)
+def event_calendar(request, pk):
+    """A single event as an ``.ics`` file, for adding to a calendar."""
+    event = (Event.objects
+             .published()
+             .filter(pk=pk)
+             .values(*ical.FIELDS)
+             .first())
+    if event is None:
+        raise Http404('No event found matching the query')
+
+    return _calendar_response(ical.calendar([event], _base_url(request)),
+                              filename='event-{}.ics'.format(pk))
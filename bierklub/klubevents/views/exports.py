@@ -0,0 +1,25 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .. import export
+from ..models import Event
+
+
+@staff_member_required
+@require_safe
+def attendees_export(request, pk, format):
+    """Download an event's guest list."""
+    event = get_object_or_404(Event.objects.only('name'), pk=pk)
+
+    return export.response(export.attendees([event]),
+                           export.ATTENDEE_COLUMNS, format,
+                           'event-{}-attendees'.format(event.pk))
+
+
+@staff_member_required
+@require_safe
+def members_export(request, format):
+    """Download every member."""
+    return export.response(export.members(), export.MEMBER_COLUMNS, format,
+                           'members')
@@ -6,6 +6,7 @@ from django.shortcuts import render
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
+from .. import hashing
 from ..forms import MemberRegistrationForm
 from ..models import Member
 
@@ -22,6 +23,15 @@ class RegisterView(View):
             {'form': form}
         )
 
+    def render_busy(self, form):
+        form.add_error(None, "We're signing up a lot of people right now, "
+                             "please try again in a few seconds.")
+        response = self.render_form(form)
+        response.status_code = 503
+        response['Retry-After'] = str(hashing.RETRY_AFTER)
+
+        return response
+
     def get(self, request):
         form = self.get_form()
 
@@ -38,24 +48,36 @@ class RegisterView(View):
             else:
                 first, last = full_name, ''
 
-            email = request.POST['email']
+            email = form.cleaned_data['email']
+
+            # hashing is the slow part of signing up, so it happens on the
+            # hashing pool, which turns people away when it's swamped
+            try:
+                password = hashing.make_password(request.POST['password'])
+            except hashing.PoolFull:
+                return self.render_busy(form)
 
-            user = User.objects.create_user(
-                email,
-                email,
-                request.POST['password'],
+            user = User(
+                username=User.normalize_username(email),
+                email=User.objects.normalize_email(email),
+                password=password,
                 first_name=first,
                 last_name=last
             )
+            user.save()
 
-            member = Member(
-                # @TODO: This info can just come from the user, but we're
-                # mostly playing now and this is contrived
+            # @TODO: This info can just come from the user, but we're
+            # mostly playing now and this is contrived
+            member, created = Member.objects.create_or_get(
                 email=email,
                 name=request.POST['full_name'],
                 user=user
             )
-            member.save()
+            if not created:
+                # they've RSVP'd before, so claim that Member
+                member.name = request.POST['full_name']
+                member.user = user
+                member.save(update_fields=['name', 'user'])
 
             login(request, user)
 